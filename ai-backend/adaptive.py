@@ -0,0 +1,101 @@
+"""
+Adaptive model input size.
+Watches rolling inference latency and steps the YOLO input size through
+320/416/512/640 to hold a latency (or FPS) target. Used by realtime_ko.py to
+hold a frame rate and by the backend to shed load when it is overloaded.
+
+Hysteresis: the size only drops when the median latency exceeds the target
+by down_margin, only rises when the latency predicted at the next size
+(scaled by pixel count) stays under up_margin of the target, and every
+change resets the window so a new decision needs a full window of samples.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+
+SIZES = (320, 416, 512, 640)
+
+
+class AdaptiveImgsz:
+    """Pick the model input size that keeps inference latency under a target"""
+
+    def __init__(self, target_latency, sizes=SIZES, max_size=None, window=20,
+                 down_margin=1.1, up_margin=0.8, log=print):
+        sizes = sorted(s for s in sizes if max_size is None or s <= max_size)
+        if not sizes:
+            raise ValueError(f"No input size <= {max_size} in {SIZES}")
+        self.sizes = sizes
+        self.target_latency = target_latency  # seconds
+        self.window = window
+        self.down_margin = down_margin
+        self.up_margin = up_margin
+        self.log = log
+
+        self._index = len(sizes) - 1  # start at full quality
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._since = time.monotonic()
+        self._time_at = {size: 0.0 for size in sizes}
+        self.history = []  # (unix time, from size, to size, median latency ms)
+
+    @classmethod
+    def for_fps(cls, target_fps, **kwargs):
+        return cls(1.0 / target_fps, **kwargs)
+
+    @property
+    def imgsz(self):
+        return self.sizes[self._index]
+
+    def observe(self, latency):
+        """Record one inference latency (seconds) and return the size to use next"""
+        with self._lock:
+            self._samples.append(latency)
+            if len(self._samples) < self.window:
+                return self.imgsz
+
+            median = statistics.median(self._samples)
+            if median > self.target_latency * self.down_margin and self._index > 0:
+                self._change(self._index - 1, median)
+            elif self._index < len(self.sizes) - 1:
+                scale = (self.sizes[self._index + 1] / self.imgsz) ** 2
+                if median * scale < self.target_latency * self.up_margin:
+                    self._change(self._index + 1, median)
+            return self.imgsz
+
+    def _change(self, index, median):
+        # Caller holds self._lock
+        now = time.monotonic()
+        old = self.imgsz
+        self._time_at[old] += now - self._since
+        self._since = now
+        self._index = index
+        self._samples.clear()
+        self.history.append((time.time(), old, self.imgsz, round(median * 1000, 2)))
+        if self.log is not None:
+            direction = '⬇️' if self.imgsz < old else '⬆️'
+            self.log(f"{direction} imgsz {old} -> {self.imgsz} "
+                     f"(median {median * 1000:.1f}ms, target {self.target_latency * 1000:.1f}ms)")
+
+    def time_at_size(self):
+        """Seconds spent at each input size so far"""
+        with self._lock:
+            spent = dict(self._time_at)
+            spent[self.imgsz] += time.monotonic() - self._since
+        return spent
+
+    def stats(self):
+        with self._lock:
+            recent = statistics.median(self._samples) if self._samples else None
+            history = list(self.history[-10:])
+        return {
+            'enabled': True,
+            'imgsz': self.imgsz,
+            'sizes': self.sizes,
+            'target_ms': round(self.target_latency * 1000, 2),
+            'recent_median_ms': round(recent * 1000, 2) if recent is not None else None,
+            'changes': len(self.history),
+            'history': [{'time': t, 'from': a, 'to': b, 'median_ms': ms} for t, a, b, ms in history],
+            'seconds_at_size': {size: round(s, 1) for size, s in self.time_at_size().items()},
+        }
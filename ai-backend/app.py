@@ -1,134 +1,505 @@
-from flask import Flask, request, jsonify
+import os
+import time
+
+def process_start_time():
+    """When this process started (epoch seconds), for the time-to-ready report"""
+    try:
+        # Field 22 of /proc/self/stat: start time in clock ticks after boot (Linux)
+        with open('/proc/self/stat') as f:
+            ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot + ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+PROCESS_START = process_start_time()
+
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-import cv2
+from flask_sock import Sock, ConnectionClosed
 import numpy as np
 import base64
+import hmac
 import json
-from pathlib import Path
-import os
-import torch
-
-# Set torch to use weights_only=False for YOLO compatibility
-os.environ['TORCH_WEIGHTS_ONLY'] = '0'
+import sys
+import threading
 
-from ultralytics import YOLO
+from adaptive import AdaptiveImgsz
+from batching import MicroBatcher
+from inference import Detector
+from model_registry import ModelRegistry, HotSwapper
+from result_cache import DetectionCache
+from vocab_store import VocabStore
+from preprocess import decode_reduced, letterbox, unletterbox_boxes
+from metrics import Metrics, SIZE_BUCKETS, COUNT_BUCKETS
 
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app)
+
+# Per-stage latency histograms and counters, exposed on /metrics
+metrics = Metrics(enabled=os.environ.get('DETECT_METRICS', '1') == '1')
+metrics.counter('http_requests_total', 'HTTP requests by endpoint and status')
+metrics.histogram('http_request_duration_seconds', 'HTTP request latency by endpoint')
+metrics.histogram('detect_stage_seconds', 'Latency of each /detect stage')
+metrics.histogram('detect_image_bytes', 'Encoded image size', buckets=SIZE_BUCKETS)
+metrics.histogram('detect_image_megapixels', 'Original image resolution',
+                  buckets=(0.1, 0.3, 0.5, 1, 2, 4, 8, 12, 16, 24, 48))
+metrics.histogram('detect_objects_per_image', 'Objects detected per image', buckets=COUNT_BUCKETS)
+
+# Inference backend: pytorch (.pt), onnx (ONNX Runtime CPU) or openvino (IR)
+MODEL_WEIGHTS = os.environ.get('DETECT_MODEL', 'yolov8n.pt')  # nano version for speed
+INFERENCE_BACKEND = os.environ.get('DETECT_BACKEND', 'pytorch')
+DYNAMIC_BATCH = os.environ.get('DETECT_DYNAMIC_BATCH', '0') == '1'
+
+# Model registry: named versions of trained/exported weights. The active
+# version (else DETECT_MODEL) is served and can be hot-swapped at runtime.
+registry = ModelRegistry()
+DEFAULT_ENTRY = {'weights': MODEL_WEIGHTS, 'backend': INFERENCE_BACKEND, 'dynamic_batch': DYNAMIC_BATCH}
+ADMIN_TOKEN = os.environ.get('DETECT_ADMIN_TOKEN')  # unset = admin endpoints from localhost only
+startup_version = registry.active if registry.active in registry.models else None
+startup_entry = registry.get(startup_version) if startup_version else DEFAULT_ENTRY
+
+def load_detector(version, entry):
+    """Load one model version (called at startup and from the hot-swap thread)"""
+    return Detector(entry['weights'], backend=entry['backend'],
+                    dynamic_batch=entry.get('dynamic_batch', False), name=version)
+
+# Korean vocabulary + romanization mappings (COCO classes and additions)
+vocab = VocabStore(base_dir='.', data_dir=os.environ.get('VOCAB_DIR') or None)
+
+def is_raw_image_body(mimetype):
+    """Raw encoded image body on /detect: any image/* type or octet-stream (cv2.imdecode rejects the rest)"""
+    return mimetype.startswith('image/') or mimetype == 'application/octet-stream'
+
+# Detection settings
+CONF_THRESHOLD = 0.5  # confidence threshold 50%
+MAX_OBJECTS = 10      # objects returned per image
+MODEL_IMGSZ = int(os.environ.get('DETECT_IMGSZ', '640'))  # model input size
+
+# Adaptive input size: under load, step down through 320/416/512 to keep the
+# inference stage near this latency (unset = always MODEL_IMGSZ)
+# Static ONNX/OpenVINO exports (no --dynamic) only run at their export size, so
+# adaptation is off when the startup model is one
+TARGET_MS = os.environ.get('DETECT_TARGET_MS')
+STATIC_EXPORT = startup_entry['backend'] != 'pytorch' and not startup_entry.get('dynamic_batch', False)
+adaptive = None
+if TARGET_MS and STATIC_EXPORT:
+    print(f"Adaptive imgsz: disabled, the {startup_entry['backend']} export has a fixed input shape "
+          f"(imgsz {MODEL_IMGSZ}; re-export with --dynamic to adapt)")
+elif TARGET_MS:
+    adaptive = AdaptiveImgsz(float(TARGET_MS) / 1000, max_size=MODEL_IMGSZ)
+
+def adapts(detector):
+    """Adaptive size applies to this model (a static export swapped in later stays at MODEL_IMGSZ)"""
+    return adaptive is not None and detector is not None and detector.max_batch is None
+
+def current_imgsz(detector=None):
+    detector = detector or swapper.current
+    return adaptive.imgsz if adapts(detector) else MODEL_IMGSZ
 
-# Load YOLO model and vocab mapping
-print("Loading YOLOv8 model...")
-# Use weights_only parameter explicitly
-import ultralytics.nn.tasks as tasks
-original_load = torch.load
-torch.load = lambda *args, **kwargs: original_load(*args, **{**kwargs, 'weights_only': False})
+def warmup_detector(detector):
+    """Run inference at every input size the server may use, before the model takes traffic"""
+    for size in (adaptive.sizes if adapts(detector) else [MODEL_IMGSZ]):
+        blank = np.full((size, size, 3), 114, dtype=np.uint8)
+        for _ in range(2):
+            detector.predict(blank, conf=CONF_THRESHOLD, imgsz=size)
 
-model = YOLO('yolov8n.pt')  # nano version for speed
+# Load YOLO model. DETECT_MODEL_LOADING:
+#   background (default)  load + warm up in a thread; /health answers at once, /ready flips when warm
+#   worker                gunicorn: the master only imports torch/ultralytics, each forked
+#                         worker loads + warms up before accepting requests (see gunicorn.conf.py)
+#   blocking              load before serving (weights shared copy-on-write under gunicorn preload)
+MODEL_LOADING = os.environ.get('DETECT_MODEL_LOADING', 'background')
+swapper = HotSwapper(load_detector, warmup_detector, started=PROCESS_START)
 
-# Restore original torch.load
-torch.load = original_load
+def load_model_in_worker():
+    """gunicorn post_worker_init: load + warm up before this worker accepts requests"""
+    swapper.started = process_start_time()  # the fork, not the master's start
+    swapper.load_now(startup_version, startup_entry)
+    print(f"Worker {os.getpid()}: model ready {swapper.startup['time_to_ready_s']}s after fork "
+          f"(load {swapper.startup['load_s']}s, warm-up {swapper.startup['warmup_s']}s)")
 
-print("Model loaded successfully!")
+def preload_imports():
+    """Import the inference stack (the slowest part of a cold start) without loading a model"""
+    import torch
+    import torchvision.ops  # ultralytics imports it lazily on the first NMS
+    from ultralytics import YOLO
 
-# Load Korean vocabulary mapping (COCO classes)
-with open('labels_ko.json', 'r', encoding='utf-8') as f:
-    labels_ko = json.load(f)
+if MODEL_LOADING == 'blocking':
+    print(f"Loading YOLO model {startup_version or 'DETECT_MODEL'} ({startup_entry['backend']}: {startup_entry['weights']})...")
+    swapper.load_now(startup_version, startup_entry)
+    print(f"Model loaded successfully! Ready {swapper.startup['time_to_ready_s']}s after process start")
+elif MODEL_LOADING == 'worker':
+    preload_imports()
+elif __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    # The dev server's reloader runs this file twice; only its child process serves requests
+    swapper.load_in_background(startup_version, startup_entry)
 
-# Load romanization mapping (COCO classes)
-with open('labels_ko_romanization.json', 'r', encoding='utf-8') as f:
-    labels_roman = json.load(f)
+def current_model():
+    """Detector for a new request (None until ready); a request keeps it even if a swap happens meanwhile"""
+    return swapper.current
 
-# Backward compatibility: also load old vocab_mapping if exists
-try:
-    with open('vocab_mapping.json', 'r', encoding='utf-8') as f:
-        vocab_map_old = json.load(f)
-    labels_ko.update(vocab_map_old)
-except FileNotFoundError:
-    pass
+def follow_registry():
+    """Swap in the registry's active version when another worker or the CLI changed it"""
+    registry.refresh()
+    active = registry.active
+    if active and active != swapper.version and swapper.loading is None and active != swapper.failed:
+        entry = registry.get(active)
+        if entry is not None:
+            swapper.swap(active, entry)
 
-try:
-    with open('romanization.json', 'r', encoding='utf-8') as f:
-        roman_map_old = json.load(f)
-    labels_roman.update(roman_map_old)
-except FileNotFoundError:
-    pass
+# Micro-batching of concurrent /detect requests (DETECT_MAX_BATCH=1 disables it)
+BATCH_WINDOW_MS = float(os.environ.get('DETECT_BATCH_WINDOW_MS', '10'))
+MAX_BATCH = int(os.environ.get('DETECT_MAX_BATCH', '8'))
+
+def run_batch(items):
+    """Run batched YOLO forward passes over (detector, image) items, one pass per model"""
+    # Around a hot swap a batch can hold requests for the old and the new model
+    groups = {}
+    for i, (detector, _) in enumerate(items):
+        groups.setdefault(id(detector), (detector, []))[1].append(i)
+    results = [None] * len(items)
+    for detector, indices in groups.values():
+        images = [items[i][1] for i in indices]
+        # Inputs are already letterboxed; pass their size so YOLO does not rescale them
+        imgsz = max(max(img.shape[:2]) for img in images)
+        for i, result in zip(indices, detector.predict(images, conf=CONF_THRESHOLD, imgsz=imgsz)):
+            results[i] = result
+    return results
+
+batcher = MicroBatcher(run_batch, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH) if MAX_BATCH > 1 else None
+
+# Detection result cache, keyed by image content + model version + threshold
+CACHE_ENABLED = os.environ.get('DETECT_CACHE', '1') == '1'
+CACHE_SIZE = int(os.environ.get('DETECT_CACHE_SIZE', '1024'))
+CACHE_DIR = os.environ.get('DETECT_CACHE_DIR', 'cache/detections')
+# Max result files in CACHE_DIR, oldest evicted first (0 = unbounded)
+CACHE_DISK_MAX = int(os.environ.get('DETECT_CACHE_DISK_MAX', '50000'))
+# Max dHash bit distance for near-duplicate hits (unset = exact matches only)
+CACHE_PHASH_DISTANCE = os.environ.get('DETECT_CACHE_PHASH_DISTANCE')
+
+# One cache per model version: the old model's entries are dropped after a swap.
+# Request threads and hot swaps share the dict, so lookups and pruning hold the lock.
+caches = {}
+caches_lock = threading.Lock()
+
+def cache_for(detector):
+    """Result cache of a detector (None when caching is disabled)"""
+    if not CACHE_ENABLED:
+        return None
+    with caches_lock:
+        cache = caches.get(detector.version)
+        if cache is None:
+            cache = DetectionCache(
+                namespace=f"{detector.version}|conf={CONF_THRESHOLD}|imgsz={MODEL_IMGSZ}|top={MAX_OBJECTS}",
+                max_entries=CACHE_SIZE,
+                disk_dir=CACHE_DIR or None,
+                phash_distance=int(CACHE_PHASH_DISTANCE) if CACHE_PHASH_DISTANCE else None,
+                disk_max_entries=CACHE_DISK_MAX or None
+            )
+            keep = {detector.version, current_model().version}
+            for version in [v for v in caches if v not in keep]:
+                caches.pop(version, None)
+            caches[detector.version] = cache
+    return cache
+
+metrics.gauge('detect_imgsz', 'Model input size currently in use', callback=current_imgsz)
+metrics.gauge('detect_queue_depth', 'Requests waiting for the next micro-batch',
+              callback=lambda: batcher.queue_depth() if batcher is not None else 0)
+metrics.counter('detect_batches_total', 'Micro-batches run and images processed',
+              callback=lambda: {(('kind', k),): batcher.stats()[k] for k in ('batches', 'images')}
+              if batcher is not None else {})
+metrics.counter('detect_cache_lookups_total', 'Result cache lookups by outcome',
+              callback=lambda: {(('result', k),): v for k, v in cache_for(current_model()).stats().items()
+                                if k in ('memory_hits', 'near_duplicate_hits', 'disk_hits', 'misses')}
+              if CACHE_ENABLED and swapper.ready else {})
+metrics.counter('detect_model_swaps_total', 'Model versions swapped in since start', callback=lambda: swapper.swaps)
+metrics.gauge('detect_ready', 'Model loaded and warmed up (1) or still loading (0)',
+              callback=lambda: int(swapper.ready))
+
+def run_detection(detector, img):
+    """Run detection for one image, through the micro-batcher when enabled"""
+    if batcher is not None:
+        return batcher.infer((detector, img))
+    return detector.predict(img, conf=CONF_THRESHOLD, imgsz=max(img.shape[:2]))[0]
+
+def build_label_table(detector):
+    """Precompute class id -> (name, korean, romanization) for a model"""
+    return [
+        (name, vocab.korean.get(name, name), vocab.romanization.get(name, ''))
+        for _, name in sorted(detector.names.items())
+    ]
+
+# detector.version -> (vocab version, label table), shared by request threads
+label_tables = {}
+label_tables_lock = threading.Lock()
+
+def get_label_table(detector):
+    """Return the model's class label table, rebuilt when the vocabulary has changed"""
+    vocab.refresh()
+    with label_tables_lock:
+        cached = label_tables.get(detector.version)
+        if cached is None or cached[0] != vocab.version:
+            if cached is None:
+                keep = {detector.version, current_model().version}
+                for version in [v for v in label_tables if v not in keep]:
+                    label_tables.pop(version, None)
+            cached = label_tables[detector.version] = (vocab.version, build_label_table(detector))
+    return cached[1]
+
+def relabel(objects):
+    """Re-apply current Korean/romanization labels to cached objects"""
+    return [
+        {**obj,
+         'korean': vocab.korean.get(obj['name'], obj['name']),
+         'romanization': vocab.romanization.get(obj['name'], '')}
+        for obj in objects
+    ]
+
+def parse_result(result, transform, detector, top_k=MAX_OBJECTS):
+    """
+    Convert a YOLO result into the /detect object list, sorted by confidence.
+    Only the top_k most confident boxes are materialized; boxes are mapped
+    from the letterboxed input back to original image coordinates.
+    Returns (objects, total_detected).
+    """
+    boxes = result.boxes
+    total = len(boxes)
+    if total == 0:
+        return [], 0
+    
+    conf = boxes.conf.cpu().numpy()
+    
+    # Top-k selection before touching per-box data
+    if total > top_k:
+        order = np.argpartition(-conf, top_k)[:top_k]
+        order = order[np.argsort(-conf[order], kind='stable')]
+    else:
+        order = np.argsort(-conf, kind='stable')
+    
+    cls_ids = boxes.cls.cpu().numpy()[order].astype(int).tolist()
+    confidences = np.round(conf[order], 2).tolist()
+    xyxy = unletterbox_boxes(boxes.xyxy.cpu().numpy()[order], transform).astype(int).tolist()
+    
+    table = get_label_table(detector)
+    detected_objects = [
+        {
+            'name': table[c][0],
+            'korean': table[c][1],
+            'romanization': table[c][2],
+            'confidence': score,
+            'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+        }
+        for c, score, (x1, y1, x2, y2) in zip(cls_ids, confidences, xyxy)
+    ]
+    return detected_objects, total
+
+def decode_image_bytes(img_bytes):
+    """
+    Decode encoded image bytes (JPEG/PNG/...) to OpenCV format.
+    Large images are decoded at a reduced scale close to the model input size.
+    Returns (img, (orig_width, orig_height)).
+    """
+    try:
+        metrics.observe('detect_image_bytes', len(img_bytes))
+        with metrics.time('detect_stage_seconds', stage='decode'):
+            img, orig_size = decode_reduced(img_bytes, target=MODEL_IMGSZ)
+        if img is not None:
+            metrics.observe('detect_image_megapixels', orig_size[0] * orig_size[1] / 1e6)
+        return img, orig_size
+    except Exception as e:
+        print(f"Error decoding image: {e}")
+        return None, None
 
 def decode_image(image_data):
     """Decode base64 image to OpenCV format"""
     try:
         # Remove data URL prefix if present
         if ',' in image_data:
-            image_data = image_data.split(',')[1]
+            image_data = image_data.split(',', 1)[1]
         
         # Decode base64
-        img_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        return img
+        with metrics.time('detect_stage_seconds', stage='base64'):
+            img_bytes = base64.b64decode(image_data)
+        return decode_image_bytes(img_bytes)
     except Exception as e:
         print(f"Error decoding image: {e}")
-        return None
+        return None, None
+
+def read_request_image():
+    """
+    Decode the image sent to /detect.
+
+    Accepts a raw image body (Content-Type: image/jpeg, image/png, ...),
+    a multipart upload with an 'image' file field, or the original JSON
+    body {"image": "<base64 or data URL>"}.
+    Returns (img, orig_size, error_message); img is None when error_message is set.
+    """
+    if is_raw_image_body(request.mimetype):
+        with metrics.time('detect_stage_seconds', stage='read'):
+            img_bytes = request.get_data(cache=False)
+        if not img_bytes:
+            return None, None, 'No image data provided'
+        img, orig_size = decode_image_bytes(img_bytes)
+    elif request.mimetype == 'multipart/form-data':
+        with metrics.time('detect_stage_seconds', stage='read'):
+            upload = request.files.get('image')
+            img_bytes = upload.read() if upload is not None else None
+        if img_bytes is None:
+            return None, None, 'No image data provided'
+        img, orig_size = decode_image_bytes(img_bytes)
+    else:
+        with metrics.time('detect_stage_seconds', stage='read'):
+            data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data.get('image'):
+            return None, None, 'No image data provided'
+        if not isinstance(data['image'], str):
+            return None, None, "'image' must be a base64 string or data URL"
+        img, orig_size = decode_image(data['image'])
+    
+    if img is None:
+        return None, None, 'Failed to decode image'
+    return img, orig_size, None
+
+def worker_info():
+    """Process id, resident memory and torch threads of this worker"""
+    try:
+        # Current RSS from /proc (Linux)
+        with open('/proc/self/statm') as f:
+            rss_bytes = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Peak RSS fallback (kilobytes on Linux, bytes on macOS)
+        import resource
+        rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            rss_bytes *= 1024
+    torch = sys.modules.get('torch')  # not imported yet early in a cold start
+    return {
+        'pid': os.getpid(),
+        'rss_mb': round(rss_bytes / 2**20, 1),
+        'torch_threads': torch.get_num_threads() if torch is not None else None
+    }
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    follow_registry()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.inc('http_requests_total', endpoint=endpoint, status=response.status_code)
+    if 'request_start' in g:
+        metrics.observe('http_request_duration_seconds',
+                        time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text-format metrics for this worker"""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def not_ready():
+    """503 for requests that need the model while it is still loading"""
+    return jsonify({'error': 'Model is loading, retry shortly', 'ready': False,
+                    'loading': swapper.loading, 'model_error': swapper.error}), 503, {'Retry-After': '1'}
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the model is loaded and has run its warm-up inference"""
+    if not swapper.ready:
+        return not_ready()
+    return jsonify({'ready': True, 'model': current_model().name, 'startup': swapper.startup})
 
 @app.route('/health', methods=['GET'])
 def health():
-    """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'AI Backend is running'})
+    """Health check endpoint (liveness: answers while the model is still loading)"""
+    model = current_model()
+    return jsonify({
+        'status': 'ok' if model is not None else 'loading',
+        'message': 'AI Backend is running',
+        'ready': model is not None,
+        'model': model.describe() if model is not None else None,
+        'model_swap': swapper.status(),
+        'worker': worker_info(),
+        'batching': batcher.stats() if batcher is not None else {'enabled': False},
+        'cache': cache_for(model).stats() if CACHE_ENABLED and model is not None else {'enabled': CACHE_ENABLED},
+        'adaptive': adaptive.stats() if adaptive is not None else {'enabled': False, 'imgsz': MODEL_IMGSZ},
+        'vocab': vocab.stats(),
+        'latency_ms': metrics.summary('detect_stage_seconds')
+    })
+
+def detect_image(img, orig_size, use_cache=True):
+    """
+    Detect objects in a decoded image.
+    Returns {'objects': top MAX_OBJECTS sorted by confidence, 'total_detected': n,
+    'model_version': version that produced them}.
+    """
+    detector = current_model()
+    cache = cache_for(detector)
+    use_cache = use_cache and cache is not None
+    
+    # Serve repeated uploads from the cache
+    with metrics.time('detect_stage_seconds', stage='cache_lookup'):
+        cache_key = cache.key_for(img, orig_size) if use_cache else None
+        detection = cache.get(cache_key) if use_cache else None
+    
+    if detection is None:
+        # Letterbox once to the model input size (smaller when overloaded)
+        imgsz = current_imgsz(detector)
+        with metrics.time('detect_stage_seconds', stage='letterbox'):
+            model_input, transform = letterbox(img, orig_size, imgsz)
+        
+        # Run YOLO detection (includes time waiting for a micro-batch)
+        start = time.perf_counter()
+        with metrics.time('detect_stage_seconds', stage='inference'):
+            result = run_detection(detector, model_input)
+        if adapts(detector):
+            adaptive.observe(time.perf_counter() - start)
+        # YOLO's own per-image breakdown, in milliseconds
+        for stage, ms in result.speed.items():
+            if ms is not None:
+                metrics.observe('detect_stage_seconds', ms / 1000, stage=f'yolo_{stage}')
+        
+        # Parse results (bbox in original image coordinates)
+        with metrics.time('detect_stage_seconds', stage='postprocess'):
+            detected_objects, total = parse_result(result, transform, detector)
+        detection = {'objects': detected_objects, 'total_detected': total}
+        metrics.observe('detect_objects_per_image', total)
+        
+        # Only cache full-quality results, not ones from a reduced input size
+        if use_cache and imgsz == MODEL_IMGSZ:
+            cache.put(cache_key, detection)
+    else:
+        # Vocabulary may have changed since the result was cached
+        vocab.refresh()
+        detection = {**detection, 'objects': relabel(detection['objects'])}
+    
+    return {**detection, 'model_version': detector.name}
 
 @app.route('/detect', methods=['POST'])
 def detect_objects():
     """Object detection endpoint"""
+    if not swapper.ready:
+        return not_ready()
     try:
-        data = request.get_json()
-        
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
+        # Decode image (raw binary, multipart or JSON/base64)
+        img, orig_size, error = read_request_image()
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Decode image
-        img = decode_image(data['image'])
-        if img is None:
-            return jsonify({'error': 'Failed to decode image'}), 400
+        detection = detect_image(img, orig_size)
         
-        # Run YOLO detection
-        results = model(img, conf=0.5)  # confidence threshold 50%
-        
-        # Parse results
-        detected_objects = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                # Get class name and confidence
-                cls_id = int(box.cls[0])
-                class_name = model.names[cls_id]
-                confidence = float(box.conf[0])
-                
-                # Get Korean translation
-                korean = labels_ko.get(class_name, class_name)
-                romanization = labels_roman.get(class_name, '')
-                
-                # Get bounding box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                detected_objects.append({
-                    'name': class_name,
-                    'korean': korean,
-                    'romanization': romanization,
-                    'confidence': round(confidence, 2),
-                    'bbox': {
-                        'x1': int(x1),
-                        'y1': int(y1),
-                        'x2': int(x2),
-                        'y2': int(y2)
-                    }
-                })
-        
-        # Sort by confidence
-        detected_objects.sort(key=lambda x: x['confidence'], reverse=True)
-        
-        return jsonify({
-            'success': True,
-            'objects': detected_objects[:10],  # Return top 10 objects
-            'total_detected': len(detected_objects)
-        })
+        with metrics.time('detect_stage_seconds', stage='serialize'):
+            response = jsonify({
+                'success': True,
+                'objects': detection['objects'],  # Top 10 objects
+                'total_detected': detection['total_detected'],
+                'model_version': detection['model_version']
+            })
+        return response
         
     except Exception as e:
         print(f"Error in detection: {e}")
@@ -136,26 +507,98 @@ def detect_objects():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@sock.route('/detect/stream')
+def detect_stream(ws):
+    """
+    Streaming detection over a WebSocket for continuous camera scanning.
+
+    The client sends frames as binary messages (JPEG/PNG bytes) or text
+    messages (base64 / data URL). Frames that arrive while inference is busy
+    are dropped in favour of the newest one (latest-frame-wins), and one
+    compact result message is sent back per processed frame:
+    {"frame": n, "dropped": d, "ms": t, "objects": [{name, korean,
+    romanization, confidence, bbox: [x1, y1, x2, y2]}, ...]}
+    """
+    frame_no = 0
+    dropped = 0
+    try:
+        while True:
+            message = ws.receive()
+            frame_no += 1
+            
+            # Skip to the newest frame buffered while the last one was processed
+            while True:
+                newer = ws.receive(timeout=0)
+                if newer is None:
+                    break
+                message = newer
+                frame_no += 1
+                dropped += 1
+            
+            if not swapper.ready:
+                ws.send(json.dumps({'frame': frame_no, 'error': 'Model is loading, retry shortly'}))
+                continue
+            
+            start = time.perf_counter()
+            if isinstance(message, str):
+                img, orig_size = decode_image(message)
+            else:
+                img, orig_size = decode_image_bytes(message)
+            if img is None:
+                ws.send(json.dumps({'frame': frame_no, 'error': 'Failed to decode image'}))
+                continue
+            
+            # Camera frames rarely repeat exactly, so skip the result cache
+            detection = detect_image(img, orig_size, use_cache=False)
+            ws.send(json.dumps({
+                'frame': frame_no,
+                'dropped': dropped,
+                'ms': round((time.perf_counter() - start) * 1000, 1),
+                'model': detection['model_version'],
+                'objects': [{
+                    'name': obj['name'],
+                    'korean': obj['korean'],
+                    'romanization': obj['romanization'],
+                    'confidence': obj['confidence'],
+                    'bbox': [obj['bbox']['x1'], obj['bbox']['y1'], obj['bbox']['x2'], obj['bbox']['y2']]
+                } for obj in detection['objects']]
+            }, ensure_ascii=False))
+    except ConnectionClosed:
+        pass
+
 @app.route('/vocab/add', methods=['POST'])
 def add_vocab():
-    """Add new vocabulary mapping"""
+    """
+    Add new vocabulary mapping(s).
+    Body: {"english", "korean", "romanization"?} or
+    {"mappings": [{"english", "korean", "romanization"?}, ...]} for bulk additions.
+    """
     try:
-        data = request.get_json()
-        english = data.get('english')
-        korean = data.get('korean')
-        
-        if not english or not korean:
-            return jsonify({'error': 'Both english and korean are required'}), 400
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+        items = data.get('mappings') if 'mappings' in data else [data]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return jsonify({'success': False, 'error': 'mappings must be a list of objects'}), 400
         
-        labels_ko[english] = korean
+        mappings = []
+        for item in items:
+            english = item.get('english')
+            korean = item.get('korean')
+            if not english or not korean:
+                return jsonify({'success': False, 'error': 'Both english and korean are required'}), 400
+            mappings.append((english, korean, item.get('romanization')))
         
-        # Save to file
-        with open('labels_ko.json', 'w', encoding='utf-8') as f:
-            json.dump(labels_ko, f, ensure_ascii=False, indent=2)
+        # Appended to the vocabulary journal (O(1) per mapping)
+        vocab.add_many(mappings)
         
+        if len(mappings) == 1:
+            message = f'Added mapping: {mappings[0][0]} -> {mappings[0][1]}'
+        else:
+            message = f'Added {len(mappings)} mappings'
         return jsonify({
             'success': True,
-            'message': f'Added mapping: {english} -> {korean}'
+            'message': message
         })
         
     except Exception as e:
@@ -164,16 +607,80 @@ def add_vocab():
 @app.route('/vocab/list', methods=['GET'])
 def list_vocab():
     """List all vocabulary mappings"""
+    vocab.refresh()
+    mappings, _ = vocab.snapshot()
     return jsonify({
-        'total': len(labels_ko),
-        'mappings': labels_ko
+        'total': len(mappings),
+        'mappings': mappings
     })
 
+def admin_allowed():
+    """X-Admin-Token must match DETECT_ADMIN_TOKEN; without a token only localhost may call"""
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/models', methods=['GET'])
+def list_models():
+    """Registered model versions, the active one and any swap in progress"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    registry.refresh(force=True)
+    return jsonify({**registry.describe(), 'serving': swapper.status()})
+
+@app.route('/admin/models', methods=['POST'])
+def register_model():
+    """
+    Register a model version.
+    Body: {"version", "weights", "backend"?, "dynamic_batch"?, "notes"?, "activate"?}
+    With "activate": true the new version is loaded, warmed up and swapped in
+    in the background (202); poll GET /health or /admin/models for progress.
+    """
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True) or {}
+    version, weights = data.get('version'), data.get('weights')
+    if not version or not weights:
+        return jsonify({'error': 'Both version and weights are required'}), 400
+    try:
+        meta = {'notes': data['notes']} if data.get('notes') else {}
+        entry = registry.register(version, weights, data.get('backend', 'pytorch'),
+                                  data.get('dynamic_batch', False), **meta)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if data.get('activate'):
+        return activate_model(version)
+    return jsonify({'success': True, 'version': version, 'model': entry})
+
+@app.route('/admin/models/<version>/activate', methods=['POST'])
+def activate_model(version):
+    """Load + warm version in the background, then swap it in; requests in flight finish on the old model"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        entry = registry.activate(version)
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    started = swapper.swap(version, entry)
+    return jsonify({'success': True, 'version': version, 'started': started,
+                    'serving': swapper.status()}), 202
+
 if __name__ == '__main__':
     print("=" * 50)
     print("AI Backend Server Starting...")
-    print("Supported classes:", len(model.names))
-    print("Korean vocab mappings:", len(labels_ko))
-    print("Romanization mappings:", len(labels_roman))
+    print(f"Inference backend: {startup_entry['backend']} ({startup_entry['weights']}), "
+          f"version {startup_version or 'DETECT_MODEL'}, loading: {MODEL_LOADING}")
+    print(f"Model registry: {registry.path} ({len(registry.models)} versions)")
+    print("Korean vocab mappings:", len(vocab.korean))
+    print("Romanization mappings:", len(vocab.romanization))
+    if CACHE_ENABLED:
+        print(f"Result cache: {CACHE_SIZE} entries in memory, disk tier at {CACHE_DIR or '(off)'}"
+              f"{f' (max {CACHE_DISK_MAX} entries)' if CACHE_DIR and CACHE_DISK_MAX else ''}")
+    if batcher is not None:
+        print(f"Micro-batching: window={BATCH_WINDOW_MS}ms, max batch={MAX_BATCH}")
+    else:
+        print("Micro-batching: disabled")
+    if adaptive is not None:
+        print(f"Adaptive imgsz: {adaptive.sizes}, target inference latency {TARGET_MS}ms")
     print("=" * 50)
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,126 @@
+"""
+Dynamic micro-batching for the detection backend.
+Requests arriving within a short window are grouped into a single batched
+model call and the per-image results are fanned back out to each caller.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# Upper bound on how long a request waits for its batch (queueing + inference)
+DEFAULT_TIMEOUT = 30.0
+
+
+class MicroBatcher:
+    """Collect concurrent inference requests into batches.
+
+    infer_fn receives a list of inputs and must return a list of results in
+    the same order. A batch is dispatched when max_batch items are waiting or
+    window_ms has elapsed since the first item of the batch arrived.
+    """
+
+    def __init__(self, infer_fn, window_ms=10, max_batch=8):
+        self.infer_fn = infer_fn
+        self.window = window_ms / 1000.0
+        self.window_ms = window_ms
+        self.max_batch = max(1, int(max_batch))
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = {}
+        self._queue = None
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        """
+        Start the batching thread on first use in this process.
+        Threads do not survive fork(), so a batcher created before gunicorn
+        forks its workers (preload_app) starts a fresh thread in each worker.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                            name='micro-batcher', daemon=True)
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def submit(self, item):
+        """Queue an item and return a Future resolving to its result"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def infer(self, item, timeout=DEFAULT_TIMEOUT):
+        """Blocking helper: submit an item and wait for its result (TimeoutError after timeout seconds)"""
+        future = self.submit(item)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # the batching thread skips it if it was not dispatched yet
+            raise
+
+    def queue_depth(self):
+        """Number of requests waiting for the next batch"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        """Batching configuration and counters for reporting"""
+        with self._lock:
+            return {
+                'enabled': True,
+                'window_ms': self.window_ms,
+                'max_batch': self.max_batch,
+                'batches': self._batches,
+                'images': self._items,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'batch_sizes': dict(sorted(self._batch_sizes.items())),
+                'queue_depth': self.queue_depth(),
+            }
+
+    def _collect(self, pending):
+        """Block for the first item, then gather more until the window closes"""
+        batch = [pending.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending):
+        while True:
+            batch = self._collect(pending)
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.infer_fn(items))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"infer_fn returned {len(results)} results for a batch of {len(batch)}")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                # Every caller gets an answer, even if only part of the batch was resolved
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
@@ -0,0 +1,68 @@
+"""
+Production serving config for the AI detection backend.
+
+    cd ai-backend && gunicorn -c gunicorn.conf.py app:app
+
+The app (and YOLO weights) is imported once in the master process and the
+workers are forked from it, so model weights are shared copy-on-write
+instead of being loaded N times, and a recycled worker starts with a warm
+model. DETECT_MODEL_LOADING=worker instead only imports torch/ultralytics
+in the master and has each worker load + warm up its own copy before
+accepting requests: the master binds sooner, but every worker holds its
+own weights. Each worker pins torch to its share of the CPU cores so
+workers don't oversubscribe the machine.
+"""
+
+import multiprocessing
+import os
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+
+# Load app + model once in the master, fork workers afterwards
+preload_app = True
+os.environ.setdefault('DETECT_MODEL_LOADING', 'blocking')
+
+# Worker processes (default: one per 2 cores, at least 1)
+workers = int(os.environ.get('WEB_CONCURRENCY', max(1, CPU_COUNT // 2)))
+
+# Threads per worker, so concurrent requests can share a micro-batch
+worker_class = 'gthread'
+threads = int(os.environ.get('WORKER_THREADS', '4'))
+
+# Torch intra-op threads per worker: split the cores evenly across workers
+torch_threads = int(os.environ.get('TORCH_NUM_THREADS', max(1, CPU_COUNT // workers)))
+# OpenMP reads this once, when torch is imported: set it before preload_app imports the app
+os.environ.setdefault('OMP_NUM_THREADS', str(torch_threads))
+
+# First requests on a cold worker can be slow on CPU
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+
+# Recycle workers periodically to bound RSS growth (0 = never)
+max_requests = int(os.environ.get('MAX_REQUESTS', '2000'))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Limit torch intra-op threads in each forked worker (OMP_NUM_THREADS is set above)"""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    server.log.info(f"Worker {worker.pid}: torch threads = {torch_threads}")
+
+
+def post_worker_init(worker):
+    """Per-worker loading modes: load the model in this worker (not needed with blocking)"""
+    mode = os.environ.get('DETECT_MODEL_LOADING')
+    if mode == 'worker':
+        from app import load_model_in_worker
+        load_model_in_worker()
+    elif mode == 'background':
+        # The master's loading thread does not survive fork()
+        from app import swapper, startup_version, startup_entry
+        swapper.load_in_background(startup_version, startup_entry)
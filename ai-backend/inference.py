@@ -0,0 +1,133 @@
+"""
+Inference backends for YOLO detection.
+Serves the same detection contract from PyTorch weights (.pt), an exported
+ONNX model (ONNX Runtime CPU) or an OpenVINO IR directory.
+
+Exported models are loaded through ultralytics' AutoBackend, so letterbox
+pre-processing, NMS and class names are identical across backends.
+
+PyTorch weights are served from a cached copy with Conv+BatchNorm already
+fused (cache/models/), so restarts skip fusing; ultralytics and torch are
+only imported when a model is loaded.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+# Full ultralytics checkpoints are pickled modules (torch >= 2.6 defaults to weights_only=True)
+os.environ.setdefault('TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD', '1')
+
+ARTIFACT_DIR = os.environ.get('DETECT_ARTIFACT_DIR', str(Path(__file__).resolve().parent / 'cache' / 'models'))
+
+
+def resolve_weights(weights, backend):
+    """
+    Map a weights path to the artifact for the given backend.
+
+    'best.pt' -> 'best.onnx' (onnx) or 'best_openvino_model/' (openvino),
+    as written by train_yolo_coco128.py --export. Paths that already point
+    at the backend's artifact are returned unchanged.
+    """
+    path = Path(weights)
+    if backend == 'onnx' and path.suffix != '.onnx':
+        return str(path.with_suffix('.onnx'))
+    if backend == 'openvino' and not path.name.endswith('_openvino_model'):
+        return str(path.parent / f"{path.stem}_openvino_model")
+    return str(path)
+
+
+def weights_fingerprint(weights):
+    """Short content hash of a weights file or exported model directory"""
+    path = Path(weights)
+    files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    h = hashlib.sha256()
+    for file in files:
+        if not file.exists():
+            # e.g. 'yolov8n.pt' before ultralytics has downloaded it
+            h.update(file.name.encode())
+            continue
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def fused_artifact(weights, fingerprint, cache_dir=ARTIFACT_DIR):
+    """
+    Path of a ready-to-run copy of .pt weights: Conv+BatchNorm fused, eval
+    mode, no optimizer/EMA state. Created on first use; returns (path, cached).
+    """
+    path = Path(cache_dir) / f"{Path(weights).stem}-{fingerprint}-fused.pt"
+    if path.exists():
+        return str(path), True
+
+    import torch
+    from ultralytics import YOLO
+
+    model = YOLO(weights).model
+    args = dict(model.args) if isinstance(model.args, dict) else vars(model.args)
+    model = model.fuse(verbose=False).eval()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    torch.save({'model': model, 'train_args': args, 'source': str(weights)}, tmp)
+    os.replace(tmp, path)  # atomic: several workers may race to create it
+    return str(path), False
+
+
+class Detector:
+    """A loaded detection model behind a backend-independent predict()"""
+
+    def __init__(self, weights='yolov8n.pt', backend='pytorch', dynamic_batch=False, name=None, fused_cache=True):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+        self.backend = backend
+        self.weights = resolve_weights(weights, backend)
+        if not Path(self.weights).exists() and backend != 'pytorch':
+            raise FileNotFoundError(
+                f"{backend} model not found at {self.weights} "
+                f"(export it with: python train_yolo_coco128.py --export --formats {backend})"
+            )
+
+        from ultralytics import YOLO
+
+        fingerprint = weights_fingerprint(self.weights)
+        self.artifact = None
+        load_path = self.weights
+        if backend == 'pytorch' and fused_cache and ARTIFACT_DIR and Path(self.weights).is_file():
+            load_path, cached = fused_artifact(self.weights, fingerprint)
+            self.artifact = {'path': load_path, 'cached': cached}
+
+        self.model = YOLO(load_path, task='detect')
+        self.names = self.model.names
+        self.version = f"{Path(self.weights).stem}-{backend}-{fingerprint}"
+        # Registry version reported to clients; the content-based version keys caches
+        self.name = name or self.version
+
+        # Exported graphs have a fixed batch size of 1 unless exported with --dynamic
+        self.max_batch = None if backend == 'pytorch' or dynamic_batch else 1
+
+    def predict(self, images, conf=0.5, imgsz=640):
+        """Run detection on one image or a list of images, returning a list of Results"""
+        if not isinstance(images, list):
+            images = [images]
+
+        if self.max_batch is None:
+            return self.model(images, conf=conf, imgsz=imgsz, verbose=False)
+
+        results = []
+        for i in range(0, len(images), self.max_batch):
+            chunk = images[i:i + self.max_batch]
+            results.extend(self.model(chunk, conf=conf, imgsz=imgsz, verbose=False))
+        return results
+
+    def __call__(self, images, **kwargs):
+        return self.predict(images, **kwargs)
+
+    def describe(self):
+        """Backend info for /health and startup logs"""
+        return {'name': self.name, 'backend': self.backend, 'weights': self.weights, 'version': self.version,
+                'artifact': self.artifact}
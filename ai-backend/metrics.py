@@ -0,0 +1,189 @@
+"""
+Lightweight metrics for the detection backend.
+Counters, gauges and fixed-bucket histograms rendered in the Prometheus text
+exposition format, without extra dependencies. Histograms also report
+p50/p95/p99 estimates interpolated from their buckets.
+
+Metrics are per process: under gunicorn each worker keeps its own values.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds, from 0.5 ms to 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1,
+                   0.15, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+# Bytes, from 16 KB to 16 MB
+SIZE_BUCKETS = tuple(2 ** i for i in range(14, 25))
+# Objects per image
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 300)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation within its bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):  # +Inf bucket: best guess is its lower bound
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Registry of labelled counters, gauges and histograms"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._families = {}     # name -> (type, help, buckets)
+        self._values = {}       # (name, labels) -> float | Histogram
+        self._callbacks = {}    # name -> fn returning {labels_tuple: value} or a value
+
+    def counter(self, name, help_text, callback=None):
+        """Declare a counter; callback (optional) is evaluated at scrape time"""
+        self._families[name] = ('counter', help_text, None)
+        if callback is not None:
+            self._callbacks[name] = callback
+
+    def gauge(self, name, help_text, callback=None):
+        """Declare a gauge; callback (optional) is evaluated at scrape time"""
+        self._families[name] = ('gauge', help_text, None)
+        if callback is not None:
+            self._callbacks[name] = callback
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._families[name] = ('histogram', help_text, tuple(buckets))
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._values.get(key)
+            if hist is None:
+                hist = self._values[key] = Histogram(self._families[name][2])
+            hist.observe(value)
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe the duration of the with-block in seconds"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summary(self, name):
+        """{label string: {count, mean, p50, p95, p99}} for one histogram, in milliseconds"""
+        out = {}
+        with self._lock:
+            for (metric, labels), hist in self._values.items():
+                if metric != name:
+                    continue
+                key = ','.join(f"{k}={v}" for k, v in labels) or name
+                out[key] = {'count': hist.count,
+                            'mean': round(hist.sum / hist.count * 1000, 2) if hist.count else 0.0,
+                            **{f"p{int(q * 100)}": round(hist.quantile(q) * 1000, 2) for q in QUANTILES}}
+        return out
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            values = {key: (value if not isinstance(value, Histogram) else _copy(value))
+                      for key, value in self._values.items()}
+
+        for name, (kind, help_text, _) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            if name in self._callbacks:
+                result = self._callbacks[name]()
+                samples = result.items() if isinstance(result, dict) else [((), result)]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+                continue
+
+            quantiles = []
+            for (metric, labels), value in sorted(values.items(), key=lambda kv: kv[0]):
+                if metric != name:
+                    continue
+                if kind != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(value.buckets + (float('inf'),), value.counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else _num(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(value.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                for q in QUANTILES:
+                    quantiles.append(f"{name}_quantile{_labels(labels + (('quantile', str(q)),))} "
+                                     f"{_num(value.quantile(q))}")
+
+            # Bucket-interpolated p50/p95/p99 as a separate gauge family
+            if quantiles:
+                lines.append(f"# HELP {name}_quantile Estimated quantiles of {name}")
+                lines.append(f"# TYPE {name}_quantile gauge")
+                lines.extend(quantiles)
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(hist):
+    copy = Histogram(hist.buckets)
+    copy.counts = list(hist.counts)
+    copy.sum = hist.sum
+    copy.count = hist.count
+    return copy
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,277 @@
+"""
+Model registry and zero-downtime hot swap for the detection backend.
+
+The registry is a small JSON file of named versions, each pointing at trained
+or exported weights and the backend to run them with, plus which version is
+active. Activating a version (POST /admin/models/<version>/activate or
+`python model_registry.py activate <version>`) makes every worker load and
+warm the new model in a background thread and then swap it in with a single
+reference assignment: requests already running keep the detector they
+started with, new requests get the new one.
+
+    python model_registry.py register v2 ../runs/detect/train/weights/best.pt --backend onnx --activate
+    python model_registry.py list
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+DEFAULT_PATH = Path(__file__).resolve().parent / 'models' / 'registry.json'
+
+
+class ModelRegistry:
+    """Versioned model entries and the active version, shared through one JSON file"""
+
+    def __init__(self, path=None, refresh_interval=1.0):
+        self.path = Path(path or os.environ.get('DETECT_REGISTRY') or DEFAULT_PATH)
+        self.lock_path = self.path.with_suffix('.lock')
+        self.refresh_interval = refresh_interval
+        self.models = {}
+        self.active = None
+        self._mtime = None
+        self._last_refresh = 0.0
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.models = data.get('models', {})
+        self.active = data.get('active')
+        self._mtime = mtime
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'active': self.active, 'models': self.models}, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime_ns
+
+    def refresh(self, force=False):
+        """Reload if another process changed the file (throttled); True if it changed"""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return False
+        self._last_refresh = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._load()
+        return True
+
+    def register(self, version, weights, backend='pytorch', dynamic_batch=False, activate=False, **meta):
+        """Add or replace a version; weights paths are stored absolute"""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+        entry = {
+            'weights': str(Path(weights).resolve()) if Path(weights).exists() else str(weights),
+            'backend': backend,
+            'dynamic_batch': bool(dynamic_batch),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **meta,
+        }
+        with self._file_lock():
+            self._load()
+            self.models[version] = entry
+            if activate:
+                self.active = version
+            self._save()
+        return entry
+
+    def activate(self, version):
+        with self._file_lock():
+            self._load()
+            if version not in self.models:
+                raise KeyError(f"Unknown model version '{version}'")
+            self.active = version
+            self._save()
+        return self.models[version]
+
+    def get(self, version):
+        return self.models.get(version)
+
+    def describe(self):
+        return {'path': str(self.path), 'active': self.active, 'models': self.models}
+
+
+class HotSwapper:
+    """
+    Holds the serving detector and replaces it without downtime.
+
+    load(version, entry) must return a ready detector; warmup(detector) runs
+    a few inferences so the first real request does not pay for lazy setup.
+    Both run in a background thread; only the final assignment of
+    self.current is visible to request threads. started (epoch seconds) is
+    the process start time used to report time-to-ready.
+    """
+
+    def __init__(self, load, warmup=None, log=print, started=None):
+        self._load = load
+        self._warmup = warmup
+        self.log = log
+        self.started = started
+        self.current = None        # detector serving new requests (None until the first load)
+        self.version = None        # its registry version (None = not registered)
+        self.loading = None        # version being loaded in the background
+        self.startup = None        # load/warm-up timings of the first model
+        self.last_swap = None
+        self.error = None
+        self.failed = None         # version whose last load failed
+        self.swaps = 0
+        self._loading_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.current is not None
+
+    def _prepare(self, version, entry):
+        start = time.perf_counter()
+        detector = self._load(version, entry)
+        loaded = time.perf_counter()
+        if self._warmup is not None:
+            self._warmup(detector)
+        return detector, {'load_s': round(loaded - start, 3),
+                          'warmup_s': round(time.perf_counter() - loaded, 3)}
+
+    def _install(self, version, detector, timings, swap=True):
+        previous = self.version
+        self.current = detector  # atomic: in-flight requests keep their reference to the old one
+        self.version = version
+        if swap:
+            self.swaps += 1
+            self.last_swap = {'from': previous, 'to': version, 'at': time.strftime('%Y-%m-%dT%H:%M:%S'), **timings}
+        else:
+            ready_at = time.time()
+            self.startup = {'version': version, **timings,
+                            'time_to_ready_s': round(ready_at - self.started, 3) if self.started else None}
+
+    def load_now(self, version, entry):
+        """Blocking load + warm-up (startup)"""
+        detector, timings = self._prepare(version, entry)
+        self._install(version, detector, timings, swap=False)
+        return detector
+
+    def load_in_background(self, version, entry):
+        """
+        Startup load + warm-up in a background thread of this process, so the
+        server answers health checks meanwhile. False if a model is already
+        loaded, or loading in this process (threads do not survive fork()).
+        """
+        with self._lock:
+            if self.current is not None or (self.loading is not None and self._loading_pid == os.getpid()):
+                return False
+            self.loading = version or Path(entry['weights']).name
+            self._loading_pid = os.getpid()
+        threading.Thread(target=self._run, args=(version, entry, False), name='model-load', daemon=True).start()
+        return True
+
+    def swap(self, version, entry):
+        """Load and warm version in the background, then swap it in; False if active or a load is running"""
+        with self._lock:
+            if version == self.version or self.loading is not None:
+                return False
+            self.loading = version
+            self._loading_pid = os.getpid()
+            self.error = self.failed = None
+        threading.Thread(target=self._run, args=(version, entry, True), name=f'model-swap-{version}', daemon=True).start()
+        return True
+
+    def _run(self, version, entry, swap):
+        label = version or Path(entry['weights']).name
+        self.log(f"🔄 Loading model {label} ({entry['backend']}: {entry['weights']}) in the background...")
+        try:
+            detector, timings = self._prepare(version, entry)
+        except Exception as e:
+            self.error = f"{label}: {e}"
+            self.failed = version
+            if swap:
+                self.log(f"❌ Model {label} failed to load, still serving {self.version or 'the startup model'}: {e}")
+            else:
+                self.log(f"❌ Model {label} failed to load, not ready: {e}")
+            with self._lock:
+                self.loading = None
+            return
+        with self._lock:
+            self._install(version, detector, timings, swap)
+            self.loading = None
+        if swap:
+            self.log(f"✅ Now serving model {label} (load {timings['load_s']}s, warm-up {timings['warmup_s']}s)")
+        else:
+            ready = self.startup['time_to_ready_s']
+            self.log(f"✅ Model {label} ready{f' {ready}s after process start' if ready is not None else ''} "
+                     f"(load {timings['load_s']}s, warm-up {timings['warmup_s']}s)")
+
+    def status(self):
+        return {'ready': self.ready, 'active': self.version, 'loading': self.loading, 'swaps': self.swaps,
+                'startup': self.startup, 'last_swap': self.last_swap, 'error': self.error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the detection model registry')
+    parser.add_argument('--registry', default=None, help=f'Registry file (default: $DETECT_REGISTRY or {DEFAULT_PATH})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    register = sub.add_parser('register', help='Add or replace a model version')
+    register.add_argument('version')
+    register.add_argument('weights', help='.pt file, .onnx file or *_openvino_model directory')
+    register.add_argument('--backend', choices=BACKENDS, default='pytorch')
+    register.add_argument('--dynamic-batch', action='store_true', help='Exported with --dynamic')
+    register.add_argument('--notes', default=None)
+    register.add_argument('--activate', action='store_true', help='Also make it the active version')
+
+    activate = sub.add_parser('activate', help='Serve this version (running servers swap it in)')
+    activate.add_argument('version')
+
+    sub.add_parser('list', help='Show registered versions')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'register':
+        meta = {'notes': args.notes} if args.notes else {}
+        registry.register(args.version, args.weights, args.backend, args.dynamic_batch, args.activate, **meta)
+        print(f"✅ Registered {args.version}{' (active)' if args.activate else ''}")
+    elif args.command == 'activate':
+        registry.activate(args.version)
+        print(f"✅ Active model: {args.version}")
+    else:
+        print(f"📚 {registry.path}")
+        for version, entry in registry.models.items():
+            marker = '*' if version == registry.active else ' '
+            print(f" {marker} {version:20} {entry['backend']:9} {entry['weights']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Image pre-processing for the detection backend.
+Decodes uploads at reduced resolution when they are much larger than the
+model input, letterboxes them once into a reusable buffer and maps detected
+boxes back to original image coordinates.
+"""
+
+import struct
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# JPEG start-of-frame markers that carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                  (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+LETTERBOX_COLOR = 114  # same gray padding as ultralytics
+STRIDE = 32
+
+# Mapping from letterboxed model input back to the original image
+Letterbox = namedtuple('Letterbox', ['scale_x', 'scale_y', 'pad_x', 'pad_y', 'width', 'height'])
+
+_local = threading.local()
+
+
+def image_size(buf):
+    """Read (width, height) from a JPEG or PNG header without decoding, or None"""
+    data = memoryview(buf)
+    if len(data) >= 24 and bytes(data[:8]) == b'\x89PNG\r\n\x1a\n':
+        width, height = struct.unpack('>II', data[16:24])
+        return width, height
+
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        i += 2 + length
+    return None
+
+
+def decode_reduced(buf, target=640):
+    """
+    Decode an encoded image, using DCT-scaled decoding when the source is at
+    least 2x larger than the model input.
+    Returns (img, (orig_width, orig_height)); img is None if decoding fails.
+    """
+    nparr = np.frombuffer(buf, np.uint8)
+    size = image_size(nparr)
+
+    flag = cv2.IMREAD_COLOR
+    if size is not None:
+        longest = max(size)
+        for factor, reduced_flag in _REDUCED_FLAGS:
+            if longest // factor >= target:
+                flag = reduced_flag
+                break
+
+    img = cv2.imdecode(nparr, flag)
+    if img is None:
+        return None, None
+    if size is None:
+        return img, (img.shape[1], img.shape[0])
+
+    # EXIF orientation may have rotated the decoded image relative to the header
+    width, height = size
+    if (img.shape[1] > img.shape[0]) != (width > height):
+        width, height = height, width
+    return img, (width, height)
+
+
+def _buffer(size):
+    """Per-thread reusable letterbox buffer, returned as a contiguous (h, w, 3) view"""
+    h, w = size
+    buf = getattr(_local, 'buffer', None)
+    if buf is None or buf.size < h * w * 3:
+        buf = np.empty(h * w * 3, dtype=np.uint8)
+        _local.buffer = buf
+    return buf[:h * w * 3].reshape(h, w, 3)
+
+
+def letterbox(img, orig_size=None, imgsz=640):
+    """
+    Resize img to fit imgsz (keeping aspect ratio) and pad to a multiple of
+    the model stride, writing into this thread's reusable buffer.
+
+    The returned array is only valid until the next letterbox() call on the
+    same thread. orig_size is the (width, height) that boxes are mapped back
+    to, defaulting to img's own size.
+    """
+    h, w = img.shape[:2]
+    orig_w, orig_h = orig_size if orig_size is not None else (w, h)
+
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = max(1, round(w * r)), max(1, round(h * r))
+    out_w = -(-new_w // STRIDE) * STRIDE
+    out_h = -(-new_h // STRIDE) * STRIDE
+    pad_x, pad_y = (out_w - new_w) // 2, (out_h - new_h) // 2
+
+    out = _buffer((out_h, out_w))
+    out[...] = LETTERBOX_COLOR
+    interpolation = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+    out[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(img, (new_w, new_h), interpolation=interpolation)
+
+    transform = Letterbox(orig_w / new_w, orig_h / new_h, pad_x, pad_y, orig_w, orig_h)
+    return out, transform
+
+
+def unletterbox_boxes(xyxy, transform):
+    """Map (N, 4) xyxy boxes from letterboxed coordinates to the original image"""
+    boxes = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).copy()
+    xs, ys = boxes[:, 0::2], boxes[:, 1::2]  # views on x1/x2 and y1/y2
+    xs -= transform.pad_x
+    xs *= transform.scale_x
+    ys -= transform.pad_y
+    ys *= transform.scale_y
+    np.clip(xs, 0, transform.width, out=xs)
+    np.clip(ys, 0, transform.height, out=ys)
+    return boxes
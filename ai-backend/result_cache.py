@@ -0,0 +1,218 @@
+"""
+Content-addressed cache for /detect results.
+Results are keyed by a hash of the decoded image pixels, namespaced by model
+version and confidence threshold, and kept in a bounded in-memory LRU backed
+by an on-disk tier that survives restarts and is shared between workers.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+CacheKey = namedtuple('CacheKey', ['digest', 'phash', 'shape'])
+
+
+def image_digest(img, orig_size=None):
+    """Exact content hash of a decoded image (shape + original size + pixels)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((img.shape, orig_size)).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def perceptual_hash(img):
+    """64-bit difference hash (dHash) for near-duplicate matching"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class DetectionCache:
+    """Two-tier (memory LRU + disk) cache of detection results.
+
+    namespace should change whenever cached results become invalid, e.g. it
+    is built from the model version and confidence threshold. With
+    phash_distance set, images whose dHash differs by at most that many bits
+    (and that have the same shape) are served from the memory tier.
+
+    disk_max_entries caps the files under disk_dir, shared by every
+    namespace: at most every prune_interval seconds the least recently used
+    entries (by mtime, refreshed on disk hits) are deleted, so results of
+    retired model versions go first.
+    """
+
+    def __init__(self, namespace, max_entries=1024, disk_dir=None, phash_distance=None,
+                 disk_max_entries=None, prune_interval=60.0):
+        self.namespace = hashlib.blake2b(namespace.encode(), digest_size=8).hexdigest()
+        self.max_entries = max_entries
+        self.phash_distance = phash_distance
+        self.disk_root = Path(disk_dir) if disk_dir else None
+        self.disk_dir = self.disk_root / self.namespace if disk_dir else None
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self.disk_max_entries = disk_max_entries
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._pruning = False
+        self.disk_evictions = 0
+
+        self._memory = OrderedDict()   # digest -> (phash, shape, value)
+        self._lock = threading.Lock()
+        self._counts = {'memory_hits': 0, 'near_duplicate_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def key_for(self, img, orig_size=None):
+        """
+        Compute the cache key for a decoded image. orig_size is the source
+        resolution when img was decoded at reduced scale, since boxes are
+        returned in original coordinates.
+        """
+        phash = perceptual_hash(img) if self.phash_distance is not None else None
+        shape = (img.shape, orig_size)
+        return CacheKey(image_digest(img, orig_size), phash, shape)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._memory.get(key.digest)
+            if entry is not None:
+                self._memory.move_to_end(key.digest)
+                self._counts['memory_hits'] += 1
+                return entry[2]
+
+            if key.phash is not None:
+                value = self._near_duplicate(key)
+                if value is not None:
+                    self._counts['near_duplicate_hits'] += 1
+                    return value
+
+        value = self._disk_get(key.digest)
+        with self._lock:
+            if value is not None:
+                self._counts['disk_hits'] += 1
+                self._remember(key, value)
+            else:
+                self._counts['misses'] += 1
+        return value
+
+    def put(self, key, value):
+        """Store a value in both tiers"""
+        with self._lock:
+            self._remember(key, value)
+        self._disk_put(key.digest, value)
+
+    def stats(self):
+        """Hit/miss counters and ratios"""
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._memory)
+        lookups = sum(counts.values())
+        hits = lookups - counts['misses']
+        return {
+            **counts,
+            'lookups': lookups,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': entries,
+            'max_entries': self.max_entries,
+            'disk': str(self.disk_dir) if self.disk_dir is not None else None,
+            'disk_max_entries': self.disk_max_entries,
+            'disk_evictions': self.disk_evictions,
+            'near_duplicates': self.phash_distance is not None,
+        }
+
+    def _remember(self, key, value):
+        # Caller holds self._lock
+        self._memory[key.digest] = (key.phash, key.shape, value)
+        self._memory.move_to_end(key.digest)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _near_duplicate(self, key):
+        # Caller holds self._lock; linear scan is cheap for a bounded LRU
+        for digest, (phash, shape, value) in reversed(self._memory.items()):
+            if phash is None or shape != key.shape:
+                continue
+            if bin(phash ^ key.phash).count('1') <= self.phash_distance:
+                self._memory.move_to_end(digest)
+                return value
+        return None
+
+    def _disk_path(self, digest):
+        return self.disk_dir / digest[:2] / f"{digest}.json"
+
+    def _disk_get(self, digest):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(digest)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.disk_max_entries:
+            try:
+                os.utime(path)  # recently used: evicted last
+            except OSError:
+                pass
+        return value
+
+    def _disk_put(self, digest, value):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(digest)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Write to a temp file and rename so readers never see partial entries
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Error writing detection cache: {e}")
+            return
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        """Start a background prune if the disk tier is capped and the last one is old enough"""
+        if not self.disk_max_entries:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._pruning or now - self._last_prune < self.prune_interval:
+                return
+            self._pruning = True
+            self._last_prune = now
+        threading.Thread(target=self.prune_disk, name='cache-prune', daemon=True).start()
+
+    def prune_disk(self):
+        """Delete the oldest disk entries (all namespaces) beyond disk_max_entries; returns how many"""
+        try:
+            entries = []
+            for path in self.disk_root.glob('*/*/*.json'):
+                try:
+                    entries.append((path.stat().st_mtime, path))
+                except FileNotFoundError:  # removed by another worker
+                    pass
+            excess = len(entries) - self.disk_max_entries
+            if excess <= 0:
+                return 0
+            entries.sort(key=lambda e: e[0])
+            removed = 0
+            for _, path in entries[:excess]:
+                try:
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+            self.disk_evictions += removed
+            return removed
+        finally:
+            self._pruning = False
@@ -0,0 +1,276 @@
+"""
+Vocabulary mapping store for the detection backend.
+
+Mappings (english -> korean / romanization) are loaded from one compiled
+snapshot. New mappings are appended to a journal (one JSON line each), so a
+write is O(1) regardless of vocabulary size, and the journal is periodically
+compacted into a new snapshot with an atomic rename.
+
+Several gunicorn workers can share one store: writes and compaction take an
+exclusive file lock, and each worker tails the journal to pick up mappings
+added by the others. Compaction bumps the snapshot generation and removes
+the old journal, which tells the other workers to reload.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+# Legacy mapping files merged into the first snapshot, in override order
+KOREAN_SOURCES = ['labels_ko.json', 'vocab_mapping.json']
+ROMANIZATION_SOURCES = ['labels_ko_romanization.json', 'romanization.json']
+
+
+class VocabStore:
+    """Journaled english -> korean/romanization mapping store"""
+
+    def __init__(self, base_dir='.', data_dir=None, compact_every=1000, refresh_interval=1.0):
+        self.base_dir = Path(base_dir)
+        self.data_dir = Path(data_dir) if data_dir else self.base_dir / 'vocab_store'
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.data_dir / 'vocab_snapshot.json'
+        self.lock_path = self.data_dir / 'vocab.lock'
+        self.compact_every = compact_every
+        self.refresh_interval = refresh_interval
+
+        self.korean = {}
+        self.romanization = {}
+        self.version = 0         # bumped on every change seen by this process
+        self._added = {}         # english -> [korean, romanization], survives source rebuilds
+        self._sources = {}       # legacy file -> mtime the snapshot was built from
+        self._generation = 0
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._compacting = False  # a background compaction is queued or running
+
+        with self._file_lock():
+            self._load()
+            if not self.snapshot_path.exists() or self._journal_entries or self._sources_changed():
+                self._compact_locked()
+
+    # ------------------------------------------------------------------
+    # Public API
+
+    def add(self, english, korean, romanization=None):
+        """Add or replace one mapping"""
+        self.add_many([(english, korean, romanization)])
+
+    def add_many(self, mappings):
+        """Append (english, korean, romanization) mappings in one journal write"""
+        lines = []
+        for english, korean, romanization in mappings:
+            lines.append(json.dumps({'en': english, 'ko': korean, 'roman': romanization},
+                                    ensure_ascii=False) + '\n')
+        if not lines:
+            return
+
+        with self._lock, self._file_lock():
+            # Another worker compacted: pick up the new snapshot first
+            if not self._journal_path().exists():
+                self._load()
+            self._tail_journal()
+
+            with open(self._journal_path(), 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+                f.flush()
+                self._journal_offset = f.tell()
+            for english, korean, romanization in mappings:
+                self._apply(english, korean, romanization)
+            self._journal_entries += len(lines)
+            self.version += 1
+
+            # Compact off the request path: the snapshot write holds the file lock for every worker
+            start_compaction = self._journal_entries >= self.compact_every and not self._compacting
+            if start_compaction:
+                self._compacting = True
+        if start_compaction:
+            threading.Thread(target=self._compact_in_background, name='vocab-compact', daemon=True).start()
+
+    def refresh(self, force=False):
+        """Pick up mappings written by other processes (throttled)"""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+
+        journal = self._journal_path()
+        try:
+            size = journal.stat().st_size
+        except FileNotFoundError:
+            size = None
+        if size == self._journal_offset:
+            return
+
+        with self._lock, self._file_lock():
+            if not journal.exists():
+                self._load()
+            else:
+                self._tail_journal()
+
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        with self._lock, self._file_lock():
+            self._tail_journal()
+            self._compact_locked()
+
+    def snapshot(self):
+        """Consistent copies of (korean, romanization) for read-only callers"""
+        with self._lock:
+            return dict(self.korean), dict(self.romanization)
+
+    def stats(self):
+        return {
+            'korean': len(self.korean),
+            'romanization': len(self.romanization),
+            'added': len(self._added),
+            'generation': self._generation,
+            'journal_entries': self._journal_entries,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals (callers hold the file lock)
+
+    def _compact_in_background(self):
+        try:
+            with self._lock, self._file_lock():
+                if not self._journal_path().exists():
+                    self._load()  # another worker compacted first
+                self._tail_journal()
+                if self._journal_entries >= self.compact_every:
+                    self._compact_locked()
+        finally:
+            self._compacting = False
+
+    def _journal_path(self, generation=None):
+        gen = self._generation if generation is None else generation
+        return self.data_dir / f'vocab_journal.{gen}.jsonl'
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _source_mtimes(self):
+        mtimes = {}
+        for name in KOREAN_SOURCES + ROMANIZATION_SOURCES:
+            path = self.base_dir / name
+            if path.exists():
+                mtimes[name] = path.stat().st_mtime
+        return mtimes
+
+    def _sources_changed(self):
+        return self._sources != self._source_mtimes()
+
+    def _read_sources(self):
+        """Merge the legacy mapping files (later files override earlier ones)"""
+        korean, romanization = {}, {}
+        for names, target in ((KOREAN_SOURCES, korean), (ROMANIZATION_SOURCES, romanization)):
+            for name in names:
+                try:
+                    with open(self.base_dir / name, 'r', encoding='utf-8') as f:
+                        target.update(json.load(f))
+                except FileNotFoundError:
+                    pass
+        return korean, romanization
+
+    def _load(self):
+        """Load the current snapshot (building it from sources if missing) and replay its journal"""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            snapshot = None
+
+        if snapshot is None:
+            korean, romanization = self._read_sources()
+            self._generation = 0
+            self._sources = self._source_mtimes()
+            self._added = {}
+        else:
+            korean, romanization = snapshot['korean'], snapshot['romanization']
+            self._generation = snapshot['generation']
+            self._sources = snapshot.get('sources', {})
+            self._added = snapshot.get('added', {})
+
+        self.korean = korean
+        self.romanization = romanization
+        self._journal_offset = 0
+        self._journal_entries = 0
+        # The current journal always exists; a missing one means it was compacted
+        self._journal_path().touch()
+        self._tail_journal()
+        self.version += 1
+
+    def _tail_journal(self):
+        """Apply journal lines appended since our last read"""
+        try:
+            with open(self._journal_path(), 'r', encoding='utf-8') as f:
+                f.seek(self._journal_offset)
+                for line in iter(f.readline, ''):
+                    if not line.endswith('\n'):
+                        break  # partially written line, pick it up next time
+                    entry = json.loads(line)
+                    self._apply(entry['en'], entry['ko'], entry.get('roman'))
+                    self._journal_entries += 1
+                    self._journal_offset = f.tell()
+                    self.version += 1
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, english, korean, romanization):
+        self.korean[english] = korean
+        if romanization:
+            self.romanization[english] = romanization
+        self._added[english] = [korean, romanization]
+
+    def _compact_locked(self):
+        """Write snapshot generation N+1 atomically, then drop journal N"""
+        if self._sources_changed():
+            # Legacy files were edited: rebuild from them, keeping added mappings
+            korean, romanization = self._read_sources()
+            for english, (ko, roman) in self._added.items():
+                korean[english] = ko
+                if roman:
+                    romanization[english] = roman
+            self.korean, self.romanization = korean, romanization
+            self._sources = self._source_mtimes()
+            self.version += 1
+
+        old_journal = self._journal_path()
+        snapshot = {
+            'generation': self._generation + 1,
+            'sources': self._sources,
+            'korean': self.korean,
+            'romanization': self.romanization,
+            'added': self._added,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.data_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        self._generation += 1
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._journal_path().touch()
+        old_journal.unlink(missing_ok=True)
@@ -169,8 +169,10 @@ export default function CameraVocabPage() {
     setCapturedImage(imageData);
     stopCamera();
     
-    // Xử lý nhận diện đối tượng
-    processImage(imageData);
+    // Xử lý nhận diện đối tượng (gửi JPEG nhị phân, không base64)
+    canvas.toBlob((blob) => {
+      if (blob) processImage(blob);
+    }, 'image/jpeg');
   };
 
   const handleFileUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
@@ -182,14 +184,14 @@ export default function CameraVocabPage() {
       const imageData = e.target?.result as string;
       setUploadedImage(imageData);
       setCapturedImage(null);
-      
-      // Xử lý nhận diện đối tượng
-      processImage(imageData);
     };
     reader.readAsDataURL(file);
+
+    // Xử lý nhận diện đối tượng (gửi file gốc, không base64)
+    processImage(file);
   };
 
-  const processImage = async (imageData: string) => {
+  const processImage = async (image: Blob) => {
     setIsProcessing(true);
     setDetectedObjects([]);
 
@@ -198,9 +200,9 @@ export default function CameraVocabPage() {
       const response = await fetch('http://localhost:5001/detect', {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': image.type || 'image/jpeg',
         },
-        body: JSON.stringify({ image: imageData })
+        body: image
       });
 
       if (!response.ok) {
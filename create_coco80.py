@@ -3,11 +3,10 @@ Script to extract 80 images from COCO128 dataset while preserving labels.
 Creates a smaller dataset for faster training and testing.
 """
 
-import os
-import random
-import shutil
 from pathlib import Path
 
+from dataset_builder import DatasetBuilder, format_stats, list_images, pair_entries, plan_subset
+
 # Configuration
 SRC = Path("coco128")                 # COCO128 folder after unzip
 SPLIT = "train2017"                   # COCO128 uses train2017
@@ -21,38 +20,18 @@ lab_dir = SRC / "labels" / SPLIT
 # Destination directories
 out_img = DST / "images" / "train"
 out_lab = DST / "labels" / "train"
-out_img.mkdir(parents=True, exist_ok=True)
-out_lab.mkdir(parents=True, exist_ok=True)
-
-# Get all images
-imgs = sorted([p for p in img_dir.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"]])
 
-print(f"Found {len(imgs)} images in {img_dir}")
+print(f"Found {len(list_images(img_dir))} images in {img_dir}")
 
 # Randomly select N images
-random.seed(42)  # For reproducibility
-chosen = random.sample(imgs, min(N, len(imgs)))
+chosen = plan_subset(SRC, N, SPLIT, seed=42)  # For reproducibility
 
 print(f"Selecting {len(chosen)} images...")
 
-# Copy images and labels
-copied_count = 0
-for img in chosen:
-    label = lab_dir / (img.stem + ".txt")
-    
-    # Copy image
-    shutil.copy2(img, out_img / img.name)
-    
-    # Copy label if exists, create empty file if not
-    if label.exists():
-        shutil.copy2(label, out_lab / label.name)
-    else:
-        # If image has no objects, label file might not exist; create empty file
-        (out_lab / (img.stem + ".txt")).write_text("")
-    
-    copied_count += 1
+# Link (or copy) images and labels in parallel; unchanged files are skipped on re-runs
+stats = DatasetBuilder(DST).build(pair_entries(chosen, lab_dir, "train"))
 
-print(f"\n✅ Done: {copied_count} images → {DST}")
+print(f"\n✅ Done: {len(chosen)} images → {DST} ({format_stats(stats)})")
 print(f"   Images: {out_img}")
 print(f"   Labels: {out_lab}")
 
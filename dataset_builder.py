@@ -0,0 +1,257 @@
+"""
+Parallel, incremental YOLO dataset builder.
+Builds train/val splits and random subsets of a YOLO-format dataset by
+cloning files instead of copying them (reflink, then copy as a fallback), in
+parallel, and records a manifest with each file's source, size and content
+hash. Re-running only touches files whose source changed and removes files
+that are no longer part of the dataset, including leftovers from a split
+built without a manifest.
+
+--link hardlink is faster but shares the inode with the source: editing a
+file in the dataset in place edits the source dataset too.
+
+Used by split_coco128.py and create_coco80.py; also usable directly:
+    python dataset_builder.py split --src coco128 --dst coco128_split --val 0.2
+    python dataset_builder.py subset --src coco128 --dst coco80 --n 80
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks
+    fcntl = None
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+MANIFEST_NAME = "manifest.json"
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, xfs)
+LINK_MODES = ("auto", "hardlink", "reflink", "copy")
+
+# Empty label files are generated for images without objects
+EMPTY = None
+
+
+def list_images(img_dir):
+    return sorted(p for p in Path(img_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def file_hash(path):
+    """blake2b content hash of a file (hex)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+EMPTY_HASH = hashlib.blake2b(b"", digest_size=16).hexdigest()
+
+
+def pair_entries(imgs, lab_dir, split):
+    """(source, destination) entries for images and their labels in one split"""
+    entries = []
+    for img in imgs:
+        label = Path(lab_dir) / (img.stem + ".txt")
+        entries.append((img, f"images/{split}/{img.name}"))
+        # No objects in image: label file might not exist, create an empty one
+        entries.append((label if label.exists() else EMPTY, f"labels/{split}/{img.stem}.txt"))
+    return entries
+
+
+def plan_split(src, split="train2017", val_fraction=0.2, min_val=10, seed=42):
+    """Shuffle with a fixed seed and split into (train, val) image lists"""
+    imgs = list_images(Path(src) / "images" / split)
+    random.Random(seed).shuffle(imgs)
+    val_n = max(min_val, int(val_fraction * len(imgs)))
+    return imgs[val_n:], imgs[:val_n]
+
+
+def plan_subset(src, n, split="train2017", seed=42):
+    """Random sample of n images with a fixed seed"""
+    imgs = list_images(Path(src) / "images" / split)
+    return random.Random(seed).sample(imgs, min(n, len(imgs)))
+
+
+class DatasetBuilder:
+    """Materialize (source, relative destination) entries under dst, incrementally"""
+
+    def __init__(self, dst, link="auto", workers=None):
+        if link not in LINK_MODES:
+            raise ValueError(f"link must be one of {LINK_MODES}")
+        self.dst = Path(dst)
+        self.link = link
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.manifest_path = self.dst / MANIFEST_NAME
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _save_manifest(self, files):
+        self.dst.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.dst, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": files}, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _materialize(self, src, dst):
+        """Link or copy src to dst atomically; returns the method used"""
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.tmp")
+        tmp.unlink(missing_ok=True)
+        try:
+            if src is EMPTY:
+                tmp.write_bytes(b"")
+                method = "empty"
+            else:
+                method = self._link(src, tmp)
+            os.replace(tmp, dst)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return method
+
+    def _link(self, src, tmp):
+        if self.link == "hardlink":
+            os.link(src, tmp)
+            return "hardlink"
+        if self.link in ("auto", "reflink") and fcntl is not None:
+            try:
+                with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                shutil.copystat(src, tmp)
+                return "reflink"
+            except OSError:
+                tmp.unlink(missing_ok=True)
+                if self.link == "reflink":
+                    raise
+        shutil.copy2(src, tmp)
+        return "copy"
+
+    def _sync(self, src, rel, old):
+        """Bring one destination file up to date; returns (rel, manifest entry, action)"""
+        dst = self.dst / rel
+        if src is EMPTY:
+            if old is not None and old["source"] is None and dst.exists() and dst.stat().st_size == 0:
+                return rel, old, "unchanged"
+            return rel, {"source": None, "size": 0, "mtime_ns": 0, "hash": EMPTY_HASH,
+                         "method": self._materialize(src, dst)}, "empty"
+
+        st = src.stat()
+        if old is not None and old["source"] == str(src) and dst.exists():
+            if old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                return rel, old, "unchanged"  # fast path: no hashing
+
+        digest = file_hash(src)
+        if (old is not None and old["hash"] == digest and dst.exists()
+                and dst.stat().st_size == st.st_size):
+            # Touched but identical content: only refresh the manifest
+            return rel, {**old, "source": str(src), "mtime_ns": st.st_mtime_ns}, "unchanged"
+
+        method = self._materialize(src, dst)
+        return rel, {"source": str(src), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                     "hash": digest, "method": method}, method
+
+    def _stray_files(self, keep):
+        """Files in the split folders (images/<split>/, labels/<split>/) not in keep"""
+        stray = []
+        for top in ("images", "labels"):
+            root = self.dst / top
+            for split_dir in (root.iterdir() if root.is_dir() else ()):
+                if not split_dir.is_dir():
+                    continue  # e.g. ultralytics' labels/train.cache
+                stray.extend(p for p in split_dir.rglob("*")
+                             if p.is_file() and p.relative_to(self.dst).as_posix() not in keep)
+        return stray
+
+    def build(self, entries):
+        """
+        Sync dst to exactly the given entries; returns counts per action and timings.
+        Files in dst's split folders that are not entries are removed, whether or
+        not an earlier manifest lists them (so a new split never leaks old files).
+        """
+        start = time.perf_counter()
+        old = self._load_manifest()
+        wanted = {rel: src for src, rel in entries}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda item: self._sync(item[1], item[0], old.get(item[0])),
+                                    wanted.items()))
+
+        stats = {"files": len(results), "removed": 0, "bytes": 0}
+        files = {}
+        for rel, entry, action in results:
+            files[rel] = entry
+            stats[action] = stats.get(action, 0) + 1
+            if action != "unchanged":
+                stats["bytes"] += entry["size"]
+
+        # Files from a previous build that are no longer part of the dataset
+        for rel in old.keys() - files.keys():
+            (self.dst / rel).unlink(missing_ok=True)
+            stats["removed"] += 1
+        # Leftovers the manifest doesn't know about (first build over an existing split)
+        for path in self._stray_files(files.keys()):
+            path.unlink(missing_ok=True)
+            stats["removed"] += 1
+
+        self._save_manifest(files)
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return stats
+
+
+def format_stats(stats):
+    actions = ", ".join(f"{k}: {stats[k]}" for k in ("hardlink", "reflink", "copy", "empty", "unchanged", "removed")
+                        if stats.get(k))
+    return f"{stats['files']} files in {stats['seconds']}s ({actions or 'nothing to do'})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build YOLO dataset splits/subsets with links and a manifest")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    split = sub.add_parser("split", help="Train/val split")
+    split.add_argument("--val", type=float, default=0.2, help="Validation fraction (default: 0.2)")
+    split.add_argument("--min-val", type=int, default=10, help="Minimum validation images (default: 10)")
+
+    subset = sub.add_parser("subset", help="Random subset into images/train")
+    subset.add_argument("--n", type=int, default=80, help="Number of images (default: 80)")
+
+    for p in (split, subset):
+        p.add_argument("--src", default="coco128", help="Source dataset (default: coco128)")
+        p.add_argument("--split", default="train2017", help="Source split folder (default: train2017)")
+        p.add_argument("--dst", required=True, help="Destination dataset folder")
+        p.add_argument("--seed", type=int, default=42)
+        p.add_argument("--link", choices=LINK_MODES, default="auto",
+                       help="hardlink/reflink/copy, or auto = reflink, else copy (default); "
+                            "hardlinks share edits with the source")
+        p.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    lab_dir = Path(args.src) / "labels" / args.split
+    if args.command == "split":
+        train, val = plan_split(args.src, args.split, args.val, args.min_val, args.seed)
+        entries = pair_entries(train, lab_dir, "train") + pair_entries(val, lab_dir, "val")
+        print(f"Train: {len(train)} images, Val: {len(val)} images")
+    else:
+        chosen = plan_subset(args.src, args.n, args.split, args.seed)
+        entries = pair_entries(chosen, lab_dir, "train")
+        print(f"Subset: {len(chosen)} images")
+
+    stats = DatasetBuilder(args.dst, link=args.link, workers=args.workers).build(entries)
+    print(f"✅ {args.dst}: {format_stats(stats)}")
+
+
+if __name__ == "__main__":
+    main()
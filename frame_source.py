@@ -0,0 +1,92 @@
+"""
+Frame sources for realtime_ko.py: a camera index, a video file, an RTSP/HTTP
+stream URL or a directory of images (e.g. coco128/images/train2017).
+"""
+
+import re
+from collections import namedtuple
+from pathlib import Path
+
+import cv2
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# index: position in the source, name: image file name or "frame_<index>"
+Frame = namedtuple('Frame', ['index', 'name', 'image'])
+
+
+class FrameSource:
+    """Uniform read() over cameras, video files, stream URLs and image directories"""
+
+    def __init__(self, source, width=None, height=None):
+        self.source = str(source)
+        self.index = 0
+        self._paths = None
+        self._cap = None
+
+        path = Path(self.source)
+        if self.source.isdigit():
+            self.kind = 'camera'
+            self._cap = cv2.VideoCapture(int(self.source))
+            if width and height:
+                self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        elif path.is_dir():
+            self.kind = 'images'
+            self._paths = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        else:
+            self.kind = 'stream' if re.match(r'^[a-z]+://', self.source) else 'video'
+            self._cap = cv2.VideoCapture(self.source)
+
+    @property
+    def live(self):
+        """Live sources produce frames in real time, so stale frames should be dropped"""
+        return self.kind in ('camera', 'stream')
+
+    def is_opened(self):
+        if self._paths is not None:
+            return bool(self._paths)
+        return self._cap.isOpened()
+
+    @property
+    def fps(self):
+        """Nominal source frame rate (30 when unknown, e.g. image directories)"""
+        fps = self._cap.get(cv2.CAP_PROP_FPS) if self._cap is not None else 0
+        return fps if fps and fps > 0 else 30.0
+
+    def __len__(self):
+        if self._paths is not None:
+            return len(self._paths)
+        count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.kind == 'video' else 0
+        return max(count, 0)
+
+    def read(self):
+        """Next Frame, or None at the end of the source"""
+        if self._paths is not None:
+            while self.index < len(self._paths):
+                path = self._paths[self.index]
+                self.index += 1
+                image = cv2.imread(str(path))
+                if image is not None:
+                    return Frame(self.index - 1, path.name, image)
+                print(f"⚠️  Skipping unreadable image: {path}")
+            return None
+
+        ok, image = self._cap.read()
+        if not ok:
+            return None
+        self.index += 1
+        return Frame(self.index - 1, f"frame_{self.index - 1:06d}", image)
+
+    def describe(self):
+        if self.kind == 'images':
+            return f"{len(self._paths)} images in {self.source}"
+        if self.kind == 'camera':
+            width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            return f"camera {self.source} ({width}x{height})"
+        return f"{self.kind} {self.source} ({self.fps:.1f} FPS)"
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
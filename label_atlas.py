@@ -0,0 +1,106 @@
+"""
+Pre-rendered label sprites for realtime_ko.py.
+Korean class names and the confidence digits are rasterized once with PIL,
+then composed and alpha-blended onto the BGR frame with NumPy slicing, so the
+per-frame path never converts the whole frame to PIL and back.
+"""
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+GLYPHS = "0123456789.# "
+
+
+class LabelAtlas:
+    """
+    Cache of label sprites: one bitmap per class name, one per digit glyph,
+    and composed "name 0.87" (or "name 0.87 #12" with a track ID) sprites
+    keyed by (class id, confidence bucket, track id).
+
+    Sprites are (bgr, alpha) pairs: alpha is float32 in [0, 1] with the
+    background box at bg_alpha and the text fully opaque.
+    """
+
+    def __init__(self, font, labels, text_color=(255, 255, 255), bg_color=(0, 0, 0),
+                 bg_alpha=1.0, padding=4, max_cached=4096):
+        self.font = font
+        self.labels = list(labels)
+        self.text_color = text_color   # BGR
+        self.bg_color = bg_color       # BGR
+        self.bg_alpha = bg_alpha
+        self.padding = padding
+        self.max_cached = max_cached
+
+        # One line height for every piece so names and digits share a baseline
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        top, bottom = probe.textbbox((0, 0), "가Ag" + GLYPHS, font=font)[1::2]
+        self._top = top
+        self.height = bottom - top + 2 * padding
+
+        self._names = [self._render(f"{label} ") for label in self.labels]
+        self._digits = {ch: self._render(ch) for ch in GLYPHS}
+        self._sprites = {}
+
+    def _render(self, text):
+        """Rasterize text into an (height, width) coverage mask in [0, 1]"""
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        width = max(1, int(round(probe.textlength(text, font=self.font))))
+        mask = Image.new("L", (width, self.height), 0)
+        ImageDraw.Draw(mask).text((0, self.padding - self._top), text, font=self.font, fill=255)
+        return np.asarray(mask, dtype=np.float32) / 255.0
+
+    def sprite(self, cls_id, conf, track_id=None):
+        """(bgr, alpha) sprite for "<label> <conf:.2f> [#id]", composed on first use"""
+        key = (cls_id, int(round(conf * 100)), track_id)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            return sprite
+
+        text = f"{key[1] / 100:.2f}" + (f" #{track_id}" if track_id is not None else "")
+        pad = np.zeros((self.height, self.padding), dtype=np.float32)
+        coverage = np.hstack([pad, self._names[cls_id]] + [self._digits[ch] for ch in text] + [pad])
+
+        # Text over background: colour is a per-pixel mix, alpha the union of both
+        bg = np.asarray(self.bg_color, dtype=np.float32)
+        fg = np.asarray(self.text_color, dtype=np.float32)
+        cov = coverage[..., None]
+        alpha = self.bg_alpha + (1.0 - self.bg_alpha) * coverage
+        bgr = (fg * cov + bg * self.bg_alpha * (1.0 - cov)) / np.maximum(alpha, 1e-6)[..., None]
+        sprite = (bgr.astype(np.uint8), alpha.astype(np.float32))
+
+        if len(self._sprites) >= self.max_cached:
+            self._sprites.clear()
+        self._sprites[key] = sprite
+        return sprite
+
+
+def blit(frame, sprite, x, y):
+    """Alpha-blend a (bgr, alpha) sprite onto frame in place at (x, y), clipped to the frame"""
+    bgr, alpha = sprite
+    h, w = alpha.shape
+    fh, fw = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, fw), min(y + h, fh)
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = bgr[y0 - y:y1 - y, x0 - x:x1 - x]
+    a = alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+    roi = frame[y0:y1, x0:x1]
+    if a.min() >= 1.0:
+        roi[...] = src  # fully opaque: plain copy
+        return
+    a = a[..., None]
+    roi[...] = (src * a + roi * (1.0 - a)).astype(np.uint8)
+
+
+def draw_labels(frame, atlas, confs, cls_ids, boxes_xyxy, track_ids=None,
+                box_color=(0, 255, 0), thickness=3):
+    """Draw boxes with cv2 and blit label sprites above them, in place"""
+    if track_ids is None:
+        track_ids = [None] * len(confs)
+    for conf, cls_id, (x1, y1, x2, y2), track_id in zip(confs, cls_ids, boxes_xyxy, track_ids):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, thickness)
+        sprite = atlas.sprite(cls_id, conf, track_id)
+        blit(frame, sprite, x1, max(0, y1 - sprite[1].shape[0]))
+    return frame
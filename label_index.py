@@ -0,0 +1,298 @@
+"""
+Columnar label index for YOLO datasets.
+Parses every labels/*.txt file in one pass into flat NumPy columns
+(image id, class, normalized x/y/w/h), so per-class counts, box-size
+statistics and class-stratified train/val splits are a few array
+operations even for 100k-image datasets.
+
+Usage:
+    python label_index.py stats --src coco128 --data coco128_split.yaml
+    python label_index.py split --src coco128 --dst coco128_split --val 0.2
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from dataset_builder import DatasetBuilder, format_stats, list_images, pair_entries
+
+# COCO size buckets (box area in pixels at the training image size)
+SMALL_AREA = 32 ** 2
+MEDIUM_AREA = 96 ** 2
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def _parse(text):
+    """(n, 5) rows of one label file; the common all-boxes case is a single NumPy conversion"""
+    lines = [line.split() for line in text.splitlines()]
+    lines = [tokens for tokens in lines if tokens]
+    if not lines:
+        return None
+    # Every line must be a 5-value box: a 4- and a 6-value line also add up to 10 tokens
+    if all(len(tokens) == 5 for tokens in lines):
+        return [v for tokens in lines for v in tokens]
+    # Polygon (segment) labels: reduce each line to its bounding box; malformed lines are skipped
+    rows = []
+    for tokens in lines:
+        values = [float(v) for v in tokens]
+        if len(values) == 5:
+            rows.extend(values)
+        elif len(values) >= 7 and len(values) % 2:  # class + (x, y) pairs
+            xs, ys = values[1::2], values[2::2]
+            x1, x2, y1, y2 = min(xs), max(xs), min(ys), max(ys)
+            rows.extend([values[0], (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+    return rows
+
+
+class LabelIndex:
+    """Flat columns of all boxes plus the image list they refer to"""
+
+    def __init__(self, images, image_id, cls, boxes):
+        self.images = list(images)      # image paths (or label stems)
+        self.image_id = image_id        # (n_boxes,) int32
+        self.cls = cls                  # (n_boxes,) int32
+        self.boxes = boxes              # (n_boxes, 4) float32 normalized xywh
+
+    @classmethod
+    def from_dataset(cls, img_dir, lab_dir, workers=None):
+        """Index every image in img_dir (images without a label file have no boxes)"""
+        images = list_images(img_dir)
+        return cls.from_label_files(images, [Path(lab_dir) / (p.stem + ".txt") for p in images], workers)
+
+    @classmethod
+    def from_labels(cls, lab_dir, workers=None):
+        """Index a labels directory on its own (one entry per label file)"""
+        files = sorted(Path(lab_dir).glob("*.txt"))
+        return cls.from_label_files([f.stem for f in files], files, workers)
+
+    @classmethod
+    def from_label_files(cls, images, label_files, workers=None):
+        workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            texts = list(pool.map(_read, label_files, chunksize=256))
+
+        tokens, counts = [], np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            rows = _parse(text)
+            if rows:
+                tokens.extend(rows)
+                counts[i] = len(rows) // 5
+
+        table = np.array(tokens, dtype=np.float32).reshape(-1, 5)
+        image_id = np.repeat(np.arange(len(texts), dtype=np.int32), counts)
+        return cls(images, image_id, table[:, 0].astype(np.int32), table[:, 1:])
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        return cls(data["images"].tolist(), data["image_id"], data["cls"], data["boxes"])
+
+    def save(self, path):
+        np.savez_compressed(path, images=np.array([str(p) for p in self.images]),
+                            image_id=self.image_id, cls=self.cls, boxes=self.boxes)
+
+    def __len__(self):
+        return len(self.images)
+
+    @property
+    def num_classes(self):
+        return int(self.cls.max()) + 1 if len(self.cls) else 0
+
+    def incidence(self, num_classes=None):
+        """(n_images, n_classes) bool matrix: image contains class"""
+        m = np.zeros((len(self.images), num_classes or self.num_classes), dtype=bool)
+        m[self.image_id, self.cls] = True
+        return m
+
+    def class_stats(self, num_classes=None, imgsz=640):
+        """Per-class box/image counts and box-size statistics as a dict of arrays"""
+        nc = num_classes or self.num_classes
+        boxes = np.bincount(self.cls, minlength=nc)
+        images = self.incidence(nc).sum(axis=0)
+
+        w, h = self.boxes[:, 2], self.boxes[:, 3]
+        area = w * h
+        pixel_area = area * imgsz * imgsz
+        safe = np.maximum(boxes, 1)
+
+        # Median area per class: sort by (class, area) once, then index each class's middle
+        order = np.lexsort((area, self.cls))
+        starts = np.concatenate([[0], np.cumsum(boxes)[:-1]])
+        mid = starts + np.maximum(boxes - 1, 0) // 2
+        median_area = np.zeros(nc, dtype=np.float32)
+        present = boxes > 0
+        median_area[present] = area[order][mid[present]]
+
+        return {
+            "boxes": boxes,
+            "images": images,
+            "mean_w": np.bincount(self.cls, weights=w, minlength=nc) / safe,
+            "mean_h": np.bincount(self.cls, weights=h, minlength=nc) / safe,
+            "mean_area": np.bincount(self.cls, weights=area, minlength=nc) / safe,
+            "median_area": median_area,
+            "small": np.bincount(self.cls[pixel_area < SMALL_AREA], minlength=nc),
+            "medium": np.bincount(self.cls[(pixel_area >= SMALL_AREA) & (pixel_area < MEDIUM_AREA)], minlength=nc),
+            "large": np.bincount(self.cls[pixel_area >= MEDIUM_AREA], minlength=nc),
+        }
+
+    def boxes_per_image(self):
+        return np.bincount(self.image_id, minlength=len(self.images))
+
+
+def stratified_split(index, val_fraction=0.2, min_val=0, seed=42, num_classes=None, min_per_class=1):
+    """
+    Class-stratified (multi-label) train/val split by iterative stratification:
+    take the class with the fewest unassigned images, send each of its images
+    to the subset that still needs that class most, repeat. Every class in at
+    least two images asks val for min_per_class of them, so rare classes are
+    not left out of validation; those requests never grow val past n_val
+    images, so a class can still miss val when the fraction is too small.
+    Returns a bool mask over index.images, True = val.
+    """
+    rng = np.random.default_rng(seed)
+    m = index.incidence(num_classes)
+    n = len(index)
+    n_val = min(n, max(min_val, int(val_fraction * n)))
+
+    class_images = m.sum(axis=0).astype(np.float64)
+    need_val = class_images * (n_val / n if n else 0)
+    need_val = np.where(class_images >= 2, np.maximum(need_val, np.minimum(min_per_class, class_images - 1)), need_val)
+    need = np.stack([class_images - need_val, need_val])
+    need_total = np.array([n - n_val, n_val], dtype=np.float64)
+    subset = np.full(n, -1, dtype=np.int8)
+    remaining = class_images.copy()
+
+    while (remaining > 0).any():
+        label = int(np.argmin(np.where(remaining > 0, remaining, np.inf)))
+        members = np.flatnonzero(m[:, label] & (subset < 0))
+        rng.shuffle(members)
+        for i in members:
+            labels = np.flatnonzero(m[i])
+            if min(need_total) <= 0:
+                # One subset is full: per-class requests don't resize the split
+                s = int(need_total[0] <= 0)
+            elif need[0, label] != need[1, label]:
+                s = int(need[1, label] > need[0, label])
+            elif need_total[0] != need_total[1]:
+                s = int(need_total[1] > need_total[0])
+            else:
+                s = int(rng.integers(2))
+            subset[i] = s
+            need[s, labels] -= 1
+            need_total[s] -= 1
+            remaining[labels] -= 1
+
+    # Images without labels fill whatever each subset still needs
+    unlabeled = np.flatnonzero(subset < 0)
+    rng.shuffle(unlabeled)
+    fill_val = int(min(max(need_total[1], 0), len(unlabeled)))
+    subset[unlabeled[:fill_val]] = 1
+    subset[unlabeled[fill_val:]] = 0
+    return subset == 1
+
+
+def class_names(data_yaml):
+    if not data_yaml:
+        return {}
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        names = yaml.safe_load(f).get("names", {})
+    return dict(enumerate(names)) if isinstance(names, list) else {int(k): v for k, v in names.items()}
+
+
+def print_stats(index, names, imgsz):
+    nc = max(index.num_classes, len(names))
+    stats = index.class_stats(nc, imgsz)
+    per_image = index.boxes_per_image()
+    print(f"\n📊 {len(index)} images, {len(index.cls)} boxes, "
+          f"{int((per_image == 0).sum())} images without labels, {int((stats['boxes'] > 0).sum())} classes present")
+    print(f"   Boxes per image: mean {per_image.mean():.2f}, max {per_image.max() if len(per_image) else 0}")
+    print(f"\n   {'id':>3} {'class':<16} {'images':>7} {'boxes':>7} {'mean w':>7} {'mean h':>7} "
+          f"{'med area':>9} {'small':>6} {'medium':>6} {'large':>6}")
+    for c in np.flatnonzero(stats["boxes"]):
+        print(f"   {c:>3} {names.get(int(c), str(c)):<16} {stats['images'][c]:>7} {stats['boxes'][c]:>7} "
+              f"{stats['mean_w'][c]:>7.3f} {stats['mean_h'][c]:>7.3f} {stats['median_area'][c]:>9.4f} "
+              f"{stats['small'][c]:>6} {stats['medium'][c]:>6} {stats['large'][c]:>6}")
+
+
+def split_balance(index, val_mask, num_classes):
+    """Per-class share of images in val and ids of classes missing from val, for classes in at least 2 images"""
+    m = index.incidence(num_classes)
+    total = m.sum(axis=0)
+    in_val = m[val_mask].sum(axis=0)
+    present = total >= 2
+    share = in_val[present] / total[present]
+    missing = np.flatnonzero((in_val == 0) & present)
+    return share, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar YOLO label index: class statistics and stratified splits")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats = sub.add_parser("stats", help="Per-class counts and box statistics")
+    split = sub.add_parser("split", help="Class-stratified train/val split")
+    for p in (stats, split):
+        p.add_argument("--src", default="coco128", help="Dataset root with images/ and labels/ (default: coco128)")
+        p.add_argument("--split", default="train2017", help="Source split folder (default: train2017)")
+        p.add_argument("--data", default="coco128_split.yaml", help="Dataset YAML for class names")
+        p.add_argument("--index", default=None, help="Load/save the index .npz here")
+    stats.add_argument("--imgsz", type=int, default=640, help="Image size for small/medium/large (default: 640)")
+    split.add_argument("--dst", default="coco128_split", help="Output dataset folder (default: coco128_split)")
+    split.add_argument("--val", type=float, default=0.2, help="Validation fraction (default: 0.2)")
+    split.add_argument("--min-val", type=int, default=10, help="Minimum validation images (default: 10)")
+    split.add_argument("--min-per-class", type=int, default=1,
+                       help="Val images requested per class present in 2+ images (default: 1)")
+    split.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    img_dir = Path(args.src) / "images" / args.split
+    lab_dir = Path(args.src) / "labels" / args.split
+    if args.index and Path(args.index).exists():
+        index = LabelIndex.load(args.index)
+        source = args.index
+    else:
+        index = LabelIndex.from_dataset(img_dir, lab_dir)
+        source = lab_dir
+        if args.index:
+            index.save(args.index)
+    print(f"📇 Indexed {len(index)} images / {len(index.cls)} boxes from {source} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    names = class_names(args.data if Path(args.data).exists() else None)
+    if args.command == "stats":
+        print_stats(index, names, args.imgsz)
+        return
+
+    nc = max(index.num_classes, len(names))
+    val_mask = stratified_split(index, args.val, args.min_val, args.seed, nc, args.min_per_class)
+    images = [Path(p) for p in index.images]
+    train = [p for p, v in zip(images, val_mask) if not v]
+    val = [p for p, v in zip(images, val_mask) if v]
+
+    share, missing = split_balance(index, val_mask, nc)
+    print(f"\n✂️  Stratified split: {len(train)} train / {len(val)} val ({len(val) / len(images):.1%})")
+    print(f"   Val share per class: mean {share.mean():.2f}, std {share.std():.3f}, "
+          f"{len(missing)} classes (in 2+ images) missing from val")
+    if len(missing):
+        print(f"   ⚠️  Too few val images for: {', '.join(names.get(int(c), str(c)) for c in missing)} "
+              f"(raise --val to cover them)")
+
+    entries = pair_entries(train, lab_dir, "train") + pair_entries(val, lab_dir, "val")
+    stats_out = DatasetBuilder(args.dst).build(entries)
+    print(f"✅ {args.dst}: {format_stats(stats_out)}")
+
+
+if __name__ == "__main__":
+    main()
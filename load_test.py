@@ -0,0 +1,338 @@
+"""
+Load generator and latency benchmark for the AI backend's /detect API.
+Replays images from a folder (default coco128/images/train2017) against a
+running backend and reports RPS, error rate and p50/p95/p99 latency, both
+printed and as a JSON report that can be diffed between builds.
+
+Modes:
+    --concurrency N   closed loop: N clients, each sends its next request as
+                      soon as the previous one returned (max throughput)
+    --rate R          open loop: R requests/s on a fixed schedule (or Poisson
+                      arrivals with --poisson), whatever the backend does.
+                      Latency counts from the scheduled send time, so a
+                      backend that falls behind shows up as queueing delay
+                      instead of quietly lowering the offered load.
+
+Formats:
+    json       {"image": "data:image/jpeg;base64,..."} (what the web app sends)
+    raw        image bytes as the body, Content-Type: image/jpeg
+    multipart  multipart/form-data upload, field "image"
+
+/detect results are cached by image content, so replaying 128 images mostly
+measures cache hits after the first pass: start the backend with
+DETECT_CACHE=0 to measure inference.
+
+Usage:
+    python load_test.py --concurrency 8 --duration 30
+    python load_test.py --rate 20 --duration 60 --format raw
+    python load_test.py --concurrency 8 --out runs/loadtest/new.json --compare runs/loadtest/baseline.json
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import mimetypes
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+from urllib3 import encode_multipart_formdata
+
+FORMATS = ('json', 'raw', 'multipart')
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Report fields shown by --compare: (key path, label, lower is better)
+COMPARED = [
+    (('rps',), 'RPS', False),
+    (('error_rate',), 'error rate', True),
+    (('latency_ms', 'p50'), 'p50 ms', True),
+    (('latency_ms', 'p95'), 'p95 ms', True),
+    (('latency_ms', 'p99'), 'p99 ms', True),
+    (('latency_ms', 'max'), 'max ms', True),
+]
+
+
+def load_payloads(img_dir, fmt, limit=None):
+    """Request bodies built once up front, so the client spends no time encoding: [(name, body, content type)]"""
+    paths = sorted(p for p in Path(img_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)[:limit]
+    payloads = []
+    for path in paths:
+        data = path.read_bytes()
+        mime = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if fmt == 'json':
+            image = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+            body, content_type = json.dumps({'image': image}).encode(), 'application/json'
+        elif fmt == 'raw':
+            body, content_type = data, mime
+        else:
+            body, content_type = encode_multipart_formdata({'image': (path.name, data, mime)})
+        payloads.append((path.name, body, content_type))
+    return payloads
+
+
+def send(session, url, payload, timeout):
+    """POST one payload; returns (status code or None, error or None, model version)"""
+    _, body, content_type = payload
+    try:
+        response = session.post(url, data=body, headers={'Content-Type': content_type}, timeout=timeout)
+    except requests.RequestException as e:
+        return None, type(e).__name__, None
+    if response.status_code != 200:
+        return response.status_code, f"HTTP {response.status_code}", None
+    try:
+        result = response.json()
+    except ValueError:
+        return response.status_code, 'invalid JSON', None
+    if not result.get('success'):
+        return response.status_code, result.get('error', 'success=false'), None
+    return response.status_code, None, result.get('model_version')
+
+
+def run_closed(url, payloads, concurrency, duration, total, timeout):
+    """N clients back to back; samples are (sent at, latency s, queue s, status, error, model)"""
+    samples = []
+    counter = itertools.count()
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def client():
+        session = requests.Session()
+        while True:
+            i = next(counter)
+            sent = time.perf_counter()
+            if (total and i >= total) or (deadline and sent >= deadline):
+                return
+            status, error, model = send(session, url, payloads[i % len(payloads)], timeout)
+            samples.append((sent - start, time.perf_counter() - sent, 0.0, status, error, model))
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def run_open(url, payloads, rate, duration, total, timeout, max_inflight, poisson=False, seed=0):
+    """Requests on a fixed arrival schedule; latency counts from the scheduled time"""
+    samples = []
+    local = threading.local()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+
+    def task(i, scheduled):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        sent = time.perf_counter()
+        status, error, model = send(local.session, url, payloads[i % len(payloads)], timeout)
+        done = time.perf_counter()
+        samples.append((scheduled - start, done - scheduled, sent - scheduled, status, error, model))
+
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        scheduled = start
+        for i in itertools.count():
+            if (total and i >= total) or (duration and scheduled - start >= duration):
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, i, scheduled)
+            scheduled += rng.expovariate(rate) if poisson else 1.0 / rate
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed, warmup=0.0):
+    """RPS, error rate and latency percentiles of the samples sent after the warm-up"""
+    measured = [s for s in samples if s[0] >= warmup]
+    if not measured:
+        return {'requests': 0}
+    window = max(max(s[0] + s[1] for s in measured) - warmup, 1e-9)
+    latency = np.array([s[1] for s in measured]) * 1000
+    queue = np.array([s[2] for s in measured]) * 1000
+    ok = latency[np.array([s[4] is None for s in measured], dtype=bool)]
+    errors = Counter(s[4] for s in measured if s[4] is not None)
+
+    def percentiles(values):
+        if not len(values):
+            return None
+        p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+        return {'mean': round(float(values.mean()), 2), 'p50': round(float(p50), 2), 'p90': round(float(p90), 2),
+                'p95': round(float(p95), 2), 'p99': round(float(p99), 2), 'max': round(float(values.max()), 2)}
+
+    return {
+        'requests': len(measured),
+        'ok': len(ok),
+        'errors': sum(errors.values()),
+        'error_rate': round(sum(errors.values()) / len(measured), 4),
+        'error_kinds': dict(errors.most_common()),
+        'window_s': round(window, 2),
+        'elapsed_s': round(elapsed, 2),
+        'rps': round(len(measured) / window, 2),
+        'ok_rps': round(len(ok) / window, 2),
+        'latency_ms': percentiles(ok),           # successful requests only
+        'queue_ms': percentiles(queue) if queue.any() else None,  # open loop: scheduled -> sent
+        'models': dict(Counter(s[5] for s in measured if s[5] is not None)),
+    }
+
+
+def wait_ready(base_url, timeout):
+    """Wait until the backend has loaded its model (/ready, or /health on older builds)"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            response = requests.get(f"{base_url}/ready", timeout=5)
+            if response.status_code == 404:
+                response = requests.get(f"{base_url}/health", timeout=5)
+            if response.status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        if time.time() > deadline:
+            return False
+        time.sleep(0.5)
+
+
+def server_info(base_url):
+    """Model and worker details from /health, recorded with the report"""
+    try:
+        health = requests.get(f"{base_url}/health", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return {}
+    return {key: health.get(key) for key in ('model', 'batching', 'cache', 'adaptive', 'worker') if key in health}
+
+
+def lookup(report, path):
+    value = report
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def print_summary(report):
+    s = report['summary']
+    config = report['config']
+    load = (f"{config['concurrency']} concurrent" if config['mode'] == 'closed'
+            else f"{config['rate']} req/s {'poisson' if config['poisson'] else 'fixed'}")
+    print("\n" + "=" * 70)
+    print(f"📋 /detect load test ({load}, {config['format']}, {config['images']} images)")
+    print("=" * 70)
+    if not s['requests']:
+        print("   No requests completed")
+        return
+    print(f"   Requests:   {s['requests']} in {s['window_s']}s ({s['ok']} ok, {s['errors']} errors, "
+          f"error rate {s['error_rate'] * 100:.2f}%)")
+    print(f"   Throughput: {s['rps']:.2f} req/s ({s['ok_rps']:.2f} ok/s)")
+    if s['latency_ms']:
+        lat = s['latency_ms']
+        print(f"   Latency:    p50 {lat['p50']:.1f} ms, p95 {lat['p95']:.1f} ms, p99 {lat['p99']:.1f} ms, "
+              f"max {lat['max']:.1f} ms (mean {lat['mean']:.1f})")
+    if s['queue_ms']:
+        print(f"   Client queueing: p50 {s['queue_ms']['p50']:.1f} ms, p99 {s['queue_ms']['p99']:.1f} ms "
+              f"(raise --max-inflight if this grows while the server is idle)")
+    for kind, count in s['error_kinds'].items():
+        print(f"   ⚠️  {count} x {kind}")
+    if s['models']:
+        print(f"   Models:     {', '.join(f'{m} ({n})' for m, n in s['models'].items())}")
+
+
+def print_comparison(report, baseline):
+    print(f"\n📊 Compared with {baseline['config'].get('label') or baseline['created']}")
+    print(f"   {'':12} {'baseline':>10} {'this run':>10} {'change':>9}")
+    for path, label, lower_is_better in COMPARED:
+        old, new = lookup(baseline['summary'], path), lookup(report['summary'], path)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ''
+        better = (new < old) if lower_is_better else (new > old)
+        marker = '' if new == old else (' ✅' if better else ' ❌')
+        print(f"   {label:12} {old:>10} {new:>10} {change:>9}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the /detect API and report RPS, errors and latency')
+    parser.add_argument('--url', default='http://localhost:5001', help='Backend base URL (default: http://localhost:5001)')
+    parser.add_argument('--images', default='coco128/images/train2017',
+                        help='Images to replay, in order (default: coco128/images/train2017)')
+    parser.add_argument('--limit', type=int, default=None, help='Use only the first N images')
+    parser.add_argument('--format', choices=FORMATS, default='json', help='Upload format (default: json)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--concurrency', type=int, default=None, help='Closed loop with N concurrent clients (default: 4)')
+    mode.add_argument('--rate', type=float, default=None, help='Open loop at R requests/s')
+    parser.add_argument('--poisson', action='store_true', help='Poisson arrivals instead of a fixed interval (--rate)')
+    parser.add_argument('--max-inflight', type=int, default=64,
+                        help='Max concurrent requests in open loop (default: 64)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to send for (default: 30)')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after N requests instead')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds excluded from the stats (default: 2)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument('--label', default=None, help='Build/run label stored in the report')
+    parser.add_argument('--out', default=None, help='JSON report (default: runs/loadtest/<mode>_<format>_<time>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier JSON report to compare against')
+    parser.add_argument('--samples', action='store_true', help='Also store every request in the report')
+    args = parser.parse_args()
+
+    if args.requests:
+        args.duration = None
+    concurrency = args.concurrency or (None if args.rate else 4)
+    base_url = args.url.rstrip('/')
+
+    payloads = load_payloads(args.images, args.format, args.limit)
+    if not payloads:
+        print(f"❌ Error: no images found in {args.images}")
+        return
+    print(f"📸 {len(payloads)} images from {args.images} ({args.format}, "
+          f"{sum(len(p[1]) for p in payloads) / len(payloads) / 1024:.0f} KB per request)")
+
+    print(f"🏥 Waiting for {base_url} to be ready...")
+    if not wait_ready(base_url, timeout=120):
+        print("❌ Backend not ready! Start it with: cd ai-backend && DETECT_CACHE=0 python3 app.py")
+        return
+    server = server_info(base_url)
+
+    url = f"{base_url}/detect"
+    limit = f"{args.requests} requests" if args.requests else f"{args.duration:g}s"
+    if concurrency:
+        print(f"🚀 {concurrency} concurrent clients for {limit}...")
+        samples, elapsed = run_closed(url, payloads, concurrency, args.duration, args.requests, args.timeout)
+    else:
+        print(f"🚀 {args.rate:g} req/s ({'poisson' if args.poisson else 'fixed'}) for {limit}...")
+        samples, elapsed = run_open(url, payloads, args.rate, args.duration, args.requests, args.timeout,
+                                    args.max_inflight, args.poisson)
+    samples.sort(key=lambda s: s[0])
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'label': args.label, 'url': url, 'format': args.format, 'images': len(payloads),
+            'mode': 'closed' if concurrency else 'open', 'concurrency': concurrency, 'rate': args.rate,
+            'poisson': args.poisson, 'duration_s': args.duration, 'requests': args.requests,
+            'warmup_s': args.warmup, 'timeout_s': args.timeout,
+        },
+        'server': server,
+        'summary': summarize(samples, elapsed, args.warmup),
+    }
+    if args.samples:
+        report['samples'] = [{'t': round(t, 4), 'ms': round(lat * 1000, 2), 'queue_ms': round(q * 1000, 2),
+                              'status': status, 'error': error} for t, lat, q, status, error, _ in samples]
+    print_summary(report)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+
+    out = Path(args.out or Path('runs') / 'loadtest' /
+               f"{report['config']['mode']}_{args.format}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📁 Report: {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+Offline accuracy-vs-latency evaluation of candidate detection models.
+Runs every model at every input size over the val split of a YOLO dataset
+(default coco128_split.yaml) under the same conditions: same images, CPU,
+thread count and thresholds. mAP50 and mAP50-95 are computed here from the
+raw predictions with vectorized IoU matching, so .pt, ONNX and OpenVINO
+models are all scored by the same code. Per-image latency is timed over full
+predict calls (preprocess, inference, NMS) at the serving confidence
+threshold. The results table marks the Pareto front: configurations no other
+one beats on both mean latency and mAP50-95.
+
+Predicted classes are mapped to the dataset's classes by name, so
+COCO-pretrained and fine-tuned models are scored against the same labels.
+Exported models with a fixed input size only run at that size; other sizes
+are skipped for them.
+
+Usage:
+    python model_eval.py                     # yolov8n, yolo11n, trained best.pt + its exports
+    python model_eval.py --models yolov8n.pt runs/detect/train/weights/best_int8.onnx --imgsz 416 640
+    python model_eval.py --threads 4 --name cpu4
+
+Results: runs/eval/<name>/results.csv, results.json and pareto.png.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from pathlib import Path
+
+# Full ultralytics checkpoints are pickled modules (torch >= 2.6 defaults to weights_only=True)
+os.environ.setdefault("TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD", "1")
+
+import cv2
+import numpy as np
+import torch
+
+from label_index import LabelIndex, class_names
+from model_stats import mark_pareto, model_size
+from shards import dataset_splits, label_path
+
+from ultralytics import YOLO
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+RECALL_POINTS = np.linspace(0, 1, 101)  # COCO-style interpolation
+PRETRAINED = ("yolov8n.pt", "yolo11n.pt")
+TRAINED = Path("runs/detect/train/weights/best.pt")
+COLUMNS = ("model", "format", "imgsz", "map50", "map50_95", "mean_ms", "p50_ms", "p95_ms", "size_mb", "pareto")
+
+
+def default_models():
+    """Pretrained baselines plus our trained weights and whichever exports of them exist"""
+    models = list(PRETRAINED)
+    if TRAINED.exists():
+        models.append(str(TRAINED))
+        for name in (f"{TRAINED.stem}.onnx", f"{TRAINED.stem}_int8.onnx",
+                     f"{TRAINED.stem}_openvino_model", f"{TRAINED.stem}_int8_openvino_model"):
+            if (TRAINED.parent / name).exists():
+                models.append(str(TRAINED.parent / name))
+    return models
+
+
+def model_format(path):
+    """Inference backend name of a model path, as in ai-backend/inference.py"""
+    path = Path(path)
+    if path.suffix == ".onnx":
+        return "onnx"
+    if path.name.endswith("_openvino_model"):
+        return "openvino"
+    return "pytorch"
+
+
+def box_iou(a, b):
+    """(N, M) IoU between xyxy boxes a (N, 4) and b (M, 4)"""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_predictions(pred_boxes, pred_cls, gt_boxes, gt_cls, thresholds=IOU_THRESHOLDS):
+    """
+    (n_pred, n_thresholds) bool: prediction is a true positive at each IoU
+    threshold. Same-class pairs only; every ground-truth box and every
+    prediction is matched at most once, highest IoU first.
+    """
+    correct = np.zeros((len(pred_cls), len(thresholds)), dtype=bool)
+    if not len(pred_cls) or not len(gt_cls):
+        return correct
+    iou = box_iou(gt_boxes, pred_boxes) * (gt_cls[:, None] == pred_cls[None, :])
+    for j, t in enumerate(thresholds):
+        gt_i, pred_i = np.nonzero(iou >= t)
+        if not len(gt_i):
+            continue
+        order = np.argsort(-iou[gt_i, pred_i], kind="stable")
+        gt_i, pred_i = gt_i[order], pred_i[order]
+        # Keep each prediction's best pair, then each ground truth's best remaining one
+        keep = np.sort(np.unique(pred_i, return_index=True)[1])
+        gt_i, pred_i = gt_i[keep], pred_i[keep]
+        keep = np.unique(gt_i, return_index=True)[1]
+        correct[pred_i[keep], j] = True
+    return correct
+
+
+def average_precision(correct, conf, pred_cls, gt_counts):
+    """(n_classes with labels, n_thresholds) AP: precision envelope sampled at 101 recall points"""
+    order = np.argsort(-conf, kind="stable")
+    correct, pred_cls = correct[order], pred_cls[order]
+    classes = np.flatnonzero(gt_counts)
+    ap = np.zeros((len(classes), correct.shape[1]))
+    for k, c in enumerate(classes):
+        tp = correct[pred_cls == c]
+        if not len(tp):
+            continue
+        tpc = np.cumsum(tp, axis=0)
+        recall = tpc / gt_counts[c]
+        precision = tpc / np.arange(1, len(tp) + 1)[:, None]
+        # Best precision at this recall or any higher one
+        envelope = np.flip(np.maximum.accumulate(np.flip(precision, axis=0), axis=0), axis=0)
+        for j in range(correct.shape[1]):
+            idx = np.searchsorted(recall[:, j], RECALL_POINTS, side="left")
+            hit = idx < len(tp)
+            ap[k, j] = envelope[idx[hit], j].sum() / len(RECALL_POINTS)
+    return ap
+
+
+def load_ground_truth(data_yaml):
+    """Val image paths, per-image (classes, normalized xywh boxes) and the dataset's class names"""
+    img_dir = dataset_splits(data_yaml).get("val")
+    if img_dir is None or not img_dir.exists():
+        raise FileNotFoundError(f"no val split in {data_yaml} (run: python split_coco128.py)")
+    index = LabelIndex.from_dataset(img_dir, label_path(next(img_dir.iterdir())).parent)
+    counts = np.bincount(index.image_id, minlength=len(index))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    gt = [(index.cls[s:s + n], index.boxes[s:s + n]) for s, n in zip(starts, counts)]
+    return index.images, gt, class_names(data_yaml)
+
+
+def drop_unreadable(images, gt):
+    """Leave out images cv2 cannot decode (corrupt or unreadable files); returns images, gt, skipped paths"""
+    readable = [cv2.imread(str(path)) is not None for path in images]
+    skipped = [path for path, ok in zip(images, readable) if not ok]
+    return ([p for p, ok in zip(images, readable) if ok], [g for g, ok in zip(gt, readable) if ok], skipped)
+
+
+def class_mapping(model_names, names):
+    """Model class id -> dataset class id (-1 = not in the dataset), matched by name"""
+    by_name = {name: i for i, name in names.items()}
+    mapping = np.full(max(model_names) + 1, -1, dtype=np.int64)
+    for i, name in model_names.items():
+        mapping[i] = by_name.get(name, -1)
+    return mapping
+
+
+def to_xyxy(boxes, w, h):
+    """Normalized xywh -> pixel xyxy"""
+    xy, wh = boxes[:, :2] * (w, h), boxes[:, 2:] * (w, h)
+    return np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+
+
+def score(model, images, gt, names, imgsz):
+    """mAP50 and mAP50-95 over the images (conf 0.001, like ultralytics val)"""
+    mapping = class_mapping(model.names, names)
+    correct, conf, pred_cls = [], [], []
+    gt_counts = np.zeros(max(len(names), int(mapping.max()) + 1), dtype=np.int64)
+    for path, (gt_cls, gt_boxes) in zip(images, gt):
+        im = cv2.imread(str(path))
+        boxes = model.predict(im, imgsz=imgsz, conf=0.001, iou=0.7, max_det=300, device="cpu",
+                              verbose=False)[0].boxes
+        cls = mapping[boxes.cls.numpy().astype(np.int64)]
+        known = cls >= 0
+        xyxy, cls = boxes.xyxy.numpy()[known], cls[known]
+        gt_cls = gt_cls.astype(np.int64)
+        correct.append(match_predictions(xyxy, cls, to_xyxy(gt_boxes, im.shape[1], im.shape[0]), gt_cls))
+        conf.append(boxes.conf.numpy()[known])
+        pred_cls.append(cls)
+        gt_counts += np.bincount(gt_cls, minlength=len(gt_counts))
+    ap = average_precision(np.concatenate(correct), np.concatenate(conf), np.concatenate(pred_cls), gt_counts)
+    if not len(ap):
+        return 0.0, 0.0
+    return float(ap[:, 0].mean()), float(ap.mean())
+
+
+def measure_latency(model, images, imgsz, conf, runs, warmup):
+    """Per-image CPU latency (ms) of full predict calls at the serving confidence"""
+    frames = [cv2.imread(str(p)) for p in images[:runs]]
+    for i in range(warmup):
+        model.predict(frames[i % len(frames)], imgsz=imgsz, conf=conf, device="cpu", verbose=False)
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        model.predict(frames[i % len(frames)], imgsz=imgsz, conf=conf, device="cpu", verbose=False)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.array(times)
+
+
+def evaluate(model_path, sizes, images, gt, names, conf, runs, warmup):
+    """One row per input size the model can run at"""
+    rows, done = [], set()
+    for imgsz in sizes:
+        model = YOLO(model_path, task="detect")
+        model.predict(cv2.imread(str(images[0])), imgsz=imgsz, device="cpu", verbose=False)
+        used = max(model.predictor.imgsz)
+        if used != imgsz:
+            # Static export: evaluate it once, at the size it was exported with
+            print(f"   ⚠️  {Path(model_path).name} has a fixed input size of {used}, not {imgsz}")
+        if used in done:
+            continue
+        done.add(used)
+        start = time.perf_counter()
+        map50, map50_95 = score(model, images, gt, names, used)
+        times = measure_latency(model, images, used, conf, runs, warmup)
+        row = {
+            "model": Path(model_path).name, "format": model_format(model_path), "imgsz": used,
+            "map50": round(map50, 4), "map50_95": round(map50_95, 4),
+            "mean_ms": round(float(times.mean()), 2), "p50_ms": round(float(np.percentile(times, 50)), 2),
+            "p95_ms": round(float(np.percentile(times, 95)), 2),
+            "size_mb": round(model_size(model_path) / 1e6, 2), "path": str(model_path),
+        }
+        print(f"   ✅ imgsz={used}: mAP50={row['map50']:.4f} mAP50-95={row['map50_95']:.4f} "
+              f"latency {row['mean_ms']:.1f} ms mean, {row['p95_ms']:.1f} ms p95 "
+              f"({time.perf_counter() - start:.0f}s)")
+        rows.append(row)
+    return rows
+
+
+def write_results(rows, out):
+    rows = sorted(rows, key=lambda r: r["mean_ms"])
+    with open(out / "results.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[*COLUMNS, "path"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(out / "results.json", "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    return rows
+
+
+def print_table(rows):
+    cells = [[("*" if r[h] is True else "" if r[h] is False else str(r[h])) for h in COLUMNS] for r in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(COLUMNS)]
+    print("  ".join(h.ljust(w) for h, w in zip(COLUMNS, widths)))
+    for c in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(c, widths)))
+
+
+def plot_pareto(rows, out, title):
+    """mAP50-95 vs mean latency, one line per model through its input sizes, Pareto front dashed"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️  matplotlib not installed, skipping the plot")
+        return None
+    fig, ax = plt.subplots(figsize=(9, 5.5))
+    for model in dict.fromkeys(r["model"] for r in rows):
+        points = sorted((r for r in rows if r["model"] == model), key=lambda r: r["mean_ms"])
+        ax.plot([r["mean_ms"] for r in points], [r["map50_95"] for r in points], marker="o", label=model)
+        for r in points:
+            ax.annotate(str(r["imgsz"]), (r["mean_ms"], r["map50_95"]), textcoords="offset points",
+                        xytext=(4, 4), fontsize=8)
+    front = sorted((r for r in rows if r["pareto"]), key=lambda r: r["mean_ms"])
+    ax.plot([r["mean_ms"] for r in front], [r["map50_95"] for r in front], "k--", marker="s", markersize=11,
+            markerfacecolor="none", linewidth=1, label="Pareto front")
+    ax.set_xlabel("CPU latency per image, mean (ms)")
+    ax.set_ylabel("mAP50-95")
+    ax.set_title(title)
+    ax.grid(alpha=0.3)
+    ax.legend(fontsize=8)
+    fig.tight_layout()
+    path = out / "pareto.png"
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy vs CPU latency of candidate models across input sizes")
+    parser.add_argument("--models", nargs="+", default=None,
+                        help="Weights / exported models (default: yolov8n.pt, yolo11n.pt, best.pt and its exports)")
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[320, 416, 512, 640],
+                        help="Input sizes (default: 320 416 512 640)")
+    parser.add_argument("--data", default="coco128_split.yaml", help="Dataset YAML (default: coco128_split.yaml)")
+    parser.add_argument("--conf", type=float, default=0.5,
+                        help="Confidence threshold for the latency runs (default: 0.5, as the AI backend)")
+    parser.add_argument("--runs", type=int, default=100, help="Timed predictions per model and size (default: 100)")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed predictions first (default: 5)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for torch (default: all)")
+    parser.add_argument("--name", default=None, help="Run name (default: timestamp)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    try:
+        images, gt, names = load_ground_truth(args.data)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        return
+    images, gt, skipped = drop_unreadable(images, gt)
+    if skipped:
+        print(f"⚠️  Skipping {len(skipped)} unreadable image(s), e.g. {skipped[0]}")
+    if not images:
+        print("❌ Error: no readable val images")
+        return
+    models = args.models or default_models()
+    print(f"🎯 {len(images)} val images, {sum(len(c) for c, _ in gt)} boxes from {args.data}; "
+          f"{len(models)} models x imgsz {args.imgsz}, {torch.get_num_threads()} torch threads")
+
+    rows = []
+    for model_path in models:
+        print(f"\n📊 {model_path}")
+        try:
+            rows.extend(evaluate(model_path, args.imgsz, images, gt, names, args.conf, args.runs, args.warmup))
+        except Exception as e:  # missing file, failed download, unsupported export...
+            print(f"   ❌ Skipped: {e}")
+    if not rows:
+        print("\n❌ No model could be evaluated")
+        return
+
+    out = Path("runs") / "eval" / (args.name or time.strftime("%Y%m%d-%H%M%S"))
+    out.mkdir(parents=True, exist_ok=True)
+    mark_pareto(rows, cost_key="mean_ms")
+    rows = write_results(rows, out)
+    with open(out / "eval.json", "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "data": str(Path(args.data).resolve()),
+                   "images": len(images), "skipped_images": [str(p) for p in skipped], "models": models, "imgsz": args.imgsz, "conf": args.conf,
+                   "runs": args.runs, "threads": torch.get_num_threads()}, f, indent=2)
+
+    print("\n" + "=" * 70)
+    print("📋 Accuracy vs latency (fastest first, * = Pareto front)")
+    print("=" * 70)
+    print_table(rows)
+    plot = plot_pareto(rows, out, f"{Path(args.data).stem} val, {len(images)} images, "
+                                  f"{torch.get_num_threads()} CPU threads")
+    print(f"\n📁 {out / 'results.csv'}" + (f", {plot}" if plot else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Helpers shared by the model comparison scripts (sweep.py, quantize.py,
+model_eval.py): on-disk model size and the accuracy/latency Pareto front.
+"""
+
+import math
+from pathlib import Path
+
+
+def model_size(path):
+    """Bytes of a model file or exported model directory"""
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def mark_pareto(rows, cost_key="infer_ms"):
+    """Flag rows no other row beats on both speed (cost_key, lower is better) and mAP50-95"""
+    def cost(r):
+        return r[cost_key] if r[cost_key] is not None else math.inf
+
+    scored = [r for r in rows if r["map50_95"] is not None]
+    for r in rows:
+        r["pareto"] = r in scored and not any(
+            o["map50_95"] >= r["map50_95"] and cost(o) <= cost(r)
+            and (o["map50_95"] > r["map50_95"] or cost(o) < cost(r))
+            for o in scored)
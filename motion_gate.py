@@ -0,0 +1,67 @@
+"""
+Motion gate for realtime_ko.py.
+Compares a tiny grayscale copy of each frame with the frame YOLO last ran on
+and only asks for inference when enough of the scene has changed, or when
+refresh_interval has passed. On a static desk this skips almost every YOLO
+pass while anything entering the frame triggers detection immediately.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decide per frame whether the scene changed since the last inference.
+
+    threshold is the fraction of downscaled pixels whose brightness moved by
+    more than pixel_delta; refresh_interval (seconds) forces a periodic
+    inference so slow changes and lighting drift are eventually picked up.
+    """
+
+    def __init__(self, threshold=0.01, pixel_delta=25, width=96, refresh_interval=2.0):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.refresh_interval = refresh_interval
+
+        self._keyframe = None      # small grayscale frame of the last inference
+        self._last_inference = 0.0
+        self.last_change = 0.0     # changed fraction of the latest frame
+        self.stats = {'frames': 0, 'inferences': 0, 'skipped': 0, 'refreshes': 0}
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, round(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (3, 3), 0)  # suppress sensor noise
+
+    def should_infer(self, frame):
+        """True if YOLO should run on this frame; the gate then remembers it as the keyframe"""
+        self.stats['frames'] += 1
+        small = self._small_gray(frame)
+        now = time.monotonic()
+
+        if self._keyframe is None or self._keyframe.shape != small.shape:
+            reason = 'inferences'
+        else:
+            diff = cv2.absdiff(small, self._keyframe)
+            self.last_change = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+            if self.last_change > self.threshold:
+                reason = 'inferences'
+            elif now - self._last_inference >= self.refresh_interval:
+                reason = 'refreshes'
+            else:
+                self.stats['skipped'] += 1
+                return False
+
+        self.stats[reason] += 1
+        self._keyframe = small
+        self._last_inference = now
+        return True
+
+    def skip_ratio(self):
+        return self.stats['skipped'] / self.stats['frames'] if self.stats['frames'] else 0.0
@@ -0,0 +1,253 @@
+"""
+INT8 post-training quantization for the trained detector.
+Exports best.pt to FP32, builds an INT8 copy calibrated on images from the
+validation split, then measures both on the same data: mAP50, mAP50-95,
+mean/p95 CPU latency per image and model size. The side-by-side report is
+printed and saved next to the weights so each deployment can decide whether
+to point the AI backend at the INT8 model.
+
+Formats:
+    onnx      ONNX Runtime static QDQ quantization (per-channel int8 weights,
+              uint8 activations). The detect head's box decoding (DFL softmax,
+              anchors, concat) stays in float; its convolutions are quantized.
+    openvino  ultralytics/NNCF int8 export, calibrated on the yaml's val split
+
+Usage:
+    python quantize.py                                   # runs/detect/train/weights/best.pt, onnx
+    python quantize.py --format openvino --calibration-images 100
+    cd ai-backend && DETECT_MODEL=../runs/detect/train/weights/best_int8.onnx DETECT_BACKEND=onnx python3 app.py
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+# Full ultralytics checkpoints are pickled modules (torch >= 2.6 defaults to weights_only=True)
+os.environ.setdefault('TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD', '1')
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from model_stats import model_size
+from shards import dataset_splits, IMAGE_EXTENSIONS
+
+CALIBRATION_METHODS = ('minmax', 'entropy', 'percentile')
+
+
+def list_images(img_dir, limit=None, seed=0):
+    paths = sorted(p for p in Path(img_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit and limit < len(paths):
+        paths = sorted(random.Random(seed).sample(paths, limit))
+    return paths
+
+
+def letterbox(im, imgsz):
+    """Square letterbox exactly like ultralytics' LetterBox(auto=False): resize, center, pad 114"""
+    h, w = im.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nw, nh = round(w * r), round(h * r)
+    if (nw, nh) != (w, h):
+        im = cv2.resize(im, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (imgsz - nw) / 2, (imgsz - nh) / 2
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    return cv2.copyMakeBorder(im, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+
+def to_tensor(im, imgsz):
+    """BGR uint8 image -> (1, 3, imgsz, imgsz) float32 RGB in [0, 1], the exported graph's input"""
+    im = letterbox(im, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(im, dtype=np.float32)[None] / 255.0
+
+
+def head_float_nodes(onnx_path, num_layers):
+    """Detect-head nodes outside its conv branches (DFL, anchor decode, concat): kept in float"""
+    import onnx
+    prefix = f"/model.{num_layers - 1}/"
+    graph = onnx.load(onnx_path).graph
+    return [n.name for n in graph.node if n.name.startswith(prefix) and not n.name.startswith(prefix + 'cv')]
+
+
+def export_fp32(weights, fmt, imgsz, dynamic=False):
+    """Export (or reuse) the FP32 model for fmt; returns its path"""
+    model = YOLO(weights)
+    return model.export(format=fmt, imgsz=imgsz, dynamic=dynamic, device='cpu')
+
+
+def quantize_onnx(fp32_path, out_path, calib_paths, imgsz, num_layers, method='minmax'):
+    """Static INT8 quantization with ONNX Runtime, calibrated on calib_paths"""
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.paths = iter(calib_paths)
+
+        def get_next(self):
+            for path in self.paths:
+                im = cv2.imread(str(path))
+                if im is not None:
+                    return {self.input_name: to_tensor(im, imgsz)}
+            return None
+
+    import onnx
+    input_name = onnx.load(fp32_path).graph.input[0].name
+    methods = {'minmax': CalibrationMethod.MinMax, 'entropy': CalibrationMethod.Entropy,
+               'percentile': CalibrationMethod.Percentile}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference + constant folding make more ops quantizable
+        prepared = str(Path(tmp) / 'prepared.onnx')
+        try:
+            quant_pre_process(str(fp32_path), prepared, skip_symbolic_shape=True)
+        except Exception as e:
+            print(f"⚠️  Pre-processing skipped ({e}); quantizing the raw export")
+            shutil.copy(fp32_path, prepared)
+        quantize_static(
+            prepared, str(out_path), ImageReader(input_name),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=methods[method],
+            nodes_to_exclude=head_float_nodes(prepared, num_layers),
+            extra_options={'CalibTensorRangeSymmetric': False},
+        )
+    return str(out_path)
+
+
+def quantize_openvino(weights, data_yaml, imgsz, fraction=1.0, dynamic=False):
+    """INT8 OpenVINO IR via ultralytics (NNCF), calibrated on the yaml's val split"""
+    model = YOLO(weights)
+    return model.export(format='openvino', int8=True, data=data_yaml, imgsz=imgsz, dynamic=dynamic,
+                        fraction=fraction, device='cpu')
+
+
+def evaluate(model_path, data_yaml, imgsz):
+    """mAP50 and mAP50-95 on the yaml's val split, batch 1 on CPU"""
+    model = YOLO(model_path, task='detect')
+    metrics = model.val(data=data_yaml, imgsz=imgsz, batch=1, device='cpu', plots=False, verbose=False)
+    return float(metrics.box.map50), float(metrics.box.map)
+
+
+def measure_latency(model_path, images, imgsz, runs=50, warmup=5):
+    """Per-image CPU latency (ms) of a full predict call: preprocess, inference, NMS"""
+    model = YOLO(model_path, task='detect')
+    frames = [im for im in (cv2.imread(str(p)) for p in images) if im is not None]
+    for i in range(warmup):
+        model.predict(frames[i % len(frames)], imgsz=imgsz, device='cpu', verbose=False)
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        model.predict(frames[i % len(frames)], imgsz=imgsz, device='cpu', verbose=False)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.mean(times)), float(np.percentile(times, 95))
+
+
+def profile(label, model_path, data_yaml, imgsz, images, runs):
+    print(f"\n📊 Measuring {label}: {model_path}")
+    map50, map50_95 = evaluate(model_path, data_yaml, imgsz)
+    mean_ms, p95_ms = measure_latency(model_path, images, imgsz, runs)
+    return {'model': str(model_path), 'map50': round(map50, 4), 'map50_95': round(map50_95, 4),
+            'mean_ms': round(mean_ms, 2), 'p95_ms': round(p95_ms, 2), 'size_mb': round(model_size(model_path) / 1e6, 2)}
+
+
+def print_report(report):
+    fp32, int8 = report['fp32'], report['int8']
+    print("\n" + "=" * 70)
+    print(f"📋 INT8 vs FP32 ({report['format']}, imgsz={report['imgsz']}, "
+          f"{report['calibration_images']} calibration images)")
+    print("=" * 70)
+    print(f"   {'':10} {'mAP50':>8} {'mAP50-95':>9} {'mean ms':>8} {'p95 ms':>8} {'size MB':>8}")
+    for label, row in (('FP32', fp32), ('INT8', int8)):
+        print(f"   {label:10} {row['map50']:>8.4f} {row['map50_95']:>9.4f} {row['mean_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['size_mb']:>8.2f}")
+    delta = report['delta']
+    print(f"\n   mAP50-95 {delta['map50_95']:+.4f}, {delta['speedup']:.2f}x faster (mean), "
+          f"{delta['size_ratio']:.2f}x smaller")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='INT8 post-training quantization with an accuracy/latency report')
+    parser.add_argument('--weights', default='runs/detect/train/weights/best.pt',
+                        help='Trained weights (default: runs/detect/train/weights/best.pt)')
+    parser.add_argument('--data', default='coco128_split.yaml', help='Dataset YAML (default: coco128_split.yaml)')
+    parser.add_argument('--format', choices=['onnx', 'openvino'], default='onnx', help='Export format (default: onnx)')
+    parser.add_argument('--imgsz', type=int, default=640, help='Model input size (default: 640)')
+    parser.add_argument('--calibration-images', type=int, default=None,
+                        help='Validation images used for calibration (default: all)')
+    parser.add_argument('--calibration', choices=CALIBRATION_METHODS, default='minmax',
+                        help='ONNX activation range method (default: minmax)')
+    parser.add_argument('--runs', type=int, default=100, help='Timed predictions per model (default: 100)')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for torch (default: all)')
+    parser.add_argument('--dynamic', action='store_true', help='Export with dynamic batch/input shapes')
+    args = parser.parse_args()
+
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"❌ Error: Model not found at {weights}")
+        print("Please train the model first: python train_yolo_coco128.py --train")
+        return
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    val_dir = dataset_splits(args.data).get('val')
+    if val_dir is None or not val_dir.exists():
+        print(f"❌ Error: no val split in {args.data} (run: python split_coco128.py)")
+        return
+    calib = list_images(val_dir, args.calibration_images)
+    print(f"🎯 Calibrating on {len(calib)} images from {val_dir}")
+
+    print(f"\n📤 Exporting FP32 {args.format.upper()}...")
+    fp32 = export_fp32(str(weights), args.format, args.imgsz, args.dynamic)
+
+    print(f"\n🔧 Quantizing to INT8...")
+    start = time.perf_counter()
+    if args.format == 'onnx':
+        num_layers = len(YOLO(str(weights)).model.model)
+        int8 = quantize_onnx(fp32, weights.with_name(f"{weights.stem}_int8.onnx"), calib, args.imgsz,
+                             num_layers, args.calibration)
+    else:
+        fraction = len(calib) / len(list_images(val_dir))
+        int8 = quantize_openvino(str(weights), args.data, args.imgsz, fraction, args.dynamic)
+    print(f"✅ INT8 model: {int8} ({time.perf_counter() - start:.1f}s)")
+
+    timing_images = list_images(val_dir)
+    fp32_row = profile('FP32', fp32, args.data, args.imgsz, timing_images, args.runs)
+    int8_row = profile('INT8', int8, args.data, args.imgsz, timing_images, args.runs)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'weights': str(weights), 'format': args.format, 'imgsz': args.imgsz,
+        'calibration_images': len(calib), 'calibration': args.calibration if args.format == 'onnx' else 'nncf',
+        'threads': torch.get_num_threads(),
+        'fp32': fp32_row, 'int8': int8_row,
+        'delta': {
+            'map50': round(int8_row['map50'] - fp32_row['map50'], 4),
+            'map50_95': round(int8_row['map50_95'] - fp32_row['map50_95'], 4),
+            'speedup': round(fp32_row['mean_ms'] / int8_row['mean_ms'], 2),
+            'size_ratio': round(fp32_row['size_mb'] / int8_row['size_mb'], 2),
+        },
+    }
+    print_report(report)
+
+    out = weights.with_name(f"{weights.stem}_int8_{args.format}_report.json")
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📁 Report: {out}")
+    # The backend resolves its vocab store and relative paths from ai-backend/
+    dynamic = ' DETECT_DYNAMIC_BATCH=1' if args.dynamic else ''
+    print(f"🚀 Serve it: cd ai-backend && DETECT_MODEL={Path(int8).resolve()} DETECT_BACKEND={args.format}{dynamic} "
+          f"python3 app.py")
+
+
+if __name__ == '__main__':
+    main()
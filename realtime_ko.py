@@ -2,26 +2,76 @@
 Real-time Object Detection with Korean Labels
 Uses YOLO model to detect objects from webcam and displays Korean labels with bounding boxes.
 Supports cross-platform font loading (Windows, macOS, Linux).
+
+Usage:
+    python realtime_ko.py              # serial loop: capture -> detect -> draw -> show
+    python realtime_ko.py --pipeline   # threaded capture / inference / render stages
+    python realtime_ko.py --detect-every 5   # YOLO every 5th frame, tracker in between
+    python realtime_ko.py --target-fps 15    # adapt input size (320-640) to hold 15 FPS
+    python realtime_ko.py --motion-gate      # skip YOLO while the scene is static
+
+Headless (no window) on a video file, image directory or stream URL:
+    python realtime_ko.py --headless --source coco128/images/train2017 --save-jsonl detections.jsonl
+    python realtime_ko.py --headless --source clip.mp4 --save-video annotated.mp4 --report report.json
+    python realtime_ko.py --headless --source rtsp://camera/stream --pipeline
 """
 
+import argparse
 import cv2
+import time
 import json
-import numpy as np
 import platform
 from pathlib import Path
-import torch
 import os
+import sys
+
+from PIL import ImageFont
 
-# Fix PyTorch 2.6 weights_only issue - patch torch.load
-_original_torch_load = torch.load
-def _patched_torch_load(*args, **kwargs):
-    # Force weights_only=False for compatibility
-    kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-torch.load = _patched_torch_load
+# Shared inference backends (pytorch / onnx / openvino) from the AI backend
+sys.path.insert(0, str(Path(__file__).resolve().parent / "ai-backend"))
+from inference import Detector
+from model_registry import ModelRegistry
+from vocab_store import VocabStore
+from realtime_pipeline import Pipeline, FpsMeter
+from label_atlas import LabelAtlas, draw_labels
+from tracker import Tracker
+from adaptive import AdaptiveImgsz
+from metrics import Metrics
+from frame_source import FrameSource
+from motion_gate import MotionGate
 
-from ultralytics import YOLO
-from PIL import ImageFont, ImageDraw, Image
+parser = argparse.ArgumentParser(description='Real-time object detection with Korean labels')
+parser.add_argument('--pipeline', action='store_true',
+                    help='Run capture, inference and render in separate threads (drop-oldest queues)')
+parser.add_argument('--camera', type=int, default=0,
+                    help='Camera index (default: 0)')
+parser.add_argument('--source', default=None,
+                    help='Video file, image directory or stream URL instead of the camera')
+parser.add_argument('--motion-gate', action='store_true',
+                    help='Skip inference and reuse the last detections while the scene is unchanged')
+parser.add_argument('--motion-threshold', type=float, default=0.01,
+                    help='Fraction of changed pixels that counts as motion (default: 0.01)')
+parser.add_argument('--refresh-interval', type=float, default=2.0,
+                    help='Max seconds between inferences with --motion-gate (default: 2.0)')
+parser.add_argument('--headless', action='store_true',
+                    help='No window: process the source and print a throughput report')
+parser.add_argument('--save-video', default=None,
+                    help='Write annotated frames to this video file (.mp4 / .avi)')
+parser.add_argument('--save-jsonl', default=None,
+                    help='Write per-frame detections to this JSONL file')
+parser.add_argument('--report', default=None,
+                    help='Also write the throughput report as JSON to this file')
+parser.add_argument('--model', default=None,
+                    help='Registry version or weights path (default: active registry version, else trained best.pt)')
+parser.add_argument('--conf', type=float, default=0.35,
+                    help='Confidence threshold (default: 0.35)')
+parser.add_argument('--imgsz', type=int, default=640,
+                    help='YOLO input size, the maximum in adaptive mode (default: 640)')
+parser.add_argument('--target-fps', type=float, default=None,
+                    help='Adapt the input size (320/416/512/640) to hold this inference FPS')
+parser.add_argument('--detect-every', type=int, default=1,
+                    help='Run YOLO every N frames and track objects in between (default: 1, no tracking)')
+args = parser.parse_args()
 
 print("=" * 60)
 print("Real-time Object Detection - Korean Labels")
@@ -31,30 +81,50 @@ print("=" * 60)
 # 1) Load YOLO Model
 # ===========================
 MODEL_PATH = "runs/detect/train/weights/best.pt"  # Your trained model
-# Fallback to pretrained if custom model not found
-if not Path(MODEL_PATH).exists():
-    print(f"\n⚠️  Trained model not found at {MODEL_PATH}")
-    print("Using pretrained yolov8n.pt instead...")
-    MODEL_PATH = "yolov8n.pt"
-
-print(f"\n📦 Loading model: {MODEL_PATH}")
-model = YOLO(MODEL_PATH)
+MODEL_VERSION = None
+
+# Inference backend: pytorch (.pt), onnx or openvino (exported next to MODEL_PATH)
+BACKEND = os.environ.get("DETECT_BACKEND", "pytorch")
+DYNAMIC_BATCH = os.environ.get("DETECT_DYNAMIC_BATCH", "0") == "1"  # exported with --dynamic
+
+# Same model registry as the AI backend: --model picks a version or a weights file,
+# otherwise the version the backend serves
+registry = ModelRegistry()
+if args.model and registry.get(args.model) is None:
+    MODEL_PATH = args.model
+else:
+    MODEL_VERSION = args.model or registry.active
+    entry = registry.get(MODEL_VERSION) if MODEL_VERSION else None
+    if entry is not None:
+        MODEL_PATH, BACKEND = entry["weights"], entry["backend"]
+        DYNAMIC_BATCH = entry.get("dynamic_batch", False)
+    elif not Path(MODEL_PATH).exists():
+        # Fallback to pretrained if custom model not found
+        print(f"\n⚠️  Trained model not found at {MODEL_PATH} and no active version in {registry.path}")
+        print("⚠️  Using pretrained yolov8n.pt instead (COCO classes only)...")
+        MODEL_PATH = "yolov8n.pt"
+
+print(f"\n📦 Loading model: {MODEL_VERSION + ' = ' if MODEL_VERSION else ''}{MODEL_PATH} ({BACKEND})")
+model = Detector(MODEL_PATH, backend=BACKEND, dynamic_batch=DYNAMIC_BATCH, name=MODEL_VERSION)
 print("✅ Model loaded successfully!")
 
 # ===========================
 # 2) Load Korean Labels Mapping
 # ===========================
-LABELS_KO_PATH = "ai-backend/labels_ko.json"
-print(f"\n📖 Loading Korean labels from: {LABELS_KO_PATH}")
+# Same vocabulary store as the AI backend (labels_ko.json + added mappings)
+VOCAB_DIR = "ai-backend"
+print(f"\n📖 Loading Korean labels from: {VOCAB_DIR}")
 
 try:
-    with open(LABELS_KO_PATH, "r", encoding="utf-8") as f:
-        ko_map = json.load(f)
+    ko_map = VocabStore(base_dir=VOCAB_DIR).korean
     print(f"✅ Loaded {len(ko_map)} Korean label mappings")
-except FileNotFoundError:
-    print(f"⚠️  Korean labels not found, using English labels")
+except (OSError, ValueError) as e:
+    print(f"⚠️  Korean labels not available ({e}), using English labels")
     ko_map = {}
 
+# Precomputed class id -> Korean label (fallback to English if no Korean)
+LABELS = [ko_map.get(name, name) for _, name in sorted(model.names.items())]
+
 # ===========================
 # 3) Setup Korean Font
 # ===========================
@@ -94,119 +164,305 @@ def get_korean_font(size=28):
 
 FONT = get_korean_font(size=28)
 
+# Korean label bitmaps are rendered once and blended with NumPy per frame
+ATLAS = LabelAtlas(FONT, LABELS)
+
 # ===========================
-# 4) Camera Setup
+# 4) Camera / Source Setup
 # ===========================
-print("\n🎥 Initializing camera...")
-cap = cv2.VideoCapture(0)
-
 # Set camera resolution (adjust if needed)
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
 
-if not cap.isOpened():
-    print("❌ Error: Cannot open camera")
+print("\n🎥 Opening source...")
+source = FrameSource(args.source if args.source is not None else args.camera,
+                     width=CAMERA_WIDTH, height=CAMERA_HEIGHT)
+
+if not source.is_opened():
+    print(f"❌ Error: Cannot open source: {source.source}")
     exit()
 
-print(f"✅ Camera opened: {CAMERA_WIDTH}x{CAMERA_HEIGHT}")
+print(f"✅ Source opened: {source.describe()}")
 
 # ===========================
 # 5) Detection Settings
 # ===========================
-CONF_THRESHOLD = 0.35  # Confidence threshold (0.0 - 1.0)
-IMGSZ = 640            # YOLO input size
+CONF_THRESHOLD = args.conf  # Confidence threshold (0.0 - 1.0)
+IMGSZ = args.imgsz          # YOLO input size
+
+# Adaptive mode: step the input size to hold the target FPS, logging each change.
+# Static ONNX/OpenVINO exports (no --dynamic, max_batch 1) only run at their export size.
+adaptive = None
+if args.target_fps and model.max_batch == 1:
+    print(f"\n⚠️  --target-fps ignored: the {BACKEND} export has a fixed input shape "
+          f"(re-export with --dynamic to adapt the input size)")
+elif args.target_fps:
+    adaptive = AdaptiveImgsz.for_fps(args.target_fps, max_size=IMGSZ, log=lambda msg: print(f"📐 {msg}"))
 
 print(f"\n⚙️  Detection Settings:")
 print(f"   Confidence Threshold: {CONF_THRESHOLD}")
-print(f"   Image Size: {IMGSZ}")
-print(f"\n▶️  Press ESC to quit\n")
+print(f"   Image Size: {IMGSZ}" + (f" (adaptive {adaptive.sizes}, target {args.target_fps} FPS)" if adaptive else ""))
+print(f"   Mode: {'pipelined (capture / inference / render threads)' if args.pipeline else 'serial'}")
+if args.motion_gate:
+    print(f"   Motion gate: >{args.motion_threshold:.1%} changed pixels, refresh every {args.refresh_interval}s")
+if args.detect_every > 1:
+    print(f"   Tracking: YOLO every {args.detect_every} frames (earlier when tracks degrade)")
+print(f"\n▶️  {'Press Ctrl+C to stop' if args.headless else 'Press ESC to quit'}\n")
+
+WINDOW_NAME = "COCO128 Real-time Scan (Korean)"
+
+# ===========================
+# 6) Detection + Drawing
+# ===========================
+def detect(frame):
+    """Run YOLO on a frame and return (confs, cls_ids, boxes_xyxy) lists above CONF_THRESHOLD"""
+    imgsz = adaptive.imgsz if adaptive else IMGSZ
+    start = time.perf_counter()
+    results = model.predict(frame, conf=CONF_THRESHOLD, imgsz=imgsz)[0]
+    if adaptive:
+        adaptive.observe(time.perf_counter() - start)
+    
+    # Convert all detections to NumPy at once
+    confs = results.boxes.conf.cpu().numpy()
+    keep = confs >= CONF_THRESHOLD
+    confs = confs[keep].tolist()
+    cls_ids = results.boxes.cls.cpu().numpy()[keep].astype(int).tolist()
+    boxes_xyxy = results.boxes.xyxy.cpu().numpy()[keep].astype(int).tolist()
+    return confs, cls_ids, boxes_xyxy
+
+# Tracker keeps IDs and labels stable while YOLO only runs every N frames
+tracker = Tracker(len(LABELS), detect_every=args.detect_every) if args.detect_every > 1 else None
+
+def detect_tracked(frame):
+    """Run YOLO when the tracker asks for it, otherwise predict tracks forward"""
+    if tracker.needs_detection(frame.shape):
+        tracker.update(*detect(frame))
+    else:
+        tracker.predict()
+    return tracker.detections()
+
+def draw_detections(frame, detections):
+    """Draw boxes and Korean labels onto the BGR frame in place and return it"""
+    return draw_labels(frame, ATLAS, *detections)
+
+def annotate(out_frame, frame_count, detected_count, fps_text):
+    """Overlay frame count, object count and FPS"""
+    info_text = f"Frame: {frame_count} | Objects: {detected_count}"
+    if adaptive:
+        info_text += f" | {adaptive.imgsz}px"
+    cv2.putText(out_frame, info_text, (10, 30), 
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    cv2.putText(out_frame, fps_text, (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+def show(out_frame, frame_count):
+    """Display the frame and handle keys. Returns False to quit."""
+    cv2.imshow(WINDOW_NAME, out_frame)
+    
+    # Check for ESC key
+    key = cv2.waitKey(1) & 0xFF
+    if key == 27:  # ESC
+        print("\n👋 Exiting...")
+        return False
+    elif key == ord('s'):  # Save screenshot
+        screenshot_path = f"screenshot_{frame_count}.jpg"
+        cv2.imwrite(screenshot_path, out_frame)
+        print(f"📸 Screenshot saved: {screenshot_path}")
+    return True
+
+# ===========================
+# 7) Outputs (annotated video / JSONL detections)
+# ===========================
+for output in (args.save_video, args.save_jsonl, args.report):
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+
+video_writer = None
+video_size = None
+jsonl_file = open(args.save_jsonl, 'w', encoding='utf-8') if args.save_jsonl else None
+ENGLISH_NAMES = [name for _, name in sorted(model.names.items())]
+
+def write_video(out_frame):
+    """Append a frame to --save-video, opening the writer at the first frame's size"""
+    global video_writer, video_size
+    if video_writer is None:
+        video_size = (out_frame.shape[1], out_frame.shape[0])
+        fourcc = cv2.VideoWriter_fourcc(*('MJPG' if args.save_video.lower().endswith('.avi') else 'mp4v'))
+        video_writer = cv2.VideoWriter(args.save_video, fourcc, source.fps, video_size)
+    if out_frame.shape[1::-1] != video_size:
+        out_frame = cv2.resize(out_frame, video_size)  # image directories vary in size
+    video_writer.write(out_frame)
+
+def write_jsonl(frame, detections):
+    """Append one line per processed frame to --save-jsonl"""
+    confs, cls_ids, boxes_xyxy = detections[:3]
+    track_ids = detections[3] if len(detections) > 3 else [None] * len(confs)
+    objects = []
+    for conf, cls_id, box, track_id in zip(confs, cls_ids, boxes_xyxy, track_ids):
+        obj = {'name': ENGLISH_NAMES[cls_id], 'korean': LABELS[cls_id],
+               'confidence': round(float(conf), 4), 'bbox': [int(v) for v in box]}
+        if track_id is not None:
+            obj['track_id'] = int(track_id)
+        objects.append(obj)
+    jsonl_file.write(json.dumps({
+        'frame': frame.index,
+        'source': frame.name,
+        'width': frame.image.shape[1],
+        'height': frame.image.shape[0],
+        'objects': objects,
+    }, ensure_ascii=False) + '\n')
 
 # ===========================
-# 6) Main Detection Loop
+# 8) Main Detection Loop
 # ===========================
+# Per-stage latency for the throughput report
+stages = Metrics()
+stages.histogram('stage_seconds', 'realtime_ko stage latency')
+
 frame_count = 0
 
-try:
+def read_frame():
+    with stages.time('stage_seconds', stage='capture'):
+        frame = source.read()
+    if frame is None:
+        print("🏁 End of source" if not source.live else "❌ Failed to read frame")
+    return frame
+
+# Motion gate: reuse the previous detections while nothing in the scene moves
+gate = MotionGate(threshold=args.motion_threshold,
+                  refresh_interval=args.refresh_interval) if args.motion_gate else None
+last_detections = None
+
+def infer(frame):
+    """Run YOLO detection (or track between detections)"""
+    global last_detections
+    if gate:
+        with stages.time('stage_seconds', stage='motion'):
+            changed = gate.should_infer(frame.image)
+        if not changed and last_detections is not None:
+            return last_detections
+    with stages.time('stage_seconds', stage='inference'):
+        last_detections = detect_tracked(frame.image) if tracker else detect(frame.image)
+    return last_detections
+
+def render(frame, detections, fps_text):
+    """Draw, write outputs and display one processed frame. Returns False to quit."""
+    global frame_count
+    frame_count += 1
+    with stages.time('stage_seconds', stage='draw'):
+        out_frame = draw_detections(frame.image, detections)
+        annotate(out_frame, frame_count, len(detections[0]), fps_text)
+    
+    if args.save_video or jsonl_file:
+        with stages.time('stage_seconds', stage='write'):
+            if args.save_video:
+                write_video(out_frame)
+            if jsonl_file:
+                write_jsonl(frame, detections)
+    
+    if args.headless:
+        if frame_count % 100 == 0:
+            print(f"   {frame_count} frames | {fps_text}")
+        return True
+    with stages.time('stage_seconds', stage='display'):
+        return show(out_frame, frame_count)
+
+pipeline = None
+
+def run_serial():
+    """Capture, detect, draw and show one frame at a time"""
+    fps = FpsMeter()
     while True:
-        ok, frame = cap.read()
-        if not ok:
-            print("❌ Failed to read frame")
+        frame = read_frame()
+        if frame is None:
             break
-        
-        frame_count += 1
-        
-        # Run YOLO detection
-        results = model(frame, imgsz=IMGSZ, verbose=False)[0]
-        
-        # Convert to PIL for Korean text rendering
-        pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(pil_img)
-        
-        detected_count = 0
-        
-        # Process each detection
-        for box in results.boxes:
-            conf = float(box.conf[0])
-            if conf < CONF_THRESHOLD:
-                continue
-            
-            detected_count += 1
-            
-            # Get class info
-            cls_id = int(box.cls[0])
-            name_en = model.names[cls_id]
-            name_ko = ko_map.get(name_en, name_en)  # Fallback to English if no Korean
-            
-            # Get bounding box coordinates
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            
-            # Draw bounding box
-            draw.rectangle([x1, y1, x2, y2], outline=(0, 255, 0), width=3)
-            
-            # Prepare label text
-            label = f"{name_ko} {conf:.2f}"
-            
-            # Calculate text position (above bbox)
-            x_text, y_text = x1, max(0, y1 - 35)
-            
-            # Get text bounding box
-            bbox = draw.textbbox((x_text, y_text), label, font=FONT)
-            
-            # Draw background rectangle for text
-            draw.rectangle(bbox, fill=(0, 0, 0))
-            
-            # Draw text
-            draw.text((x_text, y_text), label, font=FONT, fill=(255, 255, 255))
-        
-        # Convert back to OpenCV format
-        out_frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-        
-        # Add info overlay
-        info_text = f"Frame: {frame_count} | Objects: {detected_count}"
-        cv2.putText(out_frame, info_text, (10, 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        # Display
-        cv2.imshow("COCO128 Real-time Scan (Korean)", out_frame)
-        
-        # Check for ESC key
-        key = cv2.waitKey(1) & 0xFF
-        if key == 27:  # ESC
-            print("\n👋 Exiting...")
+        detections = infer(frame)
+        fps.tick()
+        if not render(frame, detections, f"FPS {fps.fps:4.1f}"):
             break
-        elif key == ord('s'):  # Save screenshot
-            screenshot_path = f"screenshot_{frame_count}.jpg"
-            cv2.imwrite(screenshot_path, out_frame)
-            print(f"📸 Screenshot saved: {screenshot_path}")
+
+def run_pipelined():
+    """Capture, inference and render in separate threads (drop-oldest queues for live sources)"""
+    global pipeline
+    pipeline = Pipeline(read_frame, infer,
+                        lambda frame, detections, p: render(frame, detections, p.overlay_text()),
+                        drop_frames=source.live)
+    pipeline.run()
+    
+    dropped = pipeline.dropped()
+    print(f"📉 Dropped frames: capture->inference {dropped['capture']}, "
+          f"inference->render {dropped['inference']}")
+
+def throughput_report(elapsed):
+    """Frames/sec, per-stage latency and dropped frames for the whole run"""
+    captured = source.index
+    dropped = pipeline.dropped() if pipeline is not None else {'capture': 0, 'inference': 0}
+    report = {
+        'source': source.source,
+        'source_kind': source.kind,
+        'model': model.describe(),
+        'mode': 'pipeline' if args.pipeline else 'serial',
+        'frames_captured': captured,
+        'frames_processed': frame_count,
+        'frames_dropped': sum(dropped.values()),
+        'dropped_by_queue': dropped,
+        'elapsed_s': round(elapsed, 3),
+        'fps': round(frame_count / elapsed, 2) if elapsed > 0 else 0.0,
+        'stages_ms': {key.split('=', 1)[1]: value
+                      for key, value in stages.summary('stage_seconds').items()},
+    }
+    if adaptive:
+        report['imgsz_changes'] = [{'time': t, 'from': a, 'to': b, 'median_ms': ms}
+                                   for t, a, b, ms in adaptive.history]
+    if tracker:
+        report['tracker'] = dict(tracker.stats)
+    if gate:
+        report['motion_gate'] = {**gate.stats, 'skip_ratio': round(gate.skip_ratio(), 4)}
+    
+    print("\n📈 Throughput report")
+    print(f"   Frames: {report['frames_processed']} processed / {captured} captured, "
+          f"{report['frames_dropped']} dropped")
+    print(f"   Time: {report['elapsed_s']}s  ->  {report['fps']} FPS")
+    print(f"   {'Stage':<10} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for stage, s in report['stages_ms'].items():
+        print(f"   {stage:<10} {s['count']:>6} {s['mean']:>8} {s['p50']:>8} {s['p95']:>8} {s['p99']:>8}")
+    
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"   Saved: {args.report}")
+    return report
+
+started = time.perf_counter()
+
+try:
+    run_pipelined() if args.pipeline else run_serial()
 
 except KeyboardInterrupt:
     print("\n\n⚠️  Interrupted by user")
 
 finally:
+    elapsed = time.perf_counter() - started
     # Cleanup
-    cap.release()
-    cv2.destroyAllWindows()
-    print("\n✅ Camera released, windows closed")
+    source.release()
+    if video_writer is not None:
+        video_writer.release()
+        print(f"🎬 Annotated video saved: {args.save_video}")
+    if jsonl_file is not None:
+        jsonl_file.close()
+        print(f"📝 Detections saved: {args.save_jsonl}")
+    if not args.headless:
+        cv2.destroyAllWindows()
+    print("\n✅ Source released, windows closed")
     print(f"📊 Total frames processed: {frame_count}")
+    if adaptive:
+        spent = ", ".join(f"{size}px {sec:.1f}s" for size, sec in adaptive.time_at_size().items())
+        print(f"📐 Input size: {len(adaptive.history)} changes, time at size: {spent}")
+    if gate:
+        print(f"💤 Motion gate: skipped {gate.stats['skipped']}/{gate.stats['frames']} frames "
+              f"({gate.skip_ratio():.0%}), {gate.stats['refreshes']} forced refreshes")
+    if tracker:
+        print(f"🎯 Tracker: {tracker.stats['detections']} detector runs, "
+              f"{tracker.stats['predictions']} tracked frames, "
+              f"{tracker.stats['early_detections']} early re-detections")
+    throughput_report(elapsed)
@@ -0,0 +1,182 @@
+"""
+Threaded capture -> inference -> render pipeline for realtime_ko.py.
+Stages run concurrently and are connected by bounded drop-oldest queues, so
+a slow stage never makes the others wait on stale frames: the display always
+gets the freshest inference result and FPS approaches the inference rate.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    """Bounded queue whose put() discards the oldest item when full"""
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        """Return the next item, or None after timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def empty(self):
+        return self._queue.empty()
+
+
+class BlockingQueue:
+    """Bounded queue whose put() waits for space (no frames dropped) until stopped"""
+
+    def __init__(self, maxsize, stopped):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stopped = stopped
+        self.dropped = 0
+
+    def put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self, timeout=None):
+        """Return the next item, or None after timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def empty(self):
+        return self._queue.empty()
+
+
+class FpsMeter:
+    """Rolling frames-per-second over the last `window` seconds"""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self._stamps = deque()
+        self.count = 0
+
+    def tick(self):
+        now = time.perf_counter()
+        self._stamps.append(now)
+        self.count += 1
+        while self._stamps and now - self._stamps[0] > self.window:
+            self._stamps.popleft()
+
+    @property
+    def fps(self):
+        if len(self._stamps) < 2:
+            return 0.0
+        span = self._stamps[-1] - self._stamps[0]
+        return (len(self._stamps) - 1) / span if span > 0 else 0.0
+
+
+class Pipeline:
+    """
+    Run capture and inference in background threads; render on the caller's
+    thread (cv2.imshow must stay on the main thread on macOS).
+
+    read_frame() -> frame or None (end of stream)
+    infer(frame) -> detections
+    render(frame, detections, pipeline) -> False to stop
+
+    With drop_frames=False (file sources) the queues block instead, so
+    every frame is processed and throughput is the slowest stage's rate.
+    """
+
+    def __init__(self, read_frame, infer, render, queue_size=1, drop_frames=True):
+        self.read_frame = read_frame
+        self.infer = infer
+        self.render = render
+        self.stopped = threading.Event()
+        if drop_frames:
+            self.frames = DropOldestQueue(queue_size)
+            self.results = DropOldestQueue(queue_size)
+        else:
+            self.frames = BlockingQueue(queue_size, self.stopped)
+            self.results = BlockingQueue(queue_size, self.stopped)
+        self.fps = {'capture': FpsMeter(), 'inference': FpsMeter(), 'render': FpsMeter()}
+        self.error = None
+
+    def _capture_loop(self):
+        try:
+            while not self.stopped.is_set():
+                frame = self.read_frame()
+                if frame is None:
+                    break
+                self.fps['capture'].tick()
+                self.frames.put(frame)
+        except Exception as e:
+            self.error = e
+
+    def _inference_loop(self):
+        try:
+            while not self.stopped.is_set():
+                frame = self.frames.get(timeout=0.1)
+                if frame is None:
+                    # End of stream once capture has finished and the queue is drained
+                    if not self._capture.is_alive() and self.frames.empty():
+                        break
+                    continue
+                detections = self.infer(frame)
+                self.fps['inference'].tick()
+                self.results.put((frame, detections))
+        except Exception as e:
+            self.error = e
+
+    def run(self):
+        """Start capture/inference threads and render until stopped or the stream ends"""
+        self._capture = threading.Thread(target=self._capture_loop, name='capture', daemon=True)
+        self._inference = threading.Thread(target=self._inference_loop, name='inference', daemon=True)
+        self._capture.start()
+        self._inference.start()
+        try:
+            while not self.stopped.is_set():
+                item = self.results.get(timeout=0.1)
+                if item is None:
+                    if not self._inference.is_alive() and self.results.empty():
+                        break
+                    continue
+                frame, detections = item
+                self.fps['render'].tick()
+                if self.render(frame, detections, self) is False:
+                    break
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self.stopped.set()
+        for thread in (getattr(self, '_capture', None), getattr(self, '_inference', None)):
+            if thread is not None:
+                thread.join(timeout=2)
+
+    def overlay_text(self):
+        """Per-stage FPS summary for the video overlay"""
+        return " | ".join(f"{name[:3].capitalize()} {meter.fps:4.1f}" for name, meter in self.fps.items()) + " FPS"
+
+    def dropped(self):
+        return {'capture': self.frames.dropped, 'inference': self.results.dropped}
@@ -0,0 +1,230 @@
+"""
+Packed, memory-mapped training shards.
+Decodes and resizes every image of a YOLO dataset once (long side = imgsz,
+same as ultralytics' loader) into a few large uint8 shard files, with a
+NumPy index and a packed label array alongside. Training then reads images
+as memory-mapped slices instead of opening and decoding JPEGs each epoch.
+
+Layout of <out>/:
+    meta.json                     imgsz, source dataset and per-split info
+    <split>_00000.bin ...         raw HWC uint8 pixels, back to back
+    <split>_index.npy             per image: shard, offset, h, w, h0, w0, label start/count
+    <split>_labels.npy            (n_boxes, 5) float32: cls, x, y, w, h (normalized xywh)
+    <split>_files.json            original image paths, in index order
+
+Usage:
+    python shards.py --data coco128_split.yaml --out shards/coco128_split --imgsz 640
+    python train_yolo_coco128.py --train --shards shards/coco128_split
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+INDEX_DTYPE = np.dtype([
+    ("shard", np.uint16), ("offset", np.uint64),
+    ("h", np.uint16), ("w", np.uint16), ("h0", np.uint16), ("w0", np.uint16),
+    ("label_start", np.uint32), ("label_count", np.uint32),
+])
+
+
+def dataset_splits(data_yaml):
+    """{split name: image directory} from a YOLO data yaml"""
+    data_yaml = Path(data_yaml)
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get("path", "."))
+    if not root.is_absolute():
+        # Relative to the yaml file (as documented in our configs), else the working directory
+        root = data_yaml.parent / root if (data_yaml.parent / root).exists() else root
+    splits = {}
+    for split in ("train", "val"):
+        if data.get(split):
+            splits[split] = (root / data[split]).resolve()
+    return splits
+
+
+def label_path(img_path):
+    """ultralytics convention: .../images/... -> .../labels/....txt"""
+    parts = list(img_path.parts)
+    idx = len(parts) - 1 - parts[::-1].index("images")
+    parts[idx] = "labels"
+    return Path(*parts).with_suffix(".txt")
+
+
+def read_labels(path):
+    """(n, 5) float32 cls, x, y, w, h; polygons are reduced to their bounding box"""
+    rows = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                values = [float(v) for v in line.split()]
+                if len(values) == 5:
+                    rows.append(values)
+                elif len(values) > 5:
+                    xs, ys = values[1::2], values[2::2]
+                    x1, x2, y1, y2 = min(xs), max(xs), min(ys), max(ys)
+                    rows.append([values[0], (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+    except FileNotFoundError:
+        pass
+    return np.asarray(rows, dtype=np.float32).reshape(-1, 5)
+
+
+def load_resized(path, imgsz):
+    """Decode and resize so the long side is imgsz, exactly like ultralytics' load_image"""
+    im = cv2.imread(str(path))
+    if im is None:
+        return None, None
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(im), (h0, w0)
+
+
+def pack_split(name, img_dir, out, imgsz, shard_bytes, workers):
+    """Pack one split; returns its meta entry"""
+    paths = sorted(p for p in Path(img_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    index = np.zeros(len(paths), dtype=INDEX_DTYPE)
+    labels, files = [], []
+    shard, offset, label_start, n = 0, 0, 0, 0
+    shard_file = open(out / f"{name}_{shard:05d}.bin", "wb")
+
+    def work(path):
+        im, hw0 = load_resized(path, imgsz)
+        return path, im, hw0, read_labels(label_path(path))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, im, hw0, lb in pool.map(work, paths):
+                if im is None:
+                    print(f"⚠️  Skipping unreadable image: {path}")
+                    continue
+                if offset and offset + im.nbytes > shard_bytes:
+                    shard_file.close()
+                    shard, offset = shard + 1, 0
+                    shard_file = open(out / f"{name}_{shard:05d}.bin", "wb")
+                shard_file.write(im.data)
+                index[n] = (shard, offset, im.shape[0], im.shape[1], hw0[0], hw0[1], label_start, len(lb))
+                offset += im.nbytes
+                label_start += len(lb)
+                labels.append(lb)
+                files.append(str(path.resolve()))
+                n += 1
+    finally:
+        shard_file.close()
+
+    np.save(out / f"{name}_index.npy", index[:n])
+    np.save(out / f"{name}_labels.npy", np.concatenate(labels) if labels else np.zeros((0, 5), np.float32))
+    with open(out / f"{name}_files.json", "w", encoding="utf-8") as f:
+        json.dump(files, f)
+    return {"images": str(Path(img_dir).resolve()), "count": n, "boxes": label_start, "shards": shard + 1}
+
+
+def pack(data_yaml, out, imgsz=640, shard_mb=1024, workers=None):
+    """Pack every split of data_yaml into out/; returns the meta dict"""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    workers = workers or min(16, os.cpu_count() or 1)
+    meta = {"data": str(Path(data_yaml).resolve()), "imgsz": imgsz, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "splits": {}}
+    for name, img_dir in dataset_splits(data_yaml).items():
+        start = time.perf_counter()
+        meta["splits"][name] = pack_split(name, img_dir, out, imgsz, shard_mb << 20, workers)
+        info = meta["splits"][name]
+        print(f"✅ {name}: {info['count']} images, {info['boxes']} boxes, {info['shards']} shard(s) "
+              f"in {time.perf_counter() - start:.1f}s")
+    with open(out / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class ShardReader:
+    """Memory-mapped access to one packed split"""
+
+    def __init__(self, shard_dir, split):
+        shard_dir = Path(shard_dir)
+        with open(shard_dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.split = split
+        self.imgsz = meta["imgsz"]
+        self.index = np.load(shard_dir / f"{split}_index.npy")
+        self.labels = np.load(shard_dir / f"{split}_labels.npy")
+        with open(shard_dir / f"{split}_files.json", "r", encoding="utf-8") as f:
+            self.files = json.load(f)
+        self._positions = {path: i for i, path in enumerate(self.files)}
+        self._shard_paths = [shard_dir / f"{split}_{i:05d}.bin" for i in range(meta["splits"][split]["shards"])]
+        self._shards = None  # opened on first read, in each DataLoader worker
+
+    def __getstate__(self):
+        # Spawned DataLoader workers (macOS/Windows) reopen the memmaps instead of unpickling their contents
+        return {**self.__dict__, "_shards": None}
+
+    def _open(self):
+        if self._shards is None:
+            self._shards = [np.memmap(path, dtype=np.uint8, mode="r") for path in self._shard_paths]
+        return self._shards
+
+    @classmethod
+    def for_images(cls, shard_dir, img_path):
+        """Reader for the split packed from img_path, or None if it was not packed"""
+        meta_path = Path(shard_dir) / "meta.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        target = str(Path(img_path).resolve())
+        for split, info in meta["splits"].items():
+            if info["images"] == target:
+                return cls(shard_dir, split)
+        return None
+
+    def __len__(self):
+        return len(self.files)
+
+    def position(self, im_file):
+        return self._positions.get(str(Path(im_file).resolve()))
+
+    def image(self, i):
+        """Resized HWC uint8 image (a private copy) and its original (h0, w0)"""
+        row = self.index[i]
+        h, w = int(row["h"]), int(row["w"])
+        start = int(row["offset"])
+        im = np.array(self._open()[row["shard"]][start:start + h * w * 3]).reshape(h, w, 3)
+        return im, (int(row["h0"]), int(row["w0"]))
+
+    def boxes(self, i):
+        """(n, 5) cls, x, y, w, h for image i"""
+        row = self.index[i]
+        start = int(row["label_start"])
+        return self.labels[start:start + int(row["label_count"])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a YOLO dataset into memory-mapped training shards")
+    parser.add_argument("--data", default="coco128_split.yaml", help="Dataset YAML (default: coco128_split.yaml)")
+    parser.add_argument("--out", default=None, help="Output folder (default: shards/<yaml name>)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Training image size (default: 640)")
+    parser.add_argument("--shard-mb", type=int, default=1024, help="Max shard file size in MB (default: 1024)")
+    parser.add_argument("--workers", type=int, default=None, help="Decode threads")
+    args = parser.parse_args()
+
+    out = args.out or str(Path("shards") / Path(args.data).stem)
+    print(f"📦 Packing {args.data} at imgsz={args.imgsz} into {out}")
+    pack(args.data, out, imgsz=args.imgsz, shard_mb=args.shard_mb, workers=args.workers)
+    print(f"\n📝 Train with: python train_yolo_coco128.py --train --data {args.data} --shards {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 """
 Script to split COCO128 dataset into train/val sets.
 This creates proper train/val separation for better model evaluation.
+
+Usage:
+    python split_coco128.py                # random 80/20 split (seed 42)
+    python split_coco128.py --stratified   # class-stratified split (see label_index.py)
 """
 
-import random
-import shutil
+import argparse
 from pathlib import Path
 
+from dataset_builder import DatasetBuilder, format_stats, list_images, pair_entries, plan_split
+from label_index import LabelIndex, split_balance, stratified_split
+
+parser = argparse.ArgumentParser(description='Split COCO128 into train/val')
+parser.add_argument('--stratified', action='store_true',
+                    help='Balance classes between train and val instead of a plain shuffle')
+args = parser.parse_args()
+
 # Configuration
 SRC = Path("coco128")                 # Original COCO128 folder
 img_src = SRC / "images" / "train2017"
@@ -18,56 +29,37 @@ val_img   = DST / "images" / "val"
 train_lab = DST / "labels" / "train"
 val_lab   = DST / "labels" / "val"
 
-# Create directories
-for p in [train_img, val_img, train_lab, val_lab]:
-    p.mkdir(parents=True, exist_ok=True)
-
 print("=" * 60)
 print("COCO128 Train/Val Split Script")
 print("=" * 60)
 
-# Get all images
-imgs = sorted([p for p in img_src.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"]])
-print(f"\nFound {len(imgs)} images in {img_src}")
-
-# Shuffle with fixed seed for reproducibility
-random.seed(42)
-random.shuffle(imgs)
-
-# Split: 20% for validation, minimum 10 images
-val_n = max(10, int(0.2 * len(imgs)))
-val_set = imgs[:val_n]
-train_set = imgs[val_n:]
+print(f"\nFound {len(list_images(img_src))} images in {img_src}")
+
+# Split: 20% for validation, minimum 10 images, fixed seed for reproducibility
+if args.stratified:
+    # Classes seen in 2+ images get a val image while the 20% budget lasts
+    index = LabelIndex.from_dataset(img_src, lab_src)
+    val_mask = stratified_split(index, val_fraction=0.2, min_val=10, seed=42, num_classes=80)
+    train_set = [p for p, v in zip(index.images, val_mask) if not v]
+    val_set = [p for p, v in zip(index.images, val_mask) if v]
+    share, missing = split_balance(index, val_mask, 80)
+    print(f"\nStratified by class: val share per class {share.mean():.2f} ± {share.std():.2f}, "
+          f"{len(missing)} classes missing from val ({len(val_set) / len(index):.1%} of images in val)")
+else:
+    train_set, val_set = plan_split(SRC, "train2017", val_fraction=0.2, min_val=10, seed=42)
 
 print(f"\nSplitting:")
 print(f"  Train: {len(train_set)} images")
 print(f"  Val:   {len(val_set)} images")
 
-def copy_pair(img_path, out_img_dir, out_lab_dir):
-    """Copy image and corresponding label file"""
-    # Copy image
-    shutil.copy2(img_path, out_img_dir / img_path.name)
-    
-    # Copy label if exists, create empty file if not
-    lab_path = lab_src / (img_path.stem + ".txt")
-    if lab_path.exists():
-        shutil.copy2(lab_path, out_lab_dir / lab_path.name)
-    else:
-        # No objects in image, create empty label file
-        (out_lab_dir / (img_path.stem + ".txt")).write_text("")
-
-# Copy train set
-print("\nCopying train set...")
-for img in train_set:
-    copy_pair(img, train_img, train_lab)
-
-# Copy validation set
-print("Copying validation set...")
-for img in val_set:
-    copy_pair(img, val_img, val_lab)
+# Link (or copy) images and labels in parallel; unchanged files are skipped on re-runs
+print("\nBuilding train/val split...")
+entries = pair_entries(train_set, lab_src, "train") + pair_entries(val_set, lab_src, "val")
+stats = DatasetBuilder(DST).build(entries)
+print(f"  {format_stats(stats)}")
 
 print("\n✅ Done!")
-print(f"\nDataset saved to: {DST}")
+print(f"\nDataset saved to: {DST} (manifest: {DST / 'manifest.json'})")
 print(f"  Train images: {train_img}")
 print(f"  Train labels: {train_lab}")
 print(f"  Val images:   {val_img}")
@@ -83,4 +75,9 @@ print(f"\nVerification:")
 print(f"  Train: {train_imgs_count} images, {train_labs_count} labels")
 print(f"  Val:   {val_imgs_count} images, {val_labs_count} labels")
 
+overlap = {p.name for p in train_img.iterdir()} & {p.name for p in val_img.iterdir()}
+if overlap:
+    raise SystemExit(f"❌ {len(overlap)} images are in both train and val (e.g. {sorted(overlap)[0]})")
+print("  No images shared between train and val")
+
 print(f"\n📝 Next step: Use 'coco128_split.yaml' for training")
@@ -0,0 +1,270 @@
+"""
+Parallel hyperparameter sweep for train_yolo_coco128.py.
+Expands a search space into trial configurations, trains them concurrently in
+a process pool where each trial owns a disjoint slice of the CPU cores (torch
+and OpenMP threads are capped to that slice), stops trials whose val
+mAP50-95 falls below the median of the other trials at the same epoch, and
+writes every trial's config, epoch time and mAP into one results table.
+
+Search space (YAML or JSON; see sweep_space.yaml). Keys are train_yolo
+arguments (imgsz, batch_size) or entries of HYPERPARAMETERS:
+    imgsz: [320, 416, 640]           # list  -> grid axis
+    lr0: {min: 0.001, max: 0.02, log: true}   # range -> sampled (needs --samples)
+    mosaic: 1.0                      # scalar -> fixed for every trial
+
+Usage:
+    python sweep.py --space sweep_space.yaml --epochs 10 --parallel 2
+    python sweep.py --space sweep_space.yaml --samples 8 --shards shards/coco128_split
+
+Results: runs/sweeps/<name>/results.csv and results.json, one folder per trial.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import yaml
+
+from model_stats import mark_pareto
+
+TRAIN_ARGS = ("imgsz", "batch_size")
+COLUMNS = ("trial", "status", "epochs", "epoch_s", "map50", "map50_95", "infer_ms", "pareto")
+THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def load_space(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f) if str(path).endswith(".json") else yaml.safe_load(f)
+
+
+def _sample_range(spec, rng):
+    low, high = spec["min"], spec["max"]
+    if spec.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return round(value) if isinstance(low, int) and isinstance(high, int) else float(f"{value:.4g}")
+
+
+def expand_space(space, samples=None, seed=0):
+    """Trial configs: the full grid, or `samples` random draws from it"""
+    fixed = {k: v for k, v in space.items() if not isinstance(v, (list, dict))}
+    axes = {k: v for k, v in space.items() if isinstance(v, list)}
+    ranges = {k: v for k, v in space.items() if isinstance(v, dict)}
+    if ranges and not samples:
+        raise ValueError(f"ranges ({', '.join(ranges)}) need --samples")
+
+    grid = [dict(zip(axes, values)) for values in itertools.product(*axes.values())]
+    if not samples:
+        return [{**fixed, **point} for point in grid]
+
+    rng = random.Random(seed)
+    configs = []
+    points = rng.sample(grid, min(samples, len(grid))) if not ranges else [rng.choice(grid) for _ in range(samples)]
+    for point in points:
+        configs.append({**fixed, **point, **{k: _sample_range(v, rng) for k, v in ranges.items()}})
+    return configs
+
+
+def core_slices(parallel):
+    """Split the CPUs this process may use into `parallel` disjoint, contiguous slices"""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    parallel = max(1, min(parallel, len(cpus)))
+    size = len(cpus) // parallel
+    return [cpus[i * size:(i + 1) * size] for i in range(parallel)]
+
+
+def should_stop(curves, trial, epoch, grace_epochs, min_peers):
+    """Median stopping rule: best-so-far below the median of peers' best-so-far at this epoch"""
+    if epoch < grace_epochs:
+        return False
+    own = max(curves[trial][:epoch])
+    peers = [max(c[:epoch]) for t, c in curves.items() if t != trial and len(c) >= epoch]
+    return len(peers) >= min_peers and own < statistics.median(peers)
+
+
+def run_trial(trial, config, cores, opts, curves):
+    """Train one configuration in this (fresh) worker process; returns its results row"""
+    # Pin to our slice before torch is imported so OpenMP sizes its pool to it
+    threads = str(len(cores))
+    for name in THREAD_ENV:
+        os.environ[name] = threads
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    trial_dir = Path(opts["project"]) / trial
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    # Keep concurrent trials' ultralytics output apart
+    log = open(trial_dir / "train.log", "w", encoding="utf-8")
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    sys.stdout = sys.stderr = log
+
+    import torch
+    torch.set_num_threads(len(cores))
+    from train_yolo_coco128 import train_yolo
+
+    row = {"trial": trial, **config, "status": "done", "epochs": 0, "epoch_s": None,
+           "map50": None, "map50_95": None, "infer_ms": None, "save_dir": str(trial_dir)}
+    epoch_times = []
+    in_epoch = [False]
+
+    def on_train_epoch_end(trainer):
+        in_epoch[0] = True
+
+    def on_fit_epoch_end(trainer):
+        if not in_epoch[0]:
+            return  # final_eval re-runs this callback after training
+        in_epoch[0] = False
+        epoch_times.append(trainer.epoch_time or 0.0)
+        curves[trial] = curves[trial] + [trainer.metrics.get("metrics/mAP50-95(B)", 0.0)]
+        if should_stop(curves, trial, len(curves[trial]), opts["grace_epochs"], opts["min_peers"]):
+            print(f"✂️  Pruned after epoch {trainer.epoch + 1}: below the median of other trials")
+            row["status"] = "pruned"
+            trainer.stop = True
+
+    def on_train_end(trainer):
+        # Metrics of best.pt after final_eval
+        row["map50"] = round(float(trainer.metrics.get("metrics/mAP50(B)", 0.0)), 4)
+        row["map50_95"] = round(float(trainer.metrics.get("metrics/mAP50-95(B)", 0.0)), 4)
+        speed = getattr(trainer.validator, "speed", None) or {}
+        if speed.get("inference") is not None:
+            row["infer_ms"] = round(speed["inference"], 2)
+
+    hyp = {k: v for k, v in config.items() if k not in TRAIN_ARGS}
+    train_args = {k: v for k, v in config.items() if k in TRAIN_ARGS}
+    callbacks = {"on_train_epoch_end": on_train_epoch_end, "on_fit_epoch_end": on_fit_epoch_end,
+                 "on_train_end": on_train_end}
+    curves[trial] = []
+    try:
+        model = train_yolo(data_yaml=opts["data"], model_name=opts["model"], epochs=opts["epochs"],
+                           shards=opts["shards"], cache=opts["cache"], name=trial, project=opts["project"],
+                           hyp=hyp, callbacks=callbacks,
+                           workers=max(1, len(cores) // 2), patience=opts["patience"], validate=False,
+                           verbose=False, **train_args)
+        if model is None:
+            row["status"] = "failed"
+    except Exception as e:  # a bad config must not take the sweep down
+        print(f"❌ Trial failed: {e!r}")
+        row["status"] = "failed"
+        row["error"] = repr(e)
+    row["epochs"] = len(epoch_times)
+    if epoch_times:
+        row["epoch_s"] = round(sum(epoch_times) / len(epoch_times), 2)
+    log.flush()
+    return row
+
+
+def write_results(rows, keys, out):
+    rows = sorted(rows, key=lambda r: -(r["map50_95"] if r["map50_95"] is not None else -1))
+    fields = ["trial", *keys, *COLUMNS[1:], "save_dir"]
+    with open(out / "results.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(out / "results.json", "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    return rows
+
+
+def print_table(rows, keys):
+    header = ["trial", *keys, *COLUMNS[1:]]
+    cells = [[("-" if r.get(h) is None else ("*" if r.get(h) is True else "" if r.get(h) is False else str(r.get(h))))
+              for h in header] for r in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(header)]
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    for c in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(c, widths)))
+
+
+def sweep(configs, opts, parallel):
+    """Run configs with at most `parallel` concurrent trials; returns result rows"""
+    slices = core_slices(parallel)
+    print(f"🧪 {len(configs)} trials, {len(slices)} in parallel, {len(slices[0])} CPU thread(s) each")
+    ctx = mp.get_context("spawn")
+    manager = ctx.Manager()
+    curves = manager.dict()
+    pending = list(enumerate(configs))
+    rows, running = [], {}
+    start = time.perf_counter()
+    # One fresh interpreter per trial: thread settings apply before torch loads
+    with ProcessPoolExecutor(max_workers=len(slices), mp_context=ctx, max_tasks_per_child=1) as pool:
+        free = list(range(len(slices)))
+        while pending or running:
+            while pending and free:
+                i, config = pending.pop(0)
+                slot = free.pop(0)
+                future = pool.submit(run_trial, f"trial_{i:03d}", config, slices[slot], opts, curves)
+                running[future] = (slot, i, config)
+                print(f"▶️  trial_{i:03d} on CPUs {slices[slot][0]}-{slices[slot][-1]}: {config}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                slot, i, config = running.pop(future)
+                free.append(slot)
+                try:
+                    row = future.result()
+                except Exception as e:  # worker crashed (e.g. out of memory)
+                    row = {"trial": f"trial_{i:03d}", **config, "status": "failed", "error": repr(e)}
+                    for key in COLUMNS[2:-1]:
+                        row.setdefault(key, None)
+                rows.append(row)
+                print(f"{'✅' if row['status'] == 'done' else '✂️ ' if row['status'] == 'pruned' else '❌'} "
+                      f"{row['trial']} {row['status']}: mAP50-95={row['map50_95']}, epoch={row['epoch_s']}s "
+                      f"({len(rows)}/{len(configs)}, {time.perf_counter() - start:.0f}s)")
+    manager.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for train_yolo_coco128.py")
+    parser.add_argument("--space", default="sweep_space.yaml", help="Search space YAML/JSON (default: sweep_space.yaml)")
+    parser.add_argument("--samples", type=int, default=None, help="Random configurations instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0)")
+    parser.add_argument("--data", default="coco128_split.yaml", help="Dataset YAML (default: coco128_split.yaml)")
+    parser.add_argument("--model", default="yolo11n.pt", help="Model to use (default: yolo11n.pt)")
+    parser.add_argument("--epochs", type=int, default=10, help="Epochs per trial (default: 10)")
+    parser.add_argument("--parallel", type=int, default=2, help="Concurrent trials (default: 2)")
+    parser.add_argument("--grace-epochs", type=int, default=3,
+                        help="Epochs before a trial can be pruned (default: 3)")
+    parser.add_argument("--min-peers", type=int, default=2,
+                        help="Other trials needed at the same epoch to prune (default: 2)")
+    parser.add_argument("--patience", type=int, default=50, help="ultralytics early stopping patience (default: 50)")
+    parser.add_argument("--shards", default=None, help="Train from packed shards (see shards.py)")
+    parser.add_argument("--cache", choices=["ram", "disk"], default=False, help="ultralytics image cache")
+    parser.add_argument("--name", default=None, help="Sweep name (default: timestamp)")
+    args = parser.parse_args()
+
+    space = load_space(args.space)
+    configs = expand_space(space, args.samples, args.seed)
+    keys = [k for k in space if isinstance(space[k], (list, dict))]
+    out = Path("runs") / "sweeps" / (args.name or time.strftime("%Y%m%d-%H%M%S"))
+    out.mkdir(parents=True, exist_ok=True)
+    opts = {"data": str(Path(args.data).resolve()), "model": args.model, "epochs": args.epochs,
+            "shards": args.shards, "cache": args.cache, "project": str(out.resolve()),
+            "grace_epochs": args.grace_epochs, "min_peers": args.min_peers, "patience": args.patience}
+    with open(out / "sweep.json", "w", encoding="utf-8") as f:
+        json.dump({"space": space, "options": opts, "configs": configs}, f, indent=2)
+
+    rows = sweep(configs, opts, args.parallel)
+    mark_pareto(rows)
+    rows = write_results(rows, keys, out)
+
+    print("\n" + "=" * 70)
+    print("📊 Sweep results (best mAP50-95 first, * = speed/accuracy Pareto front)")
+    print("=" * 70)
+    print_table(rows, keys)
+    print(f"\n📁 {out / 'results.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,12 @@ Test script to verify YOLO model loading and Korean labels
 Without requiring camera/display
 """
 
-import torch
+import os
 import json
 from pathlib import Path
 
-# Fix PyTorch 2.6 weights_only issue
-_original_torch_load = torch.load
-def _patched_torch_load(*args, **kwargs):
-    kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-torch.load = _patched_torch_load
+# Full ultralytics checkpoints are pickled modules (torch >= 2.6 defaults to weights_only=True)
+os.environ.setdefault('TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD', '1')
 
 from ultralytics import YOLO
 
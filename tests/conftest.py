@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Root scripts and the backend modules are imported as top-level modules, as when run from their folders
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "ai-backend"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
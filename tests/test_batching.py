@@ -0,0 +1,69 @@
+from concurrent.futures import TimeoutError as FutureTimeout
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_results_follow_their_inputs():
+    batcher = MicroBatcher(lambda items: [item * 10 for item in items], window_ms=20, max_batch=8)
+    results = {}
+
+    def call(i):
+        results[i] = batcher.infer(i, timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: i * 10 for i in range(16)}
+    assert batcher.stats()['images'] == 16
+
+
+def test_short_result_list_fails_every_caller():
+    batcher = MicroBatcher(lambda items: items[:-1], window_ms=50, max_batch=2)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 results for a batch of 2"):
+            future.result(timeout=5)
+
+
+def test_infer_fn_error_reaches_every_caller():
+    def fail(items):
+        raise ValueError("model exploded")
+
+    batcher = MicroBatcher(fail, window_ms=50, max_batch=4)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="model exploded"):
+            future.result(timeout=5)
+
+
+def test_batcher_keeps_serving_after_a_bad_batch():
+    calls = []
+
+    def infer(items):
+        calls.append(len(items))
+        return [] if len(calls) == 1 else list(items)
+
+    batcher = MicroBatcher(infer, window_ms=1, max_batch=1)
+    with pytest.raises(RuntimeError):
+        batcher.infer("a", timeout=5)
+    assert batcher.infer("b", timeout=5) == "b"
+
+
+def test_infer_times_out_instead_of_hanging():
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(5)
+        return list(items)
+
+    batcher = MicroBatcher(slow, window_ms=1, max_batch=1)
+    try:
+        with pytest.raises(FutureTimeout):
+            batcher.infer("x", timeout=0.1)
+    finally:
+        release.set()
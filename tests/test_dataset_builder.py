@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from dataset_builder import DatasetBuilder, MANIFEST_NAME, pair_entries
+
+
+@pytest.fixture
+def source(tmp_path):
+    img_dir = tmp_path / "src" / "images"
+    lab_dir = tmp_path / "src" / "labels"
+    img_dir.mkdir(parents=True)
+    lab_dir.mkdir(parents=True)
+    imgs = []
+    for i in range(6):
+        img = img_dir / f"{i:03d}.jpg"
+        img.write_bytes(bytes([i]) * 100)
+        (lab_dir / f"{i:03d}.txt").write_text(f"{i} 0.5 0.5 0.1 0.1\n")
+        imgs.append(img)
+    return imgs, lab_dir
+
+
+def names(folder):
+    return sorted(p.name for p in Path(folder).iterdir())
+
+
+def test_build_without_manifest_removes_an_old_split(tmp_path, source):
+    imgs, lab_dir = source
+    dst = tmp_path / "split"
+    # An existing split made by hand (no manifest): 000-003 train, 004-005 val
+    for split, chosen in (("train", imgs[:4]), ("val", imgs[4:])):
+        for img in chosen:
+            for rel in (f"images/{split}/{img.name}", f"labels/{split}/{img.stem}.txt"):
+                (dst / rel).parent.mkdir(parents=True, exist_ok=True)
+                (dst / rel).write_bytes(b"old")
+    (dst / "labels" / "val.cache").write_bytes(b"ultralytics")
+
+    entries = pair_entries(imgs[2:], lab_dir, "train") + pair_entries(imgs[:2], lab_dir, "val")
+    stats = DatasetBuilder(dst, link="copy").build(entries)
+
+    assert names(dst / "images" / "train") == ["002.jpg", "003.jpg", "004.jpg", "005.jpg"]
+    assert names(dst / "images" / "val") == ["000.jpg", "001.jpg"]
+    assert names(dst / "labels" / "val") == ["000.txt", "001.txt"]
+    assert not set(names(dst / "images" / "train")) & set(names(dst / "images" / "val"))
+    assert stats["removed"] == 8  # 000, 001 from train and 004, 005 from val, image + label each
+    assert (dst / "labels" / "val.cache").exists()
+    assert (dst / MANIFEST_NAME).exists()
+
+
+def test_rebuild_removes_files_dropped_from_the_manifest(tmp_path, source):
+    imgs, lab_dir = source
+    dst = tmp_path / "split"
+    builder = DatasetBuilder(dst, link="copy")
+    builder.build(pair_entries(imgs, lab_dir, "train"))
+
+    stats = builder.build(pair_entries(imgs[:3], lab_dir, "train"))
+    assert names(dst / "images" / "train") == ["000.jpg", "001.jpg", "002.jpg"]
+    assert stats["removed"] == 6
+    assert stats["unchanged"] == 6
+
+
+def test_auto_link_does_not_share_edits_with_the_source(tmp_path, source):
+    imgs, lab_dir = source
+    dst = tmp_path / "split"
+    DatasetBuilder(dst).build(pair_entries(imgs[:1], lab_dir, "train"))
+
+    (dst / "labels" / "train" / "000.txt").write_text("edited\n")
+    assert (lab_dir / "000.txt").read_text() == "0 0.5 0.5 0.1 0.1\n"
@@ -0,0 +1,35 @@
+import numpy as np
+
+from label_index import LabelIndex, _parse, stratified_split
+
+
+def test_parse_boxes():
+    assert _parse("0 0.5 0.5 0.2 0.2\n3 0.1 0.2 0.3 0.4\n") == "0 0.5 0.5 0.2 0.2 3 0.1 0.2 0.3 0.4".split()
+    assert _parse("\n  \n") is None
+
+
+def test_parse_rejects_lines_that_only_add_up_to_boxes():
+    # 4 + 6 tokens = 10: must not be reshaped into two boxes
+    assert _parse("0 0.5 0.5 0.2\n1 0.1 0.2 0.3 0.4 0.5\n") == []
+
+
+def test_parse_reduces_polygons_to_boxes():
+    rows = _parse("2 0.1 0.2 0.3 0.2 0.3 0.6\n0 0.5 0.5 0.2 0.2\n")
+    np.testing.assert_allclose(rows, [2, 0.2, 0.4, 0.2, 0.4, 0, 0.5, 0.5, 0.2, 0.2])
+
+
+def test_stratified_split_keeps_the_requested_size(tmp_path):
+    rng = np.random.default_rng(0)
+    files = []
+    for i in range(100):
+        # Many rare classes ask val for an image each; val must still stay at 20 images
+        classes = [i % 40, 40 + i % 3]
+        path = tmp_path / f"{i:03d}.txt"
+        path.write_text("".join(f"{c} {rng.random():.3f} {rng.random():.3f} 0.1 0.1\n" for c in classes))
+        files.append(path)
+    index = LabelIndex.from_label_files([f.stem for f in files], files)
+
+    val = stratified_split(index, val_fraction=0.2, num_classes=43)
+    assert val.sum() == 20
+    # The common classes are still represented in val
+    assert index.incidence(43)[val][:, 40:].any(axis=0).all()
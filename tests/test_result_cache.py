@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+from result_cache import DetectionCache
+
+
+def image(seed):
+    return np.random.default_rng(seed).integers(0, 255, (32, 32, 3), dtype=np.uint8)
+
+
+def test_memory_then_disk_hits(tmp_path):
+    cache = DetectionCache("model-a", max_entries=1, disk_dir=tmp_path)
+    first, second = cache.key_for(image(0)), cache.key_for(image(1))
+    cache.put(first, {"objects": [1]})
+    cache.put(second, {"objects": [2]})  # pushes `first` out of the memory tier
+
+    assert cache.get(second) == {"objects": [2]}
+    assert cache.get(first) == {"objects": [1]}
+    assert cache.get(cache.key_for(image(2))) is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_cap_evicts_oldest_across_namespaces(tmp_path):
+    old = DetectionCache("retired-model", disk_dir=tmp_path)
+    new = DetectionCache("model-b", disk_dir=tmp_path)
+    for i, owner in enumerate([old, old, new, new, new]):
+        digest = owner.key_for(image(i)).digest
+        owner._disk_put(digest, {"i": i})
+        os.utime(owner._disk_path(digest), (1000 + i, 1000 + i))
+
+    capped = DetectionCache("model-b", disk_dir=tmp_path, disk_max_entries=3)
+    assert capped.prune_disk() == 2
+    remaining = [p.parent.parent.name for p in tmp_path.glob("*/*/*.json")]
+    assert remaining == [new.namespace] * 3
+    assert capped.stats()["disk_evictions"] == 2
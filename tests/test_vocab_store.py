@@ -0,0 +1,34 @@
+import json
+import time
+
+from vocab_store import VocabStore
+
+
+def wait_for_compaction(store, timeout=5):
+    deadline = time.monotonic() + timeout
+    while store._compacting and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_add_is_visible_to_another_store(tmp_path):
+    (tmp_path / "labels_ko.json").write_text(json.dumps({"cat": "고양이"}), encoding="utf-8")
+    writer = VocabStore(base_dir=tmp_path, refresh_interval=0)
+    reader = VocabStore(base_dir=tmp_path, refresh_interval=0)
+
+    writer.add("dog", "개", "gae")
+    reader.refresh()
+    korean, romanization = reader.snapshot()
+    assert korean == {"cat": "고양이", "dog": "개"}
+    assert romanization == {"dog": "gae"}
+
+
+def test_compaction_runs_in_the_background(tmp_path):
+    store = VocabStore(base_dir=tmp_path, compact_every=3, refresh_interval=0)
+    generation = store._generation
+    store.add_many([(f"word{i}", f"단어{i}", None) for i in range(3)])
+    wait_for_compaction(store)
+
+    assert store._generation == generation + 1
+    assert store._journal_entries == 0
+    reopened = VocabStore(base_dir=tmp_path)
+    assert reopened.korean["word2"] == "단어2"
@@ -0,0 +1,231 @@
+"""
+Lightweight multi-object tracker for realtime_ko.py (pure NumPy).
+SORT-style: a constant-velocity Kalman filter per track on (cx, cy, w, h),
+greedy IoU association with fresh detections, and per-track class votes so
+the Korean label attached to a track ID does not flicker between frames.
+
+The detector only has to run every N frames; in between the tracker
+predicts boxes forward, and needs_detection() asks for an early detection
+when tracks degrade (fast motion, growing uncertainty, boxes leaving the
+frame, or poor matches on the last detection).
+"""
+
+import numpy as np
+
+NDIM = 4  # measured (cx, cy, w, h); state adds their velocities
+
+# Constant-velocity transition and measurement matrices
+_F = np.eye(2 * NDIM)
+_F[:NDIM, NDIM:] = np.eye(NDIM)
+_H = np.eye(NDIM, 2 * NDIM)
+
+# Noise, relative to box height (as in DeepSORT)
+STD_POSITION = 1.0 / 20
+STD_VELOCITY = 1.0 / 160
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def greedy_match(iou, threshold):
+    """Match rows to columns by descending IoU; returns (pairs, unmatched_rows, unmatched_cols)"""
+    rows, cols = iou.shape
+    pairs = []
+    if rows and cols:
+        order = np.argsort(-iou, axis=None)
+        used_r = np.zeros(rows, dtype=bool)
+        used_c = np.zeros(cols, dtype=bool)
+        for flat in order:
+            r, c = divmod(int(flat), cols)
+            if iou[r, c] < threshold:
+                break
+            if used_r[r] or used_c[c]:
+                continue
+            used_r[r] = used_c[c] = True
+            pairs.append((r, c))
+    matched_r = {r for r, _ in pairs}
+    matched_c = {c for _, c in pairs}
+    return (pairs,
+            [r for r in range(rows) if r not in matched_r],
+            [c for c in range(cols) if c not in matched_c])
+
+
+def _xyxy_to_cxcywh(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.hstack([boxes[:, :2] + wh / 2, wh])
+
+
+def _cxcywh_to_xyxy(z):
+    half = z[:, 2:4] / 2
+    return np.hstack([z[:, :2] - half, z[:, :2] + half])
+
+
+class Tracker:
+    """
+    Track detections across frames.
+
+    Call update(confs, cls_ids, boxes) on frames where the detector ran and
+    predict() on the others; detections() returns the visible tracks in the
+    same (confs, cls_ids, boxes_xyxy) form as the detector, plus track IDs.
+    """
+
+    def __init__(self, num_classes, detect_every=5, iou_threshold=0.3, max_misses=2,
+                 vote_decay=0.8, conf_smoothing=0.5, max_uncertainty=0.25,
+                 max_speed=0.15, degrade_ratio=0.3):
+        self.num_classes = num_classes
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses            # detection rounds a track may go unmatched
+        self.vote_decay = vote_decay
+        self.conf_smoothing = conf_smoothing
+        self.max_uncertainty = max_uncertainty  # position std / box height
+        self.max_speed = max_speed              # centre motion per frame / box height
+        self.degrade_ratio = degrade_ratio      # unmatched fraction that forces a re-detect
+
+        self.x = np.zeros((0, 2 * NDIM))              # Kalman state per track
+        self.P = np.zeros((0, 2 * NDIM, 2 * NDIM))    # covariance per track
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.votes = np.zeros((0, num_classes))       # decayed confidence per class
+        self.conf = np.zeros(0)
+        self._next_id = 1
+        self._since_detection = 0
+        self._degraded = True   # nothing tracked yet: detect on the first frame
+        self.stats = {'detections': 0, 'predictions': 0, 'early_detections': 0}
+
+    # ------------------------------------------------------------------
+    # Kalman filter (vectorized over tracks)
+
+    def _noise(self, h, std):
+        std = np.asarray(std)[None, :] * h[:, None]
+        return np.einsum('ni,ij->nij', std ** 2, np.eye(std.shape[1]))
+
+    def _predict(self):
+        if len(self.ids):
+            h = np.maximum(self.x[:, 3], 1.0)
+            q = self._noise(h, [STD_POSITION] * NDIM + [STD_VELOCITY] * NDIM)
+            self.x = self.x @ _F.T
+            self.P = _F @ self.P @ _F.T + q
+            self.x[:, 2:4] = np.maximum(self.x[:, 2:4], 1.0)
+        self._since_detection += 1
+
+    def _correct(self, idx, z):
+        h = np.maximum(self.x[idx, 3], 1.0)
+        r = self._noise(h, [STD_POSITION] * NDIM)
+        P = self.P[idx]
+        S = _H @ P @ _H.T + r
+        PHt = P @ _H.T
+        # K = P H^T S^-1, solved as S^T K^T = (P H^T)^T
+        K = np.linalg.solve(np.transpose(S, (0, 2, 1)), np.transpose(PHt, (0, 2, 1)))
+        K = np.transpose(K, (0, 2, 1))
+        innovation = z - self.x[idx] @ _H.T
+        self.x[idx] += np.einsum('nij,nj->ni', K, innovation)
+        self.P[idx] = (np.eye(2 * NDIM) - K @ _H) @ P
+
+    # ------------------------------------------------------------------
+    # Public API
+
+    def needs_detection(self, frame_shape=None):
+        """True when the detector should run on the next frame"""
+        if self._degraded or self._since_detection >= self.detect_every - 1:
+            return True
+        visible = self.misses == 0
+        if not visible.any():
+            return False
+        x, P = self.x[visible], self.P[visible]
+        h = np.maximum(x[:, 3], 1.0)
+        degraded = ((np.sqrt(P[:, 0, 0] + P[:, 1, 1]) / h > self.max_uncertainty).any()
+                    or (np.hypot(x[:, 4], x[:, 5]) / h > self.max_speed).any())
+        if not degraded and frame_shape is not None:
+            fh, fw = frame_shape[:2]
+            cx, cy = x[:, 0], x[:, 1]
+            degraded = ((cx < 0) | (cx > fw) | (cy < 0) | (cy > fh)).any()
+        if degraded:
+            self.stats['early_detections'] += 1
+        return bool(degraded)
+
+    def predict(self):
+        """Advance all tracks one frame without a detection"""
+        self._predict()
+        self.stats['predictions'] += 1
+
+    def update(self, confs, cls_ids, boxes_xyxy):
+        """Advance one frame and associate the detector output with existing tracks"""
+        self._predict()
+        self._since_detection = 0
+        self.stats['detections'] += 1
+
+        confs = np.asarray(confs, dtype=np.float64).reshape(-1)
+        cls_ids = np.asarray(cls_ids, dtype=np.int64).reshape(-1)
+        z = _xyxy_to_cxcywh(boxes_xyxy)
+
+        predicted = _cxcywh_to_xyxy(self.x[:, :NDIM])
+        pairs, lost, new = greedy_match(iou_matrix(predicted, boxes_xyxy), self.iou_threshold)
+
+        if pairs:
+            t_idx = np.array([t for t, _ in pairs])
+            d_idx = np.array([d for _, d in pairs])
+            self._correct(t_idx, z[d_idx])
+            self.misses[t_idx] = 0
+            self.votes[t_idx] *= self.vote_decay
+            self.votes[t_idx, cls_ids[d_idx]] += confs[d_idx]
+            a = self.conf_smoothing
+            self.conf[t_idx] = a * self.conf[t_idx] + (1 - a) * confs[d_idx]
+
+        if lost:
+            self.misses[lost] += 1
+
+        if new:
+            self._spawn(z[new], confs[new], cls_ids[new])
+
+        keep = self.misses <= self.max_misses
+        if not keep.all():
+            self._select(keep)
+
+        unmatched = len(lost) + len(new)
+        total = max(len(pairs) + unmatched, 1)
+        self._degraded = unmatched / total > self.degrade_ratio
+
+    def detections(self):
+        """(confs, cls_ids, boxes_xyxy, track_ids) lists for tracks matched on the last detection"""
+        visible = self.misses == 0
+        boxes = _cxcywh_to_xyxy(self.x[visible, :NDIM]).round().astype(int)
+        return (self.conf[visible].tolist(),
+                self.votes[visible].argmax(axis=1).tolist(),
+                boxes.tolist(),
+                self.ids[visible].tolist())
+
+    # ------------------------------------------------------------------
+
+    def _spawn(self, z, confs, cls_ids):
+        n = len(z)
+        x = np.hstack([z, np.zeros((n, NDIM))])
+        h = np.maximum(z[:, 3], 1.0)
+        P = self._noise(h, [2 * STD_POSITION] * NDIM + [10 * STD_VELOCITY] * NDIM)
+        votes = np.zeros((n, self.num_classes))
+        votes[np.arange(n), cls_ids] = confs
+
+        self.x = np.vstack([self.x, x])
+        self.P = np.concatenate([self.P, P])
+        self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + n)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int64)])
+        self.votes = np.vstack([self.votes, votes])
+        self.conf = np.concatenate([self.conf, confs])
+        self._next_id += n
+
+    def _select(self, keep):
+        self.x, self.P, self.ids = self.x[keep], self.P[keep], self.ids[keep]
+        self.misses, self.votes, self.conf = self.misses[keep], self.votes[keep], self.conf[keep]
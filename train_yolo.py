@@ -5,14 +5,9 @@ This script trains a YOLO model on the COCO80 dataset for Korean vocabulary lear
 
 import os
 from pathlib import Path
-import torch
 
-# Fix PyTorch 2.6 weights_only issue - patch torch.load
-_original_torch_load = torch.load
-def _patched_torch_load(*args, **kwargs):
-    kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-torch.load = _patched_torch_load
+# Full ultralytics checkpoints are pickled modules (torch >= 2.6 defaults to weights_only=True)
+os.environ.setdefault('TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD', '1')
 
 from ultralytics import YOLO
 
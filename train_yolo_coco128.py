@@ -5,35 +5,170 @@ Supports both coco80 and coco128_split configurations.
 
 import os
 import argparse
+from functools import partial
 from pathlib import Path
-import torch
 
-# Fix PyTorch 2.6 weights_only issue - patch torch.load
-_original_torch_load = torch.load
-def _patched_torch_load(*args, **kwargs):
-    kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-torch.load = _patched_torch_load
+# Full ultralytics checkpoints are pickled modules (torch >= 2.6 defaults to weights_only=True)
+os.environ.setdefault('TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD', '1')
+
+import torch
 
 from ultralytics import YOLO
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import DEFAULT_CFG, colorstr
+
+from shards import ShardReader
+
+class ShardDataset(YOLODataset):
+    """YOLODataset that reads pre-resized images and labels from packed shards (see shards.py)"""
+    
+    def __init__(self, *args, shards=None, **kwargs):
+        self.shards = shards  # set before super().__init__, which calls get_labels()
+        super().__init__(*args, **kwargs)
+    
+    def get_labels(self):
+        positions = [self.shards.position(f) for f in self.im_files]
+        if any(p is None for p in positions):
+            print("⚠️  Shards do not cover every image, reading labels from disk")
+            self.shards = None
+            return super().get_labels()
+        labels = []
+        for f, p in zip(self.im_files, positions):
+            boxes = self.shards.boxes(p)
+            row = self.shards.index[p]
+            h0, w0 = int(row['h0']), int(row['w0'])
+            labels.append({
+                'im_file': f,
+                'shape': (h0, w0),
+                'cls': boxes[:, 0:1].copy(),
+                'bboxes': boxes[:, 1:].copy(),
+                'segments': [],
+                'keypoints': None,
+                'normalized': True,
+                'bbox_format': 'xywh',
+            })
+        return labels
+    
+    def load_image(self, i, rect_mode=True, **kwargs):
+        # Shards hold long-side-resized images; other modes use the regular loader.
+        # Written against ultralytics 8.1 (pinned): later versions add kwargs and self.cache
+        if (self.shards is None or self.ims[i] is not None or not rect_mode
+                or kwargs.get('resize_short') or self.shards.imgsz != self.imgsz):
+            return super().load_image(i, rect_mode, **kwargs)
+        
+        im, (h0, w0) = self.shards.image(self.shards.position(self.im_files[i]))
+        
+        # Keep the mosaic buffer behaviour of the base loader
+        if self.augment and getattr(self, 'cache', None) != 'ram':
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, (h0, w0), im.shape[:2]
 
-def train_yolo(data_yaml='coco128_split.yaml', model_name='yolo11n.pt', epochs=30):
-    """Train YOLO model on specified dataset"""
+class ShardTrainer(DetectionTrainer):
+    """DetectionTrainer whose train/val datasets come from packed shards when available"""
+    
+    def __init__(self, cfg=DEFAULT_CFG, overrides=None, _callbacks=None, shard_dir=None):
+        self.shard_dir = shard_dir  # set before super().__init__, which may build datasets
+        super().__init__(cfg, overrides, _callbacks)
+    
+    def build_dataset(self, img_path, mode='train', batch=None):
+        reader = ShardReader.for_images(self.shard_dir, img_path) if self.shard_dir else None
+        if reader is None:
+            print(f"⚠️  No shards for {img_path}, decoding images from disk")
+            return super().build_dataset(img_path, mode, batch)
+        
+        cfg = self.args
+        model = getattr(self.model, 'module', self.model)
+        gs = max(int(model.stride.max() if model is not None else 0), 32)
+        return ShardDataset(
+            img_path=img_path,
+            imgsz=cfg.imgsz,
+            batch_size=batch,
+            augment=mode == 'train',
+            hyp=cfg,
+            rect=cfg.rect or mode == 'val',
+            cache=cfg.cache or None,
+            single_cls=cfg.single_cls or False,
+            stride=gs,
+            pad=0.0 if mode == 'train' else 0.5,
+            prefix=colorstr(f'{mode}: '),
+            task=cfg.task,
+            classes=cfg.classes,
+            data=self.data,
+            fraction=cfg.fraction if mode == 'train' else 1.0,
+            shards=reader,
+        )
+
+# Default optimizer and augmentation settings; sweep.py overrides any of these per trial
+HYPERPARAMETERS = dict(
+    # Optimization
+    optimizer='auto',     # Auto-select optimizer
+    lr0=0.01,            # Initial learning rate
+    lrf=0.01,            # Final learning rate
+    momentum=0.937,      # SGD momentum
+    weight_decay=0.0005, # Optimizer weight decay
+    
+    # Augmentation settings
+    hsv_h=0.015,         # HSV-Hue augmentation
+    hsv_s=0.7,           # HSV-Saturation augmentation
+    hsv_v=0.4,           # HSV-Value augmentation
+    degrees=0.0,         # Image rotation (+/- deg)
+    translate=0.1,       # Image translation (+/- fraction)
+    scale=0.5,           # Image scale (+/- gain)
+    shear=0.0,           # Image shear (+/- deg)
+    perspective=0.0,     # Image perspective (+/- fraction)
+    flipud=0.0,          # Image flip up-down (probability)
+    fliplr=0.5,          # Image flip left-right (probability)
+    mosaic=1.0,          # Image mosaic (probability)
+    mixup=0.0,           # Image mixup (probability)
+    copy_paste=0.0,      # Segment copy-paste (probability)
+)
+
+def select_device():
+    """Best available training device"""
+    if torch.cuda.is_available():
+        print(f"🚀 Using GPU: {torch.cuda.get_device_name(0)}")
+        return 'cuda'
+    if torch.backends.mps.is_available():
+        print("🚀 Using Apple Silicon GPU (MPS)")
+        return 'mps'
+    print("💻 Using CPU (training will be slower)")
+    return 'cpu'
+
+def train_yolo(data_yaml='coco128_split.yaml', model_name='yolo11n.pt', epochs=30, shards=None, cache=False,
+               imgsz=640, batch_size=16, name='train', project=None, hyp=None, callbacks=None,
+               device=None, workers=8, patience=50, validate=True, verbose=True):
+    """
+    Train YOLO model on specified dataset (optionally from packed shards, see shards.py).
+    
+    hyp overrides entries of HYPERPARAMETERS; callbacks maps ultralytics event
+    names to functions. Returns the trained YOLO model (model.trainer holds the
+    run's save_dir and final metrics), or None if the inputs are missing.
+    """
+    
+    hyp = {**HYPERPARAMETERS, **(hyp or {})}
     
     print("=" * 70)
     print("YOLO Training Script - Korean Vocabulary Object Detection")
     print("=" * 70)
     
-    # Configuration
-    imgsz = 640
-    batch_size = 16
-    
     print(f"\n📋 Configuration:")
     print(f"   Model: {model_name}")
     print(f"   Data: {data_yaml}")
     print(f"   Epochs: {epochs}")
     print(f"   Image Size: {imgsz}")
     print(f"   Batch Size: {batch_size}")
+    if shards:
+        print(f"   Shards: {shards}")
+    elif cache:
+        print(f"   Image cache: {cache}")
+    changed = {k: v for k, v in hyp.items() if HYPERPARAMETERS.get(k) != v}
+    if changed:
+        print(f"   Overrides: {changed}")
     
     # Check if dataset config exists
     data_path = Path(data_yaml)
@@ -51,81 +186,69 @@ def train_yolo(data_yaml='coco128_split.yaml', model_name='yolo11n.pt', epochs=3
     print(f"\n📦 Loading model: {model_name}")
     model = YOLO(model_name)
     print("✅ Model loaded successfully!")
+    for event, callback in (callbacks or {}).items():
+        model.add_callback(event, callback)
     
-    # Determine device
-    import torch
-    if torch.cuda.is_available():
-        device = 'cuda'
-        print(f"🚀 Using GPU: {torch.cuda.get_device_name(0)}")
-    elif torch.backends.mps.is_available():
-        device = 'mps'
-        print("🚀 Using Apple Silicon GPU (MPS)")
-    else:
-        device = 'cpu'
-        print("💻 Using CPU (training will be slower)")
+    device = device or select_device()
+    
+    # Packed shards replace per-epoch JPEG decoding
+    trainer = None
+    if shards:
+        if not (Path(shards) / 'meta.json').exists():
+            print(f"\n❌ Error: no shards at {shards}")
+            print(f"   Pack them first: python shards.py --data {data_yaml} --out {shards} --imgsz {imgsz}")
+            return None
+        # model.train() constructs the trainer itself: bind the shard folder to this run only
+        trainer = partial(ShardTrainer, shard_dir=shards)
     
     # Train
     print(f"\n🎯 Starting training with {epochs} epochs...")
     print("=" * 70)
     
-    results = model.train(
+    model.train(
+        trainer=trainer,
         data=data_yaml,
         epochs=epochs,
         imgsz=imgsz,
         batch=batch_size,
-        name='train',
-        patience=50,          # Early stopping patience
+        name=name,
+        project=project,
+        exist_ok=project is not None,  # sweep trials own their folder
+        cache=False if shards else cache,  # 'ram' / 'disk' image cache without shards
+        patience=patience,    # Early stopping patience
         save=True,            # Save checkpoints
         device=device,
-        
-        # Optimization
-        optimizer='auto',     # Auto-select optimizer
-        lr0=0.01,            # Initial learning rate
-        lrf=0.01,            # Final learning rate
-        momentum=0.937,      # SGD momentum
-        weight_decay=0.0005, # Optimizer weight decay
-        
-        # Augmentation settings
-        hsv_h=0.015,         # HSV-Hue augmentation
-        hsv_s=0.7,           # HSV-Saturation augmentation
-        hsv_v=0.4,           # HSV-Value augmentation
-        degrees=0.0,         # Image rotation (+/- deg)
-        translate=0.1,       # Image translation (+/- fraction)
-        scale=0.5,           # Image scale (+/- gain)
-        shear=0.0,           # Image shear (+/- deg)
-        perspective=0.0,     # Image perspective (+/- fraction)
-        flipud=0.0,          # Image flip up-down (probability)
-        fliplr=0.5,          # Image flip left-right (probability)
-        mosaic=1.0,          # Image mosaic (probability)
-        mixup=0.0,           # Image mixup (probability)
-        copy_paste=0.0,      # Segment copy-paste (probability)
+        workers=workers,
+        **hyp,
         
         # Logging
-        verbose=True,        # Verbose output
-        plots=True,          # Save plots
+        verbose=verbose,     # Verbose output
+        plots=verbose,       # Save plots
     )
     
+    save_dir = Path(model.trainer.save_dir)
     print("\n" + "=" * 70)
     print("✅ Training completed!")
     print("=" * 70)
-    print(f"\n📁 Results saved to: runs/detect/train")
-    print(f"📦 Best model: runs/detect/train/weights/best.pt")
-    print(f"📦 Last model: runs/detect/train/weights/last.pt")
-    
-    # Validate
-    print("\n📊 Running validation on best model...")
-    best_model = YOLO('runs/detect/train/weights/best.pt')
-    metrics = best_model.val()
-    
-    print(f"\n📈 Validation Results:")
-    print(f"   mAP50: {metrics.box.map50:.4f}")
-    print(f"   mAP50-95: {metrics.box.map:.4f}")
-    print(f"   Precision: {metrics.box.mp:.4f}")
-    print(f"   Recall: {metrics.box.mr:.4f}")
-    
-    return results
+    print(f"\n📁 Results saved to: {save_dir}")
+    print(f"📦 Best model: {save_dir / 'weights' / 'best.pt'}")
+    print(f"📦 Last model: {save_dir / 'weights' / 'last.pt'}")
+    
+    if validate:
+        # Validate
+        print("\n📊 Running validation on best model...")
+        best_model = YOLO(save_dir / 'weights' / 'best.pt')
+        metrics = best_model.val(data=data_yaml, imgsz=imgsz, device=device)
+        
+        print(f"\n📈 Validation Results:")
+        print(f"   mAP50: {metrics.box.map50:.4f}")
+        print(f"   mAP50-95: {metrics.box.map:.4f}")
+        print(f"   Precision: {metrics.box.mp:.4f}")
+        print(f"   Recall: {metrics.box.mr:.4f}")
+    
+    return model
 
-def export_model(model_path='runs/detect/train/weights/best.pt', formats=None):
+def export_model(model_path='runs/detect/train/weights/best.pt', formats=None, dynamic=False):
     """Export trained model to different formats"""
     
     if formats is None:
@@ -147,7 +270,8 @@ def export_model(model_path='runs/detect/train/weights/best.pt', formats=None):
     for fmt in formats:
         print(f"\n📤 Exporting to {fmt.upper()}...")
         try:
-            model.export(format=fmt)
+            # dynamic=True lets the AI backend run batched inference on ONNX/OpenVINO
+            model.export(format=fmt, dynamic=dynamic)
             print(f"✅ {fmt.upper()} export complete!")
         except Exception as e:
             print(f"❌ {fmt.upper()} export failed: {e}")
@@ -194,6 +318,16 @@ if __name__ == '__main__':
                         help='Model to use (default: yolo11n.pt)')
     parser.add_argument('--epochs', type=int, default=30,
                         help='Number of epochs (default: 30)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Training image size (default: 640)')
+    parser.add_argument('--batch', type=int, default=16,
+                        help='Batch size (default: 16)')
+    parser.add_argument('--name', type=str, default='train',
+                        help='Run name under runs/detect (default: train)')
+    parser.add_argument('--shards', type=str, default=None,
+                        help='Train from packed memory-mapped shards (created by shards.py)')
+    parser.add_argument('--cache', choices=['ram', 'disk'], default=False,
+                        help='ultralytics image cache when not using shards')
     
     # Export arguments
     parser.add_argument('--export', action='store_true',
@@ -203,6 +337,8 @@ if __name__ == '__main__':
                         help='Path to model for export')
     parser.add_argument('--formats', nargs='+', default=['onnx'],
                         help='Export formats (default: onnx)')
+    parser.add_argument('--dynamic', action='store_true',
+                        help='Export with dynamic batch/input shapes')
     
     # Testing arguments
     parser.add_argument('--test', action='store_true',
@@ -216,10 +352,12 @@ if __name__ == '__main__':
     args = parser.parse_args()
     
     if args.train:
-        train_yolo(data_yaml=args.data, model_name=args.model, epochs=args.epochs)
+        train_yolo(data_yaml=args.data, model_name=args.model, epochs=args.epochs,
+                   shards=args.shards, cache=args.cache, imgsz=args.imgsz, batch_size=args.batch,
+                   name=args.name)
     
     if args.export:
-        export_model(model_path=args.export_path, formats=args.formats)
+        export_model(model_path=args.export_path, formats=args.formats, dynamic=args.dynamic)
     
     if args.test:
         test_model(model_path=args.test_path, source=args.source)
@@ -233,9 +371,14 @@ if __name__ == '__main__':
         print("   python train_yolo_coco128.py --train --epochs 50")
         print("   python train_yolo_coco128.py --train --data coco80.yaml")
         print("   python train_yolo_coco128.py --train --model yolov8n.pt")
+        print("   python shards.py --data coco128_split.yaml --out shards/coco128_split")
+        print("   python train_yolo_coco128.py --train --shards shards/coco128_split")
+        print("   python sweep.py --space sweep_space.yaml --epochs 10 --parallel 2")
         print("\n📤 Exporting:")
         print("   python train_yolo_coco128.py --export")
         print("   python train_yolo_coco128.py --export --formats onnx tflite")
+        print("   python train_yolo_coco128.py --export --formats onnx openvino --dynamic")
+        print("   python quantize.py --format onnx   # INT8 + FP32 comparison report")
         print("\n🧪 Testing:")
         print("   python train_yolo_coco128.py --test")
         print("   python train_yolo_coco128.py --test --source image.jpg")